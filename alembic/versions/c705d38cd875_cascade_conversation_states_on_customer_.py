@@ -0,0 +1,45 @@
+"""cascade conversation_states on customer delete
+
+Revision ID: c705d38cd875
+Revises: f2b73877f2f6
+Create Date: 2026-10-19 03:15:01.230676
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c705d38cd875'
+down_revision: Union[str, Sequence[str], None] = 'f2b73877f2f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Postgres names the original unnamed constraint <table>_<column>_fkey; SQLite can't alter
+# constraints, so there the table is recreated in batch mode with a naming convention.
+PG_FK = "conversation_states_customer_id_fkey"
+SQLITE_FK = "fk_conversation_states_customer_id_customers"
+NAMING = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _replace_fk(ondelete) -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        with op.batch_alter_table("conversation_states", naming_convention=NAMING, recreate="always") as batch_op:
+            batch_op.drop_constraint(SQLITE_FK, type_="foreignkey")
+            batch_op.create_foreign_key(SQLITE_FK, "customers", ["customer_id"], ["id"], ondelete=ondelete)
+    else:
+        op.drop_constraint(PG_FK, "conversation_states", type_="foreignkey")
+        op.create_foreign_key(PG_FK, "conversation_states", "customers", ["customer_id"], ["id"], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _replace_fk("CASCADE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _replace_fk(None)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.endpoints import auth, users, products, orders, customers, chat, webhook, pets, debug
+from app.api.endpoints import auth, users, products, orders, customers, chat, webhook, pets, debug, audit, campaigns, ai
 
 api_router = APIRouter()
 api_router.include_router(debug.router, prefix="/debug", tags=["debug"])
@@ -11,3 +11,6 @@ api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(webhook.router, tags=["webhook"])
 api_router.include_router(pets.router, prefix="/pets", tags=["pets"])
+api_router.include_router(audit.router, prefix="/audit", tags=["audit"])
+api_router.include_router(campaigns.router, prefix="/campaigns", tags=["campaigns"])
+api_router.include_router(ai.router, prefix="/ai", tags=["ai"])
@@ -1,4 +1,6 @@
-from typing import Generator, Annotated
+import hashlib
+import time
+from typing import Generator, Annotated, NamedTuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -6,43 +8,73 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.core import security
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.database import get_db
 from app.models import User
+from app.services import audit
 from app.schemas.auth import TokenData
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"/lavete{settings.API_V1_STR}/auth/login")
 
+class UserRef(NamedTuple):
+    """
+    Slim snapshot of the authenticated user. Endpoints only read id and role;
+    /users/me loads the full row itself.
+    """
+    id: int
+    email: str
+    role: str
+    is_active: bool
+
+# sha256(token) -> (UserRef, token exp). Per worker; the TTL bounds how long a role change
+# or deactivation made through another worker takes to apply.
+_token_cache = TTLCache(ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS, max_size=2048)
+
+def invalidate_user_cache():
+    """Drop cached snapshots after a user changes (cheap: admins rarely edit users)."""
+    _token_cache.clear()
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: Annotated[AsyncSession, Depends(get_db)]
-) -> User:
+) -> UserRef:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    cached = _token_cache.get(key)
+    if cached is not None and (cached[1] is None or cached[1] > time.time()):
+        user = cached[0]
+    else:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+            token_data = TokenData(email=email)
+        except JWTError:
             raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
-    
-    result = await db.execute(select(User).where(User.email == token_data.email))
-    user = result.scalars().first()
-    
-    if user is None:
-        raise credentials_exception
+
+        result = await db.execute(
+            select(User.id, User.email, User.role, User.is_active).where(User.email == token_data.email)
+        )
+        row = result.first()
+        if row is None:
+            raise credentials_exception
+        user = UserRef(row.id, row.email, row.role, row.is_active is not False)
+        _token_cache.set(key, (user, payload.get("exp")))
+
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    audit.current_user_id.set(user.id)
     return user
 
 async def get_current_active_admin(
-    current_user: Annotated[User, Depends(get_current_user)]
-) -> User:
+    current_user: Annotated[UserRef, Depends(get_current_user)]
+) -> UserRef:
     if current_user.role != "admin":
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
@@ -0,0 +1,24 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.core.database import get_read_db
+from app.models.users import User
+from app.schemas import ai
+from app.services import ai_context
+
+router = APIRouter()
+
+@router.get("/context/{phone}", response_model=ai.AIContext)
+async def read_ai_context(
+    phone: str,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Everything the agent needs for one conversation turn, in one call: customer, pets, open
+    orders, recent messages, relevant products and store config, trimmed to AI_CONTEXT_MAX_TOKENS.
+    Read-only: customer is null for unknown phones.
+    """
+    return await ai_context.get(db, phone)
@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.core.database import get_read_db
+from app.models.users import AuditLog, User
+from app.schemas import users
+
+router = APIRouter()
+
+@router.get("/", response_model=List[users.AuditLog])
+async def read_audit_log(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    entity: Optional[str] = Query(None, description="product, order or customer"),
+    entity_id: Optional[int] = None,
+    since: Optional[datetime] = Query(None, description="UTC, inclusive"),
+    until: Optional[datetime] = Query(None, description="UTC, exclusive"),
+    user_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = Query(100, le=500),
+    current_user: User = Depends(deps.get_current_active_admin),
+):
+    """
+    Audit trail, newest first. Filtering by entity (and entity_id) with a time range uses the
+    (entity, entity_id, timestamp) / (entity, timestamp) indexes.
+    Entries are written in batches, so the last few hundred milliseconds may not be visible yet.
+    """
+    query = select(AuditLog)
+    if entity:
+        query = query.where(AuditLog.entity == entity)
+    if entity_id is not None:
+        query = query.where(AuditLog.entity_id == entity_id)
+    if since:
+        query = query.where(AuditLog.timestamp >= since)
+    if until:
+        query = query.where(AuditLog.timestamp < until)
+    if user_id is not None:
+        query = query.where(AuditLog.user_id == user_id)
+    query = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).offset(skip).limit(limit)
+    result = await db.execute(query)
+    return result.scalars().all()
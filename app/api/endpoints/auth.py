@@ -1,3 +1,4 @@
+import math
 from datetime import timedelta
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -7,20 +8,35 @@ from sqlalchemy import select
 
 from app.core import security, config
 from app.core.database import get_db
+from app.core.rate_limit import SlidingWindowLimiter
 from app.models import User
 from app.schemas.auth import Token
 
 router = APIRouter()
 
+# Checked before bcrypt runs, so a login storm against one account can't tie up the hash pool
+_login_limiter = SlidingWindowLimiter(
+    config.settings.LOGIN_RATE_LIMIT_ATTEMPTS, config.settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS
+)
+
 @router.post("/login", response_model=Token)
 async def login_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
+    email = form_data.username.strip().lower()
+    retry_after = _login_limiter.hit(email)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
     result = await db.execute(select(User).where(User.email == form_data.username))
     user = result.scalars().first()
     
-    if not user or not security.verify_password(form_data.password, user.password_hash):
+    if not user or not await security.verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -28,6 +44,7 @@ async def login_access_token(
         )
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    _login_limiter.reset(email)
         
     access_token_expires = timedelta(minutes=config.settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
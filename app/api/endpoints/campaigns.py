@@ -0,0 +1,131 @@
+from datetime import datetime
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.core.database import get_db, get_read_db
+from app.models.campaigns import Campaign, CampaignRecipient
+from app.models.users import User
+from app.schemas import campaigns as schemas
+from app.services import campaigns
+
+router = APIRouter()
+
+async def _get_campaign(db: AsyncSession, campaign_id: int) -> Campaign:
+    campaign = await db.get(Campaign, campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
+
+@router.post("/preview", response_model=schemas.CampaignPreview)
+async def preview_segment(
+    segment: schemas.CampaignSegment,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: User = Depends(deps.get_current_active_admin),
+):
+    """How many customers (distinct phones) a segment reaches, with a sample."""
+    recipients, sample = await campaigns.preview(db, segment)
+    return {"recipients": recipients, "sample": sample}
+
+@router.post("/", response_model=schemas.Campaign)
+async def create_campaign(
+    campaign_in: schemas.CampaignCreate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: User = Depends(deps.get_current_active_admin),
+):
+    """Create a draft campaign; nothing is sent until it is started."""
+    campaign = Campaign(
+        **campaign_in.model_dump(exclude={"segment"}),
+        segment=campaign_in.segment.model_dump(mode="json", exclude_none=True),
+        created_by_user_id=current_user.id,
+        status="draft",
+    )
+    db.add(campaign)
+    await db.commit()
+    await db.refresh(campaign)
+    return campaign
+
+@router.get("/", response_model=List[schemas.Campaign])
+async def read_campaigns(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    status: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(50, le=200),
+    current_user: User = Depends(deps.get_current_active_admin),
+):
+    query = select(Campaign)
+    if status:
+        query = query.where(Campaign.status == status)
+    result = await db.execute(query.order_by(Campaign.id.desc()).offset(skip).limit(limit))
+    return result.scalars().all()
+
+@router.get("/{campaign_id}", response_model=schemas.Campaign)
+async def read_campaign(
+    campaign_id: int,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: User = Depends(deps.get_current_active_admin),
+):
+    return await _get_campaign(db, campaign_id)
+
+@router.post("/{campaign_id}/start", response_model=schemas.Campaign)
+async def start_campaign(
+    campaign_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: User = Depends(deps.get_current_active_admin),
+):
+    """Start a draft, or resume a paused campaign where it stopped."""
+    campaign = await _get_campaign(db, campaign_id)
+    if campaign.status not in ("draft", "paused"):
+        raise HTTPException(status_code=400, detail=f"Cannot start a {campaign.status} campaign")
+    # A paused campaign may have been paused mid-resolution
+    campaign.status = "sending" if campaign.started_at and campaign.total_recipients else "resolving"
+    campaign.started_at = campaign.started_at or datetime.utcnow()
+    await db.commit()
+    campaigns.notify()
+    return campaign
+
+@router.post("/{campaign_id}/pause", response_model=schemas.Campaign)
+async def pause_campaign(
+    campaign_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: User = Depends(deps.get_current_active_admin),
+):
+    """Stop sending after the batch in flight; /start resumes it."""
+    campaign = await _get_campaign(db, campaign_id)
+    if campaign.status not in campaigns.ACTIVE_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Cannot pause a {campaign.status} campaign")
+    campaign.status = "paused"
+    await db.commit()
+    return campaign
+
+@router.post("/{campaign_id}/cancel", response_model=schemas.Campaign)
+async def cancel_campaign(
+    campaign_id: int,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: User = Depends(deps.get_current_active_admin),
+):
+    campaign = await _get_campaign(db, campaign_id)
+    if campaign.status in ("completed", "cancelled"):
+        raise HTTPException(status_code=400, detail=f"Campaign is already {campaign.status}")
+    campaign.status = "cancelled"
+    campaign.finished_at = datetime.utcnow()
+    await db.commit()
+    return campaign
+
+@router.get("/{campaign_id}/recipients", response_model=List[schemas.CampaignRecipient])
+async def read_campaign_recipients(
+    campaign_id: int,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    status: Optional[str] = Query(None, description="pending, sending, sent or failed"),
+    skip: int = 0,
+    limit: int = Query(100, le=500),
+    current_user: User = Depends(deps.get_current_active_admin),
+):
+    await _get_campaign(db, campaign_id)
+    query = select(CampaignRecipient).where(CampaignRecipient.campaign_id == campaign_id)
+    if status:
+        query = query.where(CampaignRecipient.status == status)
+    result = await db.execute(query.order_by(CampaignRecipient.id).offset(skip).limit(limit))
+    return result.scalars().all()
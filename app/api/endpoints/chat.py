@@ -4,18 +4,19 @@ from sqlalchemy import select, desc
 from typing import List, Optional
 from datetime import datetime
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.models.chat import ChatMessage
 from app.models.customers import Customer
 from app.models.users import User
 from app.schemas.chat import ChatMessageRead, ChatMessageCreate, ChatCustomerSummary
 from app.api import deps
+from app.services import ai_context, customer_lookup
 
 router = APIRouter()
 
 @router.get("/customers", response_model=List[ChatCustomerSummary])
 async def get_chat_customers(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(deps.get_current_active_admin)
 ):
     """
@@ -24,8 +25,8 @@ async def get_chat_customers(
     or we can list distinct phones from chats. 
     User said: "tabla con todos los usuarios". Let's return all Customers from DB.
     """
-    result = await db.execute(select(Customer))
-    customers = result.scalars().all()
+    result = await db.execute(select(Customer.phone, Customer.full_name, Customer.email, Customer.ai_active))
+    customers = result.all()
     
     # In a real scenario, we might want to check if they actually have chats, 
     # but the requirement implies a master list of users to access their potential chat.
@@ -47,20 +48,15 @@ async def get_chat_history(
     phone: str,
     date_filter: Optional[str] = Query(None, description="Format YYYY-MM-DD"),
     text_search: Optional[str] = Query(None, description="Search text content"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(deps.get_current_active_admin)
 ):
     """
     Get chat history for a phone number.
     Sorted Newest to Oldest.
     """
-    # Handle optional country code (506) - Search both formats
-    phones_to_check = [phone]
-    if phone.startswith("506") and len(phone) > 8:
-        phones_to_check.append(phone[3:])
-    elif len(phone) == 8:
-        phones_to_check.append(f"506{phone}")
-    query = select(ChatMessage).where(ChatMessage.customer_phone.in_(phones_to_check)).order_by(desc(ChatMessage.created_at))
+    # Messages may be stored with or without the 506 country code: search all formats
+    query = select(ChatMessage).where(ChatMessage.customer_phone.in_(customer_lookup.message_phones(phone))).order_by(desc(ChatMessage.created_at))
     
     # Filter by date if provided
     if date_filter:
@@ -156,14 +152,7 @@ async def toggle_ai(
     """
     Toggle AI responses for a specific customer.
     """
-    # Handle incoming phone formats
-    phones_to_check = [phone]
-    if phone.startswith("506") and len(phone) > 8:
-        phones_to_check.append(phone[3:])
-    elif len(phone) == 8:
-        phones_to_check.append(f"506{phone}")
-        
-    result = await db.execute(select(Customer).where(Customer.phone.in_(phones_to_check)))
+    result = await db.execute(select(Customer).where(customer_lookup.phone_match(phone)))
     customer = result.scalars().first()
     
     if not customer:
@@ -171,6 +160,8 @@ async def toggle_ai(
         
     customer.ai_active = active
     await db.commit()
+    customer_lookup.invalidate(customer.phone)
+    ai_context.invalidate(customer.phone)
     return {"message": f"AI toggled to {active}", "ai_active": active}
 
 from pydantic import BaseModel
@@ -1,20 +1,39 @@
+import hashlib
 from typing import List, Annotated, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.core.database import get_db
-from app.models import Customer, Pet, User
-from app.schemas import customers
+from app.core.database import get_db, get_read_db
+from app.models import Customer, Pet, User, Order, OrderItem
+from app.models.customers import normalize_phone
+from app.schemas import customers, products
 from app.api import deps
+from app.services import ai_context, customer_lookup, customer_profiles, recommendations
 
 router = APIRouter()
 
+# Loader strategy for endpoints returning schemas.Customer (relationships never load implicitly)
+_CUSTOMER_DETAIL = (
+    selectinload(Customer.pets),
+    selectinload(Customer.orders).selectinload(Order.items).selectinload(OrderItem.product),
+)
+
+async def _get_customer_detail(db: AsyncSession, customer_id: int) -> Optional[Customer]:
+    result = await db.execute(
+        select(Customer)
+        .where(Customer.id == customer_id)
+        .options(*_CUSTOMER_DETAIL)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
 # Customers
 @router.get("/", response_model=List[customers.Customer])
 async def read_customers(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
@@ -29,19 +48,7 @@ async def read_customers(
                 Customer.phone.ilike(f"%{search}%")
             )
         )
-    query = query.offset(skip).limit(limit)
-    result = await db.execute(query)
-    # Eager loading might be needed if not handled by relationship default, but let's try basic first
-    # We need to import Order and OrderItem to use them in selectinload if they are not available via string or attribute
-    # However, SQLAlchemy can often infer from the model class attributes. 
-    # But Customer.orders is a relationship to Order. Order.items is a relationship to OrderItem.
-    # To chain, we need the classes usually or simpler strings if registry works.
-    # Safest is to import them inside or at top.
-    from app.models.orders import Order, OrderItem
-    
-    query = query.options(
-        selectinload(Customer.orders).selectinload(Order.items).selectinload(OrderItem.product)
-    )
+    query = query.offset(skip).limit(limit).options(*_CUSTOMER_DETAIL)
     result = await db.execute(query)
     return result.scalars().unique().all() # unique() for relationships
 
@@ -51,84 +58,83 @@ async def create_customer(
     db: Annotated[AsyncSession, Depends(get_db)],
     current_user: User = Depends(deps.get_current_user)
 ):
+    if customer_in.phone:
+        result = await db.execute(select(Customer.id).where(Customer.phone_key == normalize_phone(customer_in.phone)))
+        if result.scalar() is not None:
+            raise HTTPException(status_code=400, detail="Ya existe un cliente con ese número de teléfono.")
     db_customer = Customer(**customer_in.model_dump())
     db.add(db_customer)
     await db.commit()
-    await db.refresh(db_customer)
-    await db.refresh(db_customer)
-    return db_customer
+    return await _get_customer_detail(db, db_customer.id)
 
-@router.get("/phone/{phone}", response_model=customers.Customer, summary="Get Customer by Phone", description="Retrieve a customer details. If not found, CREATES a new customer using the provided name.", responses={201: {"description": "Customer created"}, 200: {"description": "Customer found"}})
+def _etag_response(request: Request, body: bytes) -> Response:
+    """JSON response with a strong ETag of its body; 304 when the client already has it."""
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/phone/{phone}", response_model=customers.Customer, summary="Get Customer by Phone", responses={304: {"description": "Not modified (If-None-Match)"}, 404: {"description": "Customer not found"}})
 async def read_customer_by_phone(
     phone: str,
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Customer details with pets, orders and the last 10 messages, read from the customer_profiles
+    read model in a single row.
+    Read-only (use PUT /customers/by-phone/{phone} to get-or-create) and revalidatable with If-None-Match.
+    """
+    profile = await customer_profiles.get(db, phone)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    body = customers.Customer.model_validate(customer_profiles.as_customer(profile)).model_dump_json().encode()
+    return _etag_response(request, body)
+
+@router.put("/by-phone/{phone}", response_model=customers.Customer, summary="Get or Create Customer by Phone", responses={201: {"description": "Customer created"}, 200: {"description": "Customer found (and updated)"}})
+async def upsert_customer_by_phone(
+    phone: str,
+    customer_in: customers.CustomerUpsert,
+    response: Response,
     db: Annotated[AsyncSession, Depends(get_db)],
-    current_user: User = Depends(deps.get_current_user),
-    name: Optional[str] = None
+    name: Optional[str] = Query(None, description="Name for a new customer; an existing customer keeps theirs"),
+    current_user: User = Depends(deps.get_current_user)
 ):
-    from app.models.orders import Order, OrderItem
-    
-    # Handle optional country code (506)
-    phones_to_check = [phone]
-    clean_phone = phone
-    if phone.startswith("506") and len(phone) > 8:
-        clean_phone = phone[3:]
-        phones_to_check.append(clean_phone)
-    elif len(phone) == 8:
-        phones_to_check.append(f"506{phone}")
-    
-    query = select(Customer).where(Customer.phone.in_(phones_to_check))
-    query = query.options(
-        selectinload(Customer.orders).selectinload(Order.items).selectinload(OrderItem.product),
-        selectinload(Customer.pets)
-    )
-    
-    result = await db.execute(query)
-    customer = result.scalars().first()
-    
-    if not customer:
-        # Create new customer logic if not found
-        # Prefer the clean phone (8 digits) for storage if possible
-        new_customer = Customer(
-            phone=clean_phone,
-            full_name=name or "Cliente Nuevo", # Default name if not provided
-            email=None, 
-            is_active=True
+    """
+    Atomic get-or-create on the normalized phone (INSERT ... ON CONFLICT on the unique phone key),
+    so concurrent calls for the same phone return the same customer. Fields in the body are set
+    on the new or existing customer.
+    """
+    fields = customer_in.model_dump(exclude_unset=True)
+    try:
+        customer_id, created = await customer_lookup.get_or_create(
+            db, phone, **{"full_name": name or "Cliente Nuevo", "is_active": True, **fields}
         )
-        db.add(new_customer)
-        await db.commit()
-        await db.refresh(new_customer)
-        customer = new_customer
-        
-    # Inject recent interactions (last 10)
-    from app.models.chat import ChatMessage
-    chat_query = select(ChatMessage).where(ChatMessage.customer_phone.in_(phones_to_check)).order_by(ChatMessage.created_at.desc()).limit(10)
-    chat_result = await db.execute(chat_query)
-    # Reverse to return oldest to newest (chronological order)
-    recent_msgs = chat_result.scalars().all()[::-1]
-    setattr(customer, 'recent_interactions', recent_msgs)
-        
-    return customer
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not created and fields:
+        result = await db.execute(select(Customer).where(Customer.id == customer_id))
+        customer = result.scalars().one()
+        for field, value in fields.items():
+            setattr(customer, field, value)
+    await db.commit()
+    if created:
+        response.status_code = status.HTTP_201_CREATED
+    customer_lookup.invalidate(phone)
+    ai_context.invalidate(phone)
+    return await _get_customer_detail(db, customer_id)
 
 @router.get("/{phone}", response_model=customers.Customer)
 async def read_customer(
     phone: str,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: User = Depends(deps.get_current_user)
 ):
-    # Handle optional country code (506)
-    phones_to_check = [phone]
-    if phone.startswith("506") and len(phone) > 8:
-        phones_to_check.append(phone[3:])
-    elif len(phone) == 8:
-        phones_to_check.append(f"506{phone}")
-
     # We need to fetch pets & orders as well to be fully compliant with Customer model
-    from app.models.orders import Order, OrderItem
-    query = select(Customer).where(Customer.phone.in_(phones_to_check))
-    query = query.options(
-        selectinload(Customer.orders).selectinload(Order.items).selectinload(OrderItem.product),
-        selectinload(Customer.pets)
-    )
+    query = select(Customer).where(customer_lookup.phone_match(phone)).options(*_CUSTOMER_DETAIL)
     result = await db.execute(query)
     customer = result.scalars().first()
     if not customer:
@@ -136,7 +142,7 @@ async def read_customer(
         
     # Inject recent interactions (last 10)
     from app.models.chat import ChatMessage
-    chat_query = select(ChatMessage).where(ChatMessage.customer_phone.in_(phones_to_check)).order_by(ChatMessage.created_at.desc()).limit(10)
+    chat_query = select(ChatMessage).where(ChatMessage.customer_phone.in_(customer_lookup.message_phones(phone))).order_by(ChatMessage.created_at.desc()).limit(10)
     chat_result = await db.execute(chat_query)
     recent_msgs = chat_result.scalars().all()[::-1]
     setattr(customer, 'recent_interactions', recent_msgs)
@@ -153,14 +159,7 @@ async def create_pet(
     db: Annotated[AsyncSession, Depends(get_db)],
     current_user: User = Depends(deps.get_current_user)
 ):
-    # Handle optional country code (506)
-    phones_to_check = [phone]
-    if phone.startswith("506") and len(phone) > 8:
-        phones_to_check.append(phone[3:])
-    elif len(phone) == 8:
-        phones_to_check.append(f"506{phone}")
-
-    result = await db.execute(select(Customer).where(Customer.phone.in_(phones_to_check)))
+    result = await db.execute(select(Customer).where(customer_lookup.phone_match(phone)))
     customer = result.scalars().first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
@@ -169,6 +168,7 @@ async def create_pet(
     db.add(db_pet)
     await db.commit()
     await db.refresh(db_pet)
+    ai_context.invalidate(customer.phone)
     return db_pet
 
 @router.put("/{phone}", response_model=customers.Customer)
@@ -178,14 +178,7 @@ async def update_customer(
     db: Annotated[AsyncSession, Depends(get_db)],
     current_user: User = Depends(deps.get_current_user)
 ):
-    # Handle optional country code (506)
-    phones_to_check = [phone]
-    if phone.startswith("506") and len(phone) > 8:
-        phones_to_check.append(phone[3:])
-    elif len(phone) == 8:
-        phones_to_check.append(f"506{phone}")
-
-    result = await db.execute(select(Customer).where(Customer.phone.in_(phones_to_check)))
+    result = await db.execute(select(Customer).where(customer_lookup.phone_match(phone)))
     customer = result.scalars().first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
@@ -233,32 +226,28 @@ async def update_customer(
 
     db.add(customer)
     await db.commit()
-    await db.refresh(customer)
-    return customer
+    customer_lookup.invalidate(customer.phone)
+    ai_context.invalidate(customer.phone)
+    return await _get_customer_detail(db, customer.id)
 
 # Fetch orders for a specific customer
 @router.get("/{phone}/orders", response_model=List[dict]) # Return simple dict or create OrderSchema
 async def read_customer_orders(
     phone: str,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: User = Depends(deps.get_current_user)
 ):
-    # Handle optional country code (506)
-    phones_to_check = [phone]
-    if phone.startswith("506") and len(phone) > 8:
-        phones_to_check.append(phone[3:])
-    elif len(phone) == 8:
-        phones_to_check.append(f"506{phone}")
-
-    result = await db.execute(select(Customer).where(Customer.phone.in_(phones_to_check)))
+    result = await db.execute(select(Customer).where(customer_lookup.phone_match(phone)))
     customer = result.scalars().first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
 
-    # Need to import Order model here or at top
-    from app.models.orders import Order
-    
-    result = await db.execute(select(Order).where(Order.customer_id == customer.id).order_by(Order.created_at.desc()))
+    result = await db.execute(
+        select(Order)
+        .where(Order.customer_id == customer.id)
+        .order_by(Order.created_at.desc())
+        .options(selectinload(Order.items))
+    )
     orders = result.scalars().all()
     
     # Return simplified list for the frontend table
@@ -276,6 +265,34 @@ async def read_customer_orders(
         for o in orders
     ]
 
+@router.get("/{phone}/profile", response_model=customers.CustomerProfile)
+async def read_customer_profile(
+    phone: str,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Customer, pets, lifetime value, open and last orders, favorite products and the last 10
+    messages, read from the customer_profiles read model in a single row.
+    """
+    profile = await customer_profiles.get(db, phone)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return profile
+
+@router.get("/{phone}/recommendations", response_model=List[products.RelatedProduct])
+async def read_customer_recommendations(
+    phone: str,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    limit: int = 10,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """Products this customer hasn't bought that customers with similar purchases did, for their pets' species."""
+    items = await recommendations.for_customer(db, phone, limit=limit)
+    if items is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return items
+
 @router.delete("/{phone}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_customer(
     phone: str,
@@ -285,28 +302,27 @@ async def delete_customer(
     # Only admins should delete? For now assume verified user is enough or check role
     # if current_user.role != "admin": raise ...
     
-    # Handle optional country code (506)
-    phones_to_check = [phone]
-    if phone.startswith("506") and len(phone) > 8:
-        phones_to_check.append(phone[3:])
-    elif len(phone) == 8:
-        phones_to_check.append(f"506{phone}")
-
-    result = await db.execute(select(Customer).where(Customer.phone.in_(phones_to_check)))
+    # Pets are deleted with the customer; orders are checked below and must be empty
+    result = await db.execute(
+        select(Customer)
+        .where(customer_lookup.phone_match(phone))
+        .options(selectinload(Customer.pets))
+    )
     customer = result.scalars().first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
         
     # Check if customer has orders
-    # Avoid circular import by doing a direct DB check or importing inside
-    from app.models.orders import Order
-    
     orders_check = await db.execute(select(Order.id).where(Order.customer_id == customer.id).limit(1))
     if orders_check.scalars().first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
             detail="No se puede eliminar el cliente porque tiene órdenes asociadas. Considere desactivarlo en su lugar."
         )
+    # Known to be empty: spares the flush loading the collection to null out order FKs
+    set_committed_value(customer, "orders", [])
 
     await db.delete(customer)
     await db.commit()
+    customer_lookup.invalidate(customer.phone)
+    ai_context.invalidate(customer.phone)
@@ -1,34 +1,163 @@
 from typing import List, Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from fastapi.responses import FileResponse
 import os
+import base64
+from datetime import datetime, date, timedelta
+from decimal import Decimal
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func, case, tuple_
 from sqlalchemy.orm import selectinload
 
-from app.core.database import get_db
-from app.models import Order, OrderItem, Product, Customer, InventoryMovement, User
+from app.core.database import get_db, get_read_db
+from app.models import Order, OrderItem, Product, Customer, User
 from app.schemas import orders
 from app.api import deps
-from app.core.whatsapp import whatsapp_client
+from app.core.cache import TTLCache
+from app.core.timezone import cr_today, cr_month_start, cr_next_month_start, cr_date_to_utc
+from app.models.reports import DailySales
+from app.models.order_events import OrderEvent
+from app.services import sales_rollup, outbox, order_events, inventory_ledger
 
 router = APIRouter()
 
-@router.get("/", response_model=List[orders.Order])
+# Loader strategy for endpoints returning schemas.Order (relationships never load implicitly)
+_ORDER_DETAIL = (
+    selectinload(Order.customer),
+    selectinload(Order.items).selectinload(OrderItem.product),
+)
+
+def _encode_cursor(created_at: datetime, order_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{order_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/", response_model=List[orders.OrderListItem])
 async def read_orders(
-    db: Annotated[AsyncSession, Depends(get_db)],
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, description="Offset paging, kept for existing callers; prefer `cursor`"),
+    limit: int = Query(100, ge=1, le=500),
     status: Optional[str] = None,
     current_user: User = Depends(deps.get_current_user)
 ):
-    query = select(Order).options(selectinload(Order.customer), selectinload(Order.items))
+    """
+    List orders newest first using keyset pagination on (created_at, id).
+    When there are more rows, the `X-Next-Cursor` header (and a `Link: rel="next"`) carries the
+    cursor to pass as `cursor` for the following page; `skip` still works but degrades with depth.
+    Rows are compact (no nested items/products); use GET /orders/{id} for detail.
+    """
+    item_count = (
+        select(func.count(OrderItem.id))
+        .where(OrderItem.order_id == Order.id)
+        .correlate(Order)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            Order.id, Order.customer_id, Order.status, Order.total_amount, Order.payment_method,
+            Order.payment_proof, Order.delivery_address, Order.created_via, Order.created_at,
+            Customer.full_name.label("customer_name"),
+            Customer.phone.label("customer_phone"),
+            Customer.address.label("customer_address"),
+            item_count.label("item_count"),
+        )
+        .join(Customer, Customer.id == Order.customer_id)
+    )
     if status:
         query = query.where(Order.status == status)
-    
-    query = query.order_by(Order.created_at.desc()).offset(skip).limit(limit)
+    if cursor:
+        query = query.where(tuple_(Order.created_at, Order.id) < tuple_(*_decode_cursor(cursor)))
+    elif skip:
+        query = query.offset(skip)
+
+    query = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1)
     result = await db.execute(query)
-    return result.scalars().all()
+    rows = result.mappings().all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        response.headers["X-Next-Cursor"] = next_cursor
+        next_url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor, limit=limit)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return rows
+
+# Dashboard KPIs are polled on every page load; a short TTL keeps them cheap without going stale.
+_stats_cache = TTLCache(ttl_seconds=30, max_size=4)
+
+@router.get("/stats", response_model=orders.OrderStats)
+async def read_order_stats(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Dashboard aggregates (today / current month) read from the daily_sales rollup,
+    which is keyed by Costa Rica local date.
+    Cancelled orders count towards the order total but not towards sales.
+    """
+    today = cr_today()
+    cached = _stats_cache.get(today)
+    if cached is not None:
+        return cached
+
+    query = (
+        select(
+            DailySales.day,
+            func.sum(DailySales.order_count),
+            func.coalesce(func.sum(case((DailySales.status != "cancelled", DailySales.total_amount), else_=0)), 0),
+        )
+        .where(DailySales.day >= cr_month_start(today), DailySales.day < cr_next_month_start(today))
+        .group_by(DailySales.day)
+    )
+    result = await db.execute(query)
+
+    stats = {
+        "day": today,
+        "orders_today": 0,
+        "sales_today": Decimal("0"),
+        "orders_this_month": 0,
+        "monthly_sales": Decimal("0"),
+    }
+    for row_day, count, sales in result.all():
+        sales = Decimal(str(sales))
+        stats["orders_this_month"] += count
+        stats["monthly_sales"] += sales
+        if row_day == today:
+            stats["orders_today"] = count
+            stats["sales_today"] = sales
+
+    _stats_cache.set(today, stats)
+    return stats
+
+@router.get("/reports/status-flow", response_model=orders.OrderStatusFlowReport)
+async def read_order_status_flow(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    start: Optional[date] = Query(None, description="First CR local date (YYYY-MM-DD), defaults to 30 days ago"),
+    end: Optional[date] = Query(None, description="Last CR local date (YYYY-MM-DD), defaults to today"),
+    current_user: User = Depends(deps.get_current_active_admin)
+):
+    """
+    Order funnel and time-in-state latencies (e.g. how long orders sit awaiting receipts),
+    computed from the order_events history.
+    """
+    end = end or cr_today()
+    start = start or (end - timedelta(days=30))
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    states = await order_events.status_flow_report(
+        db, cr_date_to_utc(start), cr_date_to_utc(end + timedelta(days=1))
+    )
+    return {"start": start, "end": end, "states": states}
 
 @router.post("/", response_model=orders.Order)
 async def create_order(
@@ -87,23 +216,25 @@ async def create_order(
                 
             subtotal = product.price * item.quantity
             db_item = OrderItem(
-                order_id=db_order.id, # We can assign this after flush or add
                 product_id=product.id,
                 quantity=item.quantity,
                 unit_price_at_moment=product.price,
                 subtotal=subtotal
             )
-            db.add(db_item)
+            # Appending through the relationship sets order_id on flush
+            db_order.items.append(db_item)
             total_amount += subtotal
             
         db_order.total_amount = total_amount
     
+    await sales_rollup.record_order_change(db, None, db_order)
+    order_events.record_transition(db, db_order, None, source="web", user_id=getattr(current_user, 'id', None))
+
     # Commit ONLY when order AND items are ready to avoid phantom empty orders
     await db.commit()
-    await db.refresh(db_order)
         
     # Validation: Return with items loaded
-    query = select(Order).where(Order.id == db_order.id).options(selectinload(Order.items))
+    query = select(Order).where(Order.id == db_order.id).options(*_ORDER_DETAIL)
     result = await db.execute(query)
     return result.scalars().first()
 
@@ -114,11 +245,12 @@ async def add_order_item(
     db: Annotated[AsyncSession, Depends(get_db)],
     current_user: User = Depends(deps.get_current_user)
 ):
-    order = await db.get(Order, order_id)
+    order = await db.get(Order, order_id, options=_ORDER_DETAIL)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     if order.status != "created":
         raise HTTPException(status_code=400, detail="Cannot add items to initialized order")
+    before = sales_rollup.snapshot(order)
         
     product = await db.get(Product, item_in.product_id)
     if not product:
@@ -136,15 +268,16 @@ async def add_order_item(
         unit_price_at_moment=product.price,
         subtotal=subtotal
     )
-    db.add(db_item)
+    order.items.append(db_item)
     
     # Update Order Total
     order.total_amount += subtotal
     
+    await sales_rollup.record_order_change(db, before, order)
     await db.commit()
     # Refresh logic might be tricky with relationships, let's re-fetch with loading
     
-    query = select(Order).where(Order.id == order_id).options(selectinload(Order.items))
+    query = select(Order).where(Order.id == order_id).options(*_ORDER_DETAIL)
     result = await db.execute(query)
     return result.scalars().first()
 
@@ -155,9 +288,7 @@ async def confirm_order(
     current_user: User = Depends(deps.get_current_user)
 ):
     # Eager load items and products to lock/check stock
-    query = select(Order).where(Order.id == order_id).options(
-        selectinload(Order.items).selectinload(OrderItem.product)
-    )
+    query = select(Order).where(Order.id == order_id).options(*_ORDER_DETAIL)
     result = await db.execute(query)
     order = result.scalars().first()
     
@@ -165,6 +296,7 @@ async def confirm_order(
         raise HTTPException(status_code=404, detail="Order not found")
     if order.status != "created":
         raise HTTPException(status_code=400, detail="Order already confirmed or cancelled")
+    before = sales_rollup.snapshot(order)
         
     # Transactional Check & Update
     # Note: For strict concurrency we might need `with_for_update` on products, 
@@ -178,21 +310,15 @@ async def confirm_order(
                 detail=f"Stock changed for {item.product.name}. Available: {item.product.stock}"
             )
         
-        # Deduct stock
-        item.product.stock -= item.quantity
-        
-        # Log movement
-        movement = InventoryMovement(
-            product_id=item.product.id,
-            type="out",
-            quantity=item.quantity,
-            reason=f"Order #{order.id}",
-            created_by_user_id=current_user.id
-        )
-        db.add(movement)
+        # Deduct stock (and log the movement)
+        inventory_ledger.record(db, item.product, "out", item.quantity, f"Order #{order.id}", current_user.id)
         
     order.status = "pending_payment"
+    await sales_rollup.record_order_change(db, before, order)
+    outbox.enqueue_order_status_change(db, order, "created")
+    order_events.record_transition(db, order, "created", source="web", user_id=current_user.id)
     await db.commit()
+    outbox.notify()
     
     # Re-fetch with all relationships loaded to avoid MissingGreenlet during serialization
     # refresh() is shallow and might expire relationships
@@ -203,23 +329,32 @@ async def confirm_order(
 @router.get("/{order_id}", response_model=orders.Order)
 async def read_order(
     order_id: int,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: User = Depends(deps.get_current_user)
 ):
-    query = select(Order).where(Order.id == order_id).options(
-        selectinload(Order.customer), 
-        selectinload(Order.items).selectinload(OrderItem.product)
-    )
+    query = select(Order).where(Order.id == order_id).options(*_ORDER_DETAIL)
     result = await db.execute(query)
     order = result.scalars().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
+@router.get("/{order_id}/events", response_model=List[orders.OrderEvent])
+async def read_order_events(
+    order_id: int,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: User = Depends(deps.get_current_user)
+):
+    """Status history of an order, oldest first."""
+    result = await db.execute(
+        select(OrderEvent).where(OrderEvent.order_id == order_id).order_by(OrderEvent.created_at, OrderEvent.id)
+    )
+    return result.scalars().all()
+
 @router.get("/{order_id}/receipt")
 async def get_order_receipt(
     order_id: int,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: User = Depends(deps.get_current_active_admin)
 ):
     """
@@ -263,16 +398,14 @@ async def update_order(
     - Can update status, payment info.
     - Can update 'items' (replace all existing items) ONLY if status is 'created'.
     """
-    query = select(Order).where(Order.id == order_id).options(
-        selectinload(Order.customer), 
-        selectinload(Order.items).selectinload(OrderItem.product)
-    )
+    query = select(Order).where(Order.id == order_id).options(*_ORDER_DETAIL)
     result = await db.execute(query)
     order = result.scalars().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
     old_status = order.status
+    before = sales_rollup.snapshot(order)
     update_data = order_in.model_dump(exclude_unset=True)
     
     # Handle Items Update
@@ -315,33 +448,16 @@ async def update_order(
         setattr(order, field, value)
 
     db.add(order)
+    await sales_rollup.record_order_change(db, before, order)
+    # Customer notifications are delivered by the outbox relay, never inline
+    outbox.enqueue_order_status_change(db, order, old_status)
+    order_events.record_transition(db, order, old_status, source="web", user_id=current_user.id)
     await db.commit()
+    outbox.notify()
     
     # Reload with items
-    query = select(Order).where(Order.id == order_id).options(
-        selectinload(Order.customer), 
-        selectinload(Order.items).selectinload(OrderItem.product)
-    )
+    query = select(Order).where(Order.id == order_id).options(*_ORDER_DETAIL)
     result = await db.execute(query)
     updated_order = result.scalars().first()
     
-    if old_status != "paid" and updated_order.status == "paid":
-        if updated_order.customer and updated_order.customer.phone:
-            try:
-                from app.models.chat import ChatMessage
-                message = f"Hola {updated_order.customer.full_name} el pago del pedido {updated_order.id} fue confirmado, el pedido se encuentra en preparación"
-                await whatsapp_client.send_message(to=updated_order.customer.phone, content=message)
-                
-                # Save into chat history
-                ai_msg = ChatMessage(
-                    customer_phone=updated_order.customer.phone,
-                    sender="ai",
-                    message_type="text",
-                    content=message
-                )
-                db.add(ai_msg)
-                await db.commit()
-            except Exception as e:
-                print(f"Error sending WhatsApp confirmation for order {updated_order.id}: {e}")
-
     return updated_order
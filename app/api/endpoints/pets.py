@@ -2,8 +2,9 @@ from typing import List, Annotated, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.models import Pet, Customer, User
 from app.schemas import customers
 from app.api import deps
@@ -13,7 +14,7 @@ router = APIRouter()
 @router.get("/{pet_id}", response_model=customers.Pet)
 async def read_pet(
     pet_id: int,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: User = Depends(deps.get_current_user)
 ):
     result = await db.execute(select(Pet).where(Pet.id == pet_id))
@@ -49,7 +50,8 @@ async def delete_pet(
     db: Annotated[AsyncSession, Depends(get_db)],
     current_user: User = Depends(deps.get_current_user)
 ):
-    result = await db.execute(select(Pet).where(Pet.id == pet_id))
+    # Orders keep their history; deleting the pet only clears their pet_id
+    result = await db.execute(select(Pet).where(Pet.id == pet_id).options(selectinload(Pet.orders)))
     pet = result.scalars().first()
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
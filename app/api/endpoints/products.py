@@ -1,18 +1,20 @@
+from datetime import datetime
 from typing import List, Annotated, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_
 
-from app.core.database import get_db
-from app.models import Product, User
+from app.core.database import AsyncSessionLocal, get_db, get_read_db
+from app.models import Product, StockForecast, User
 from app.schemas import products
 from app.api import deps
+from app.services import inventory_forecast, inventory_ledger, recommendations
 
 router = APIRouter()
 
 @router.get("/", response_model=products.InventoryResponse)
 async def read_products(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
@@ -46,11 +48,12 @@ async def read_products(
     config = result_config.scalars().first()
 
     if not config:
-        # Create default config if not exists
-        config = InventoryConfig()
-        db.add(config)
-        await db.commit()
-        await db.refresh(config)
+        # Create default config if not exists (on the primary: db may be the read replica)
+        async with AsyncSessionLocal() as primary:
+            config = InventoryConfig()
+            primary.add(config)
+            await primary.commit()
+            await primary.refresh(config)
 
     # 3. Handle fields selection (if applying to inventory items)
     # The return model is creating a structure, if 'fields' param is used, it might return Dicts instead of Product objects
@@ -118,6 +121,45 @@ async def update_inventory_config(
     await db.refresh(config)
     return config
 
+@router.get("/inventory/reconcile", response_model=List[products.StockDrift])
+async def reconcile_inventory(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: User = Depends(deps.get_current_active_admin)
+):
+    """Products whose stock disagrees with the inventory ledger (empty when everything balances)."""
+    return await inventory_ledger.reconcile(db)
+
+@router.get("/inventory/forecast", response_model=List[products.StockForecast])
+async def read_stock_forecast(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    needs_reorder: bool = Query(False, description="Only products at or below their reorder point"),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """Suggested reorder points and days until stockout, as of the last forecast refresh."""
+    query = (
+        select(StockForecast, Product.sku, Product.name, Product.stock, Product.min_stock)
+        .join(Product, Product.id == StockForecast.product_id)
+        .order_by(StockForecast.days_until_stockout.is_(None), StockForecast.days_until_stockout, Product.id)
+    )
+    if needs_reorder:
+        query = query.where(Product.stock <= StockForecast.reorder_point)
+    result = await db.execute(query)
+    return [
+        {**{c.key: getattr(forecast, c.key) for c in StockForecast.__table__.columns},
+         "sku": sku, "name": name, "stock": stock, "min_stock": min_stock}
+        for forecast, sku, name, stock, min_stock in result.all()
+    ]
+
+@router.post("/inventory/forecast")
+async def refresh_stock_forecast(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: User = Depends(deps.get_current_active_admin)
+):
+    """Recompute the forecast for the whole catalog (also run periodically by scripts/forecast_inventory.py)."""
+    count = await inventory_forecast.refresh(db)
+    await db.commit()
+    return {"message": "Forecast refreshed", "products": count}
+
 @router.post("/", response_model=products.Product)
 async def create_product(
     product_in: products.ProductCreate,
@@ -132,8 +174,11 @@ async def create_product(
             detail="Product with this SKU already exists"
         )
         
-    db_product = Product(**product_in.model_dump())
+    product_data = product_in.model_dump()
+    initial_stock = product_data.pop("stock")
+    db_product = Product(**product_data, stock=0)
     db.add(db_product)
+    inventory_ledger.record(db, db_product, "in", initial_stock, "Initial stock", current_user.id)
     await db.commit()
     await db.refresh(db_product)
     return db_product
@@ -141,7 +186,7 @@ async def create_product(
 @router.get("/{product_id}", response_model=products.Product)
 async def read_product(
     product_id: int,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: User = Depends(deps.get_current_user)
 ):
     result = await db.execute(select(Product).where(Product.id == product_id))
@@ -163,16 +208,44 @@ async def update_product(
         raise HTTPException(status_code=404, detail="Product not found")
         
     update_data = product_in.model_dump(exclude_unset=True)
+    stock = update_data.pop("stock", None)
     for field, value in update_data.items():
         setattr(product, field, value)
+    if stock is not None:
+        inventory_ledger.set_stock(db, product, stock, "Manual edit", current_user.id)
         
     await db.commit()
     await db.refresh(product)
     return product
 
+@router.get("/{product_id}/stock", response_model=products.StockAsOf)
+async def read_product_stock(
+    product_id: int,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    at: Optional[datetime] = Query(None, description="Point in time (UTC); defaults to now"),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """Stock of a product at a point in time, from the inventory ledger."""
+    result = await db.execute(select(Product.id).where(Product.id == product_id))
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    at = at or datetime.utcnow()
+    return {"product_id": product_id, "at": at, "stock": await inventory_ledger.stock_as_of(db, product_id, at)}
+
+@router.get("/{product_id}/related", response_model=List[products.RelatedProduct])
+async def read_related_products(
+    product_id: int,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    species: Optional[str] = Query(None, description="Only products suited to this species (e.g. Perro)"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """Products frequently bought together with this one, from the in-memory recommendation index."""
+    return await recommendations.related(db, product_id, species=species, limit=limit)
+
 @router.get("/export/json")
 async def export_products_json(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: User = Depends(deps.get_current_active_admin)
 ):
     result = await db.execute(select(Product))
@@ -215,13 +288,19 @@ async def import_products_json(
         if existing_product:
             # Update
             update_data = p_in.model_dump(exclude_unset=True)
+            stock = update_data.pop("stock", None)
             for field, value in update_data.items():
                 setattr(existing_product, field, value)
+            if stock is not None:
+                inventory_ledger.set_stock(db, existing_product, stock, "JSON import", current_user.id)
             count_updated += 1
         else:
             # Create
-            db_product = Product(**p_in.model_dump())
+            product_data = p_in.model_dump()
+            initial_stock = product_data.pop("stock")
+            db_product = Product(**product_data, stock=0)
             db.add(db_product)
+            inventory_ledger.record(db, db_product, "in", initial_stock, "JSON import", current_user.id)
             count_created += 1
             
     await db.commit()
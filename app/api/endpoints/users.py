@@ -6,7 +6,7 @@ from app.api import deps
 from app.core.database import get_db
 from app.models.users import User
 from app.schemas import users
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async
 
 router = APIRouter()
 
@@ -25,12 +25,13 @@ async def read_users(
 
 @router.get("/me", response_model=users.User)
 async def read_user_me(
-    current_user: User = Depends(deps.get_current_user),
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: deps.UserRef = Depends(deps.get_current_user),
 ) -> Any:
     """
     Get current user.
     """
-    return current_user
+    return await db.get(User, current_user.id)
 
 @router.post("/", response_model=users.User)
 async def create_user(
@@ -52,7 +53,7 @@ async def create_user(
     
     user_data = user_in.model_dump()
     password = user_data.pop("password")
-    user_data["password_hash"] = get_password_hash(password)
+    user_data["password_hash"] = await get_password_hash_async(password)
     
     db_user = User(**user_data)
     db.add(db_user)
@@ -81,7 +82,7 @@ async def update_user(
     update_data = user_in.model_dump(exclude_unset=True)
     
     if "password" in update_data and update_data["password"]:
-        hashed_password = get_password_hash(update_data["password"])
+        hashed_password = await get_password_hash_async(update_data["password"])
         del update_data["password"]
         update_data["password_hash"] = hashed_password
     
@@ -98,6 +99,7 @@ async def update_user(
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    deps.invalidate_user_cache()
     return user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -126,3 +128,4 @@ async def delete_user(
     
     await db.delete(user)
     await db.commit()
+    deps.invalidate_user_cache()
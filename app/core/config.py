@@ -7,8 +7,29 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "changethis"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    AUTH_CACHE_TTL_SECONDS: float = 30.0 # Decoded token + user snapshot cache in get_current_user
+    PASSWORD_HASH_WORKERS: int = 2 # bcrypt threads per worker process
+    PASSWORD_HASH_MAX_PENDING: int = 8 # bcrypt calls running or queued per worker process
+    LOGIN_RATE_LIMIT_ATTEMPTS: int = 5 # Login attempts per email per window (per worker process)
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: float = 60.0
     
     DATABASE_URL: str = "sqlite+aiosqlite:///./lavete.db"
+
+    DATABASE_READ_URL: str = "" # Optional read replica for GET endpoints; same engine profile
+    READ_PIN_SECONDS: float = 5.0 # After a write, the client reads from the primary for this long
+
+    # Engine profile (see app/core/database.py): "tuned" or "default"
+    DB_ENGINE_PROFILE: str = "tuned"
+    # SQLite
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 20000
+    SQLITE_MMAP_SIZE_MB: int = 128
+    # Postgres, per worker process (gunicorn -w 4 => up to 4 * (pool_size + max_overflow) connections)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800 # Seconds; below the managed database's idle connection timeout
+    DB_STATEMENT_CACHE_SIZE: int = 100 # asyncpg prepared statements per connection; 0 behind pgbouncer
     
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:8000", "http://localhost:3000"]
 
@@ -19,6 +40,67 @@ class Settings(BaseSettings):
     
     # n8n
     N8N_WEBHOOK_URL: str = ""
+    N8N_EVENTS_WEBHOOK_URL: str = "" # Order status notifications; disabled if empty
+
+    # Outbox relay
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 2.0
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_MAX_ATTEMPTS: int = 8
+
+    # Audit log writer (app/services/audit.py)
+    AUDIT_BATCH_SIZE: int = 200
+    AUDIT_FLUSH_INTERVAL_MS: int = 500
+    AUDIT_MAX_PENDING: int = 5000 # Requests that write wait while more rows than this are buffered
+
+    # Inventory forecast (app/services/inventory_forecast.py)
+    FORECAST_LOOKBACK_DAYS: int = 90
+    FORECAST_HALF_LIFE_DAYS: float = 14.0 # Weight of a day's demand halves every this many days back
+    FORECAST_HORIZON_DAYS: int = 120 # Stockouts further out are reported as None
+    FORECAST_LEAD_TIME_DAYS: int = 7 # Supplier lead time the reorder point has to cover
+    FORECAST_SERVICE_LEVEL_Z: float = 1.65 # Safety stock in demand std devs (~95% cycle service level)
+
+    # Pet refill reminders (app/services/refills.py)
+    REFILL_TEMPLATE_NAME: str = "" # Approved WhatsApp template ({{1}} name, {{2}} pet, {{3}} products); no reminders if empty
+    REFILL_TEMPLATE_LANGUAGE: str = "es"
+    REFILL_REMINDER_LEAD_DAYS: int = 3 # Remind this many days before the predicted refill date
+    REFILL_SENDS_PER_MINUTE: float = 20.0 # Reminders are spaced out at this rate...
+    REFILL_SEND_WINDOW_START_HOUR: int = 9 # ...within this Costa Rica local window
+    REFILL_SEND_WINDOW_END_HOUR: int = 18
+
+    # Template campaigns (app/services/campaigns.py)
+    CAMPAIGN_SENDS_PER_SECOND: float = 20.0 # Well under Meta's per-number throughput; 10k recipients in ~8 min
+    CAMPAIGN_CONCURRENCY: int = 8 # Sends in flight per campaign
+    CAMPAIGN_MAX_ATTEMPTS: int = 3
+    CAMPAIGN_THROTTLE_BACKOFF_SECONDS: float = 60.0 # Pause after Meta reports throttling
+    CAMPAIGN_POLL_INTERVAL_SECONDS: float = 5.0
+
+    # Co-purchase recommendations (app/services/recommendations.py)
+    RECOMMEND_LOOKBACK_DAYS: int = 365
+    RECOMMEND_HALF_LIFE_DAYS: float = 90.0 # An order's weight halves every this many days back
+    RECOMMEND_TOP_K: int = 10 # Neighbours kept per product / recommendations per customer
+    RECOMMEND_CACHE_SECONDS: float = 300.0 # In-memory index reload interval (per worker)
+
+    # n8n conversation context (app/services/ai_context.py)
+    AI_CONTEXT_MAX_TOKENS: int = 1500 # Budget for the whole document (estimated at 4 characters per token)
+    AI_CONTEXT_MESSAGES: int = 10
+    AI_CONTEXT_MESSAGE_CHARS: int = 400 # Longer messages are cut
+    AI_CONTEXT_PRODUCTS: int = 8
+    AI_CONTEXT_CACHE_SECONDS: float = 120.0 # Upper bound when no new message arrives
+
+    # Request instrumentation
+    SERVER_TIMING_ENABLED: bool = True # Server-Timing header with per-request DB stats
+    SLOW_QUERY_THRESHOLD_MS: float = 500.0 # Statements slower than this are logged with their parameters
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = "" # Per-logger overrides, e.g. "app.api.endpoints.webhook=DEBUG,sqlalchemy.engine=WARNING"
+    LOG_JSON: bool = True # One JSON object per line; False for plain text while developing
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.0 # Fraction of raw webhook/n8n payload dumps kept (DEBUG only; contain PII)
+
+    # Tracing (see app/core/tracing.py)
+    TRACING_EXPORTER: str = "" # "", "file" or "otlp"
+    TRACING_FILE: str = "traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
 
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
@@ -1,8 +1,62 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from opentelemetry.trace import SpanKind
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
+from app.core.metrics import DB_QUERY_SECONDS, DB_POOL_CHECKED_OUT
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a writer commits; busy_timeout waits for the lock
+    # instead of failing with "database is locked" during webhook bursts
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_MB) * 1024 * 1024}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def build_engine(url: str = settings.DATABASE_URL, profile: str = settings.DB_ENGINE_PROFILE) -> AsyncEngine:
+    """
+    Engine for `url` with the given profile: "tuned" (PRAGMAs on SQLite, sized and
+    pre-pinged pool on Postgres) or "default" (driver and SQLAlchemy defaults).
+    """
+    if profile == "default":
+        return create_async_engine(url, echo=False)
+    if profile != "tuned":
+        raise ValueError(f"Unknown DB_ENGINE_PROFILE: {profile!r}")
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+    if url.startswith("sqlite"):
+        new_engine = create_async_engine(url, echo=False)
+        event.listen(new_engine.sync_engine, "connect", _sqlite_pragmas)
+        return new_engine
+
+    connect_args = {}
+    if "+asyncpg" in url:
+        # 0 when running behind pgbouncer in transaction mode
+        connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    return create_async_engine(
+        url,
+        echo=False,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+    )
+
+engine = build_engine()
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -11,9 +65,127 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False,
 )
 
+# Optional read replica; replication lag is covered by get_read_db's pin to the primary
+read_engine = build_engine(settings.DATABASE_READ_URL) if settings.DATABASE_READ_URL else None
+
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+) if read_engine is not None else None
+
 class Base(DeclarativeBase):
     pass
 
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+    # Backpressure: a request that published audit rows waits here if the audit writer has fallen
+    # behind (see app.services.audit); reads and other sessions don't
+    if session.info.get("audit_published"):
+        from app.services import audit
+        await audit.wait_for_capacity()
+
+class QueryStats:
+    """SQL statements executed while handling one request (see app.core.middleware)."""
+    __slots__ = ("count", "total_seconds", "slowest_seconds", "slowest_statement")
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+# Set by the request middleware; None for background work (outbox relay, scripts)
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+    # Child of whatever span is current (request, webhook stage); a no-op span when tracing is off
+    span = tracer.start_span("db.query", kind=SpanKind.CLIENT)
+    if span.is_recording():
+        span.set_attribute("db.system", conn.dialect.name)
+        span.set_attribute("db.statement", statement[:1000])
+    conn.info.setdefault("query_span", []).append(span)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start_time"].pop()
+    conn.info["query_span"].pop().end()
+    DB_QUERY_SECONDS.observe(seconds)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+    if seconds * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        logger.warning("Slow query (%.1f ms): %s | params=%r", seconds * 1000, statement, parameters)
+
+def _handle_error(exception_context):
+    # after_cursor_execute doesn't run for failed statements; drop their start time and close the span
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+        span = conn.info["query_span"].pop()
+        span.record_exception(exception_context.original_exception)
+        span.end()
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+def _on_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+def _instrument(target: AsyncEngine):
+    for name, listener in (
+        ("before_cursor_execute", _before_cursor_execute),
+        ("after_cursor_execute", _after_cursor_execute),
+        ("handle_error", _handle_error),
+        ("checkout", _on_checkout),
+        ("checkin", _on_checkin),
+    ):
+        event.listen(target.sync_engine, name, listener)
+
+_instrument(engine)
+if read_engine is not None:
+    _instrument(read_engine)
+
+class ReadPin:
+    """Set when the current request commits on the primary (see ReadYourWritesMiddleware)."""
+    __slots__ = ("wrote",)
+
+    def __init__(self):
+        self.wrote = False
+
+current_read_pin: ContextVar[Optional[ReadPin]] = ContextVar("current_read_pin", default=None)
+
+@event.listens_for(engine.sync_engine, "commit")
+def _on_primary_commit(conn):
+    pin = current_read_pin.get()
+    if pin is not None:
+        pin.wrote = True
+
+READ_PIN_COOKIE = "lavete_primary_until"
+
+def pinned_to_primary(request: Request) -> bool:
+    """True while the client is inside the read-your-writes window after one of its writes."""
+    try:
+        return float(request.cookies.get(READ_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+async def get_read_db(request: Request):
+    """
+    Session for GET endpoints: the read replica when DATABASE_READ_URL is set, unless the client
+    wrote within the last READ_PIN_SECONDS (then the primary, so it sees its own changes).
+    """
+    session_factory = AsyncSessionLocal
+    if ReadSessionLocal is not None and not pinned_to_primary(request):
+        session_factory = ReadSessionLocal
+    async with session_factory() as session:
+        yield session
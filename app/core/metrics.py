@@ -0,0 +1,80 @@
+"""
+Prometheus metrics, exposed at /metrics.
+
+Under gunicorn every worker is its own process, so when PROMETHEUS_MULTIPROC_DIR is set the
+metrics are written to per-process files in that directory and merged at scrape time
+(see gunicorn.conf.py and DEPLOYMENT.md). Without it they live in the default in-process
+registry, which is what `uvicorn --reload` and the tests use.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+# Seconds; covers fast DB statements up to slow Graph API / n8n calls
+_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "lavete_http_request_duration_seconds", "HTTP request latency",
+    ["method", "route", "status"], buckets=_LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "lavete_db_query_duration_seconds", "SQL statement execution time",
+    buckets=_LATENCY_BUCKETS,
+)
+WHATSAPP_REQUEST_SECONDS = Histogram(
+    "lavete_whatsapp_request_duration_seconds", "WhatsApp Graph API call latency",
+    ["method", "status"], buckets=_LATENCY_BUCKETS,
+)
+N8N_REQUEST_SECONDS = Histogram(
+    "lavete_n8n_request_duration_seconds", "Calls to n8n webhooks",
+    ["target", "outcome"], buckets=_LATENCY_BUCKETS,
+)
+WEBHOOK_PROCESSING_SECONDS = Histogram(
+    "lavete_webhook_processing_duration_seconds", "Inbound WhatsApp webhook processing time",
+    ["outcome"], buckets=_LATENCY_BUCKETS,
+)
+BACKGROUND_TASKS_IN_FLIGHT = Gauge(
+    "lavete_background_tasks_in_flight", "Background tasks currently running",
+    ["task"], multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "lavete_db_pool_checked_out", "Database connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+
+@contextmanager
+def track_in_flight(task: str):
+    gauge = BACKGROUND_TASKS_IN_FLIGHT.labels(task)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+@contextmanager
+def observe_n8n(target: str):
+    """
+    Time a call to n8n. Callers set outcome["value"] to the response status; exceptions are
+    labelled with their class name.
+    """
+    started = time.perf_counter()
+    outcome = {"value": "ok"}
+    try:
+        yield outcome
+    except Exception as e:
+        outcome["value"] = type(e).__name__
+        raise
+    finally:
+        N8N_REQUEST_SECONDS.labels(target, outcome["value"]).observe(time.perf_counter() - started)
+
+def render_latest():
+    """Body and content type for the /metrics response."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
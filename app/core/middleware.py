@@ -0,0 +1,123 @@
+import logging
+import time
+
+from app.core.config import settings
+from app.core.database import READ_PIN_COOKIE, QueryStats, ReadPin, current_query_stats, current_read_pin
+from app.core.metrics import HTTP_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class QueryStatsMiddleware:
+    """
+    Per-request SQL statement count and DB time, collected by the engine hooks in
+    app.core.database. Sent back as a Server-Timing header and logged at DEBUG.
+    Plain ASGI (no BaseHTTPMiddleware) so streaming responses and background tasks are untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.SERVER_TIMING_ENABLED:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(stats, time.perf_counter() - started).encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "%s %s: %d queries, db %.1f ms, slowest %.1f ms, total %.1f ms",
+                    scope["method"], scope["path"], stats.count, stats.total_seconds * 1000,
+                    stats.slowest_seconds * 1000, (time.perf_counter() - started) * 1000,
+                )
+
+def _server_timing(stats: QueryStats, total_seconds: float) -> str:
+    return (
+        f'db;dur={stats.total_seconds * 1000:.1f};desc="{stats.count} queries", '
+        f"db-slowest;dur={stats.slowest_seconds * 1000:.1f}, "
+        f"app;dur={total_seconds * 1000:.1f}"
+    )
+
+class MetricsMiddleware:
+    """Request latency by route template (never the raw path, to keep label cardinality bounded)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_SECONDS.labels(scope["method"], _route_template(scope), str(status["code"])).observe(
+                time.perf_counter() - started
+            )
+
+def _route_template(scope) -> str:
+    """
+    "/api/v1/orders/{order_id}" for "/api/v1/orders/42". Rebuilt from the path params because
+    included routers don't expose their full prefixed path the same way across FastAPI versions.
+    """
+    if "route" not in scope and "endpoint" not in scope:
+        return "unmatched"
+    path = scope["path"]
+    for name, value in (scope.get("path_params") or {}).items():
+        value = str(value)
+        if "/" in value and path.endswith(value):
+            path = path[: -len(value)] + "{" + name + "}"
+    by_value = {str(v): k for k, v in (scope.get("path_params") or {}).items()}
+    return "/".join("{" + by_value[seg] + "}" if seg in by_value else seg for seg in path.split("/"))
+
+class ReadYourWritesMiddleware:
+    """
+    When a request commits on the primary, set a short-lived cookie so the same client's
+    following GETs skip the read replica until it has caught up (see get_read_db).
+    A cookie rather than process state because gunicorn workers don't share memory.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        pin = ReadPin()
+        token = current_read_pin.set(pin)
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and pin.wrote:
+                until = time.time() + settings.READ_PIN_SECONDS
+                cookie = (
+                    f"{READ_PIN_COOKIE}={until:.3f}; Max-Age={int(settings.READ_PIN_SECONDS) + 1}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_pin)
+        finally:
+            current_read_pin.reset(token)
@@ -0,0 +1,65 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Hashable
+
+class SlidingWindowLimiter:
+    """
+    At most `limit` hits per key within `window_seconds`. In-process and per worker, with an
+    LRU bound on the number of tracked keys so a flood of distinct keys can't grow it unbounded.
+    """
+
+    def __init__(self, limit: int, window_seconds: float, max_keys: int = 10000):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._hits: "OrderedDict[Hashable, deque]" = OrderedDict()
+
+    def hit(self, key: Hashable) -> float:
+        """Record a hit. Returns 0 if allowed, else the seconds until the next one would be."""
+        now = time.monotonic()
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque()
+        self._hits.move_to_end(key)
+        while hits and hits[0] <= now - self.window_seconds:
+            hits.popleft()
+        if len(hits) >= self.limit:
+            return hits[0] + self.window_seconds - now
+        hits.append(now)
+        while len(self._hits) > self.max_keys:
+            self._hits.popitem(last=False)
+        return 0.0
+
+    def reset(self, key: Hashable) -> None:
+        self._hits.pop(key, None)
+
+class AsyncTokenBucket:
+    """
+    Paces async callers to `rate` acquisitions per second (bursts of up to `burst`).
+    `pause` stops everyone for a while, e.g. after the remote side reports throttling.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
@@ -1,6 +1,76 @@
-from datetime import datetime
+from datetime import datetime, date, time, timedelta, timezone
 from zoneinfo import ZoneInfo
 
+from sqlalchemy import Date, Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+CR_TZ = ZoneInfo("America/Costa_Rica")
+
 def get_cr_time():
     """Return the current time in Costa Rica timezone."""
-    return datetime.now(ZoneInfo("America/Costa_Rica"))
+    return datetime.now(CR_TZ)
+
+def cr_today() -> date:
+    """Return the current calendar date in Costa Rica."""
+    return get_cr_time().date()
+
+def cr_date_to_utc(day: date) -> datetime:
+    """
+    Return the naive UTC datetime for Costa Rica midnight of `day`.
+    Timestamps are stored as naive UTC (datetime.utcnow), so range filters must use this.
+    """
+    local_midnight = datetime.combine(day, time.min, tzinfo=CR_TZ)
+    return local_midnight.astimezone(timezone.utc).replace(tzinfo=None)
+
+def utc_to_cr_date(value: datetime) -> date:
+    """Costa Rica calendar date of a naive UTC timestamp."""
+    return value.replace(tzinfo=timezone.utc).astimezone(CR_TZ).date()
+
+def cr_month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def cr_next_month_start(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _cr_offset_hours() -> int:
+    # Costa Rica has no DST, so a fixed offset is exact.
+    return int(get_cr_time().utcoffset().total_seconds() // 3600)
+
+class cr_date(FunctionElement):
+    """
+    SQL expression: Costa Rica local calendar date of a naive UTC timestamp column.
+    Usable in SELECT / GROUP BY on both SQLite and PostgreSQL.
+    """
+    type = Date()
+    inherit_cache = True
+    name = "cr_date"
+
+@compiles(cr_date)
+def _compile_cr_date_default(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"CAST(({column} + INTERVAL '{_cr_offset_hours()} hours') AS DATE)"
+
+@compiles(cr_date, "sqlite")
+def _compile_cr_date_sqlite(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"date({column}, '{_cr_offset_hours():+d} hours')"
+
+class days_since(FunctionElement):
+    """
+    SQL expression: whole days from `start` (a date) to a DATE expression, as an integer.
+    Lets bulk readers get day offsets straight from the database instead of parsing dates row by row.
+    """
+    type = Integer()
+    inherit_cache = True
+    name = "days_since"
+
+@compiles(days_since)
+def _compile_days_since_default(element, compiler, **kw):
+    day, start = list(element.clauses)
+    return f"(CAST({compiler.process(day, **kw)} AS DATE) - CAST({compiler.process(start, **kw)} AS DATE))"
+
+@compiles(days_since, "sqlite")
+def _compile_days_since_sqlite(element, compiler, **kw):
+    day, start = list(element.clauses)
+    return f"CAST(julianday({compiler.process(day, **kw)}) - julianday({compiler.process(start, **kw)}) AS INTEGER)"
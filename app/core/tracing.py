@@ -0,0 +1,88 @@
+"""
+OpenTelemetry tracing for a conversation turn: inbound webhook -> DB -> Meta Graph API -> n8n,
+and back through /chat/send when n8n replies.
+
+FastAPI's native OpenTelemetry support creates the HTTP server spans (and the endpoint,
+dependency and background task spans under them) as soon as a tracer provider is installed,
+extracting the parent from an incoming `traceparent` header. This module adds the provider and
+exporter; spans for the webhook stages, SQL statements and Graph API calls are opened where
+that work happens.
+
+The trace context travels to n8n in `lavete_metadata.traceparent`; the n8n workflow sends it
+back as a `traceparent` header on /chat/send, so the reply is a span of the same trace.
+
+TRACING_EXPORTER selects where spans go:
+  ""      disabled (the OpenTelemetry API stays a no-op)
+  "file"  one JSON span per line appended to TRACING_FILE
+  "otlp"  OTLP/HTTP to TRACING_OTLP_ENDPOINT (a local collector, Jaeger, Tempo...)
+Spans are exported from a BatchSpanProcessor thread, never on the event loop.
+"""
+import threading
+from typing import Sequence
+
+from opentelemetry import propagate, trace
+
+from app.core.config import settings
+
+tracer = trace.get_tracer("lavete")
+
+_provider = None
+
+def _file_exporter(path: str):
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class JsonLinesSpanExporter(SpanExporter):
+        def __init__(self):
+            self._lock = threading.Lock()
+            self._file = open(path, "a", encoding="utf-8")
+
+        def export(self, spans: Sequence) -> "SpanExportResult":
+            lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+            with self._lock:
+                self._file.write(lines)
+                self._file.flush()
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            with self._lock:
+                self._file.close()
+
+    return JsonLinesSpanExporter()
+
+def setup_tracing():
+    """Install the SDK tracer provider if an exporter is configured. Call once per worker process."""
+    global _provider
+    if _provider is not None or not settings.TRACING_EXPORTER:
+        return
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    if settings.TRACING_EXPORTER == "file":
+        exporter = _file_exporter(settings.TRACING_FILE)
+    elif settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {settings.TRACING_EXPORTER!r}")
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": "lavete"}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+
+def shutdown_tracing():
+    """Flush pending spans (call on application shutdown)."""
+    global _provider
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+
+def trace_metadata() -> dict:
+    """{"trace_id": ..., "traceparent": ...} for the current span, or {} when not tracing."""
+    span_context = trace.get_current_span().get_span_context()
+    if not span_context.is_valid:
+        return {}
+    carrier = {}
+    propagate.inject(carrier)
+    return {"trace_id": format(span_context.trace_id, "032x"), "traceparent": carrier.get("traceparent")}
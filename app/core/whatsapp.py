@@ -1,6 +1,38 @@
+import functools
+import logging
+import time
+
 import httpx
 import aiohttp
+from opentelemetry.trace import SpanKind
 from app.core.config import settings
+from app.core.metrics import WHATSAPP_REQUEST_SECONDS
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+def _observed(method):
+    """
+    Record Graph API latency per client method, labelled with the HTTP status (or error type),
+    and trace each call as a `whatsapp.<method>` span.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        status = "200"
+        with tracer.start_as_current_span(f"whatsapp.{name}", kind=SpanKind.CLIENT) as span:
+            try:
+                return await method(*args, **kwargs)
+            except Exception as e:
+                code = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+                status = str(code or type(e).__name__)
+                raise
+            finally:
+                span.set_attribute("whatsapp.status", status)
+                WHATSAPP_REQUEST_SECONDS.labels(name, status).observe(time.perf_counter() - started)
+    return wrapper
 
 class WhatsAppClient:
     def __init__(self):
@@ -12,6 +44,7 @@ class WhatsAppClient:
             "Content-Type": "application/json",
         }
 
+    @_observed
     async def send_message(self, to: str, content: str, message_type: str = "text"):
         """
         Send a message to a WhatsApp user.
@@ -41,13 +74,18 @@ class WhatsAppClient:
                 return response.json()
             except httpx.HTTPStatusError as e:
                 error_detail = e.response.text
-                print(f"WhatsApp API Error: {error_detail}")
+                logger.warning("WhatsApp API Error", extra={"status_code": e.response.status_code, "detail": error_detail})
                 from fastapi import HTTPException
                 raise HTTPException(status_code=e.response.status_code, detail=f"WhatsApp API Error: {error_detail}")
 
-    async def send_template_message(self, to: str, template_name: str, language_code: str = "es", components: list = None):
+    @_observed
+    async def send_template_message(
+        self, to: str, template_name: str, language_code: str = "es", components: list = None,
+        http_client: httpx.AsyncClient = None,
+    ):
         """
         Send a pre-approved template message to a WhatsApp user.
+        Bulk senders pass a shared `http_client` to reuse its connections.
         """
         # Ensure 506 prefix
         if not to.startswith("506"):
@@ -68,17 +106,21 @@ class WhatsAppClient:
         if components:
             payload["template"]["components"] = components
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(self.base_url, json=payload, headers=self.headers)
-            try:
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                error_detail = e.response.text
-                print(f"WhatsApp API Template Error: {error_detail}")
-                from fastapi import HTTPException
-                raise HTTPException(status_code=e.response.status_code, detail=f"WhatsApp API Error: {error_detail}")
+        if http_client is not None:
+            response = await http_client.post(self.base_url, json=payload, headers=self.headers)
+        else:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(self.base_url, json=payload, headers=self.headers)
+        try:
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            error_detail = e.response.text
+            logger.warning("WhatsApp API Template Error", extra={"status_code": e.response.status_code, "detail": error_detail})
+            from fastapi import HTTPException
+            raise HTTPException(status_code=e.response.status_code, detail=f"WhatsApp API Error: {error_detail}")
 
+    @_observed
     async def send_interactive_buttons(self, to: str, body_text: str, buttons: list[dict]):
         """
         Send an interactive message with up to 3 buttons.
@@ -120,10 +162,11 @@ class WhatsAppClient:
                 return response.json()
             except httpx.HTTPStatusError as e:
                 error_detail = e.response.text
-                print(f"WhatsApp API Interactive Error: {error_detail}")
+                logger.warning("WhatsApp API Interactive Error", extra={"status_code": e.response.status_code, "detail": error_detail})
                 from fastapi import HTTPException
                 raise HTTPException(status_code=e.response.status_code, detail=f"WhatsApp API Error: {error_detail}")
 
+    @_observed
     async def send_interactive_list(self, to: str, body_text: str, button_text: str, sections: list[dict]):
         """
         Send an interactive list message.
@@ -155,10 +198,11 @@ class WhatsAppClient:
                 return response.json()
             except httpx.HTTPStatusError as e:
                 error_detail = e.response.text
-                print(f"WhatsApp API List Error: {error_detail}")
+                logger.warning("WhatsApp API List Error", extra={"status_code": e.response.status_code, "detail": error_detail})
                 from fastapi import HTTPException
                 raise HTTPException(status_code=e.response.status_code, detail=f"WhatsApp API Error: {error_detail}")
 
+    @_observed
     async def get_media_url(self, media_id: str):
         """
         Get the temporary URL for a media object.
@@ -169,6 +213,7 @@ class WhatsAppClient:
             response.raise_for_status()
             return response.json().get("url")
 
+    @_observed
     async def download_media(self, media_url: str):
         """
         Download binary content from WhatsApp Media URL.
@@ -178,6 +223,7 @@ class WhatsAppClient:
             response.raise_for_status()
             return response.content
 
+    @_observed
     async def upload_media(self, file_bytes: bytes, mime_type: str) -> str:
         """
         Upload media to Meta and return the media_id.
@@ -192,13 +238,14 @@ class WhatsAppClient:
             async with session.post(url, data=data, headers={"Authorization": self.headers["Authorization"]}) as response:
                 if response.status != 200:
                     error_detail = await response.text()
-                    print(f"WhatsApp API Upload Error: {error_detail}")
+                    logger.warning("WhatsApp API Upload Error", extra={"status_code": response.status, "detail": error_detail})
                     from fastapi import HTTPException
                     raise HTTPException(status_code=response.status, detail=f"WhatsApp API Upload Error: {error_detail}")
                 
                 result = await response.json()
                 return result.get("id")
 
+    @_observed
     async def send_media_message(self, to: str, media_id: str, media_type: str, caption: str = None, filename: str = None):
         """
         Send a media message (image, document, audio) to a WhatsApp user.
@@ -226,7 +273,7 @@ class WhatsAppClient:
                 return response.json()
             except httpx.HTTPStatusError as e:
                 error_detail = e.response.text
-                print(f"WhatsApp API Send Media Error: {error_detail}")
+                logger.warning("WhatsApp API Send Media Error", extra={"status_code": e.response.status_code, "detail": error_detail})
                 from fastapi import HTTPException
                 raise HTTPException(status_code=e.response.status_code, detail=f"WhatsApp API Error: {error_detail}")
 
@@ -1,14 +1,52 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.api import api_router
 from app.core.config import settings
+from app.core import metrics
+from app.core.logging_config import setup_logging, shutdown_logging
+from app.core.tracing import setup_tracing, shutdown_tracing
+from app.core.middleware import QueryStatsMiddleware, MetricsMiddleware, ReadYourWritesMiddleware
+from app.services import audit, campaigns, outbox
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Per worker process: the span exporter thread must not be created before gunicorn forks
+    setup_tracing()
+    # Background delivery of WhatsApp / n8n notifications written to the outbox
+    outbox_relay = asyncio.create_task(outbox.run_relay())
+    # Batched audit_logs inserts (changes are captured by session events in app.services.audit)
+    audit_writer = asyncio.create_task(audit.run_writer())
+    # WhatsApp template campaigns (resumed under a lease if a worker died mid-send)
+    campaign_runner = asyncio.create_task(campaigns.run_campaigns())
+    yield
+    for task in (outbox_relay, audit_writer, campaign_runner):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await audit.flush_all()
+    shutdown_tracing()
+    shutdown_logging()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
-    root_path="/lavete" # Deployed under /lavete
+    root_path="/lavete", # Deployed under /lavete
+    lifespan=lifespan,
 )
 
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+if settings.DATABASE_READ_URL:
+    app.add_middleware(ReadYourWritesMiddleware)
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -17,6 +55,7 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "Link"],
     )
 
 from fastapi.staticfiles import StaticFiles
@@ -31,14 +70,20 @@ app.include_router(web_routes.router)
 def health_check():
     return {"status": "ok"}
 
-import traceback
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
 from fastapi import Request
 from fastapi.responses import JSONResponse
 
 @app.exception_handler(Exception)
 async def validation_exception_handler(request: Request, exc: Exception):
-    error_msg = "".join(traceback.format_exception(None, exc, exc.__traceback__))
-    print(f"Global Exception: {error_msg}")
+    logger.error(
+        "Unhandled exception", exc_info=exc,
+        extra={"method": request.method, "path": request.url.path},
+    )
     return JSONResponse(
         status_code=500,
         content={"message": "Internal Server Error"},
@@ -1,6 +1,14 @@
 from app.core.database import Base
-from .products import Product, InventoryMovement
+from .products import Product, InventoryMovement, InventorySnapshot
 from .customers import Customer, Pet
 from .users import User, AuditLog
 from .orders import Order, OrderItem
 from .chat import ChatMessage
+from .reports import DailySales, DailyProductSales, StockForecast
+from .outbox import OutboxEvent
+from .order_events import OrderEvent
+from .conversations import ConversationState
+from .refills import RefillPrediction, JobCursor
+from .campaigns import Campaign, CampaignRecipient
+from .recommendations import ProductNeighbor, CustomerRecommendation
+from .customer_profiles import CustomerProfile
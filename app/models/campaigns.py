@@ -0,0 +1,52 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, JSON, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.core.database import Base
+
+class Campaign(Base):
+    """
+    A WhatsApp template broadcast to a customer segment. Sent in the background by
+    app.services.campaigns; status: draft, resolving, sending, paused, completed, cancelled.
+    """
+    __tablename__ = "campaigns"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    template_name = Column(String, nullable=False)
+    language_code = Column(String, default="es", nullable=False)
+    parameters = Column(JSON, default=list) # Template body parameters; "{first_name}" / "{full_name}" are filled in
+    segment = Column(JSON, default=dict) # app.schemas.campaigns.CampaignSegment
+    status = Column(String, default="draft", index=True, nullable=False)
+    total_recipients = Column(Integer, default=0, nullable=False)
+    sent_count = Column(Integer, default=0, nullable=False)
+    failed_count = Column(Integer, default=0, nullable=False)
+    resolved_through = Column(Integer, default=0, nullable=False) # Last customer id added to the recipients
+    lease_until = Column(DateTime, nullable=True) # Held by the worker process running the campaign
+    lease_owner = Column(String, nullable=True) # Token of the run holding the lease; renewals check it
+    created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    created_by = relationship("User", lazy="raise_on_sql")
+
+class CampaignRecipient(Base):
+    """One customer of a campaign; status: pending, sending, sent, failed."""
+    __tablename__ = "campaign_recipients"
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="SET NULL"), nullable=True)
+    phone = Column(String, nullable=False)
+    name = Column(String, nullable=True)
+    status = Column(String, default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # A phone shared by several customers gets the message once
+        UniqueConstraint("campaign_id", "phone", name="uq_campaign_recipients_campaign_phone"),
+        # The sender claims pending recipients in id order
+        Index("ix_campaign_recipients_campaign_id_status_id", "campaign_id", "status", "id"),
+    )
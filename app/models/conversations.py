@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON
+from datetime import datetime
+from app.core.database import Base
+
+class ConversationState(Base):
+    """
+    Where a customer's WhatsApp conversation is in the receipt interception flow.
+    One row per customer; looked up by primary key on every inbound message so that
+    ordinary messages never have to scan orders.
+    """
+    __tablename__ = "conversation_states"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    state = Column(String, default="idle", nullable=False)
+    # idle, awaiting_receipt_confirmation, awaiting_receipt_confirmation_multiple, awaiting_receipt_selection
+    order_ids = Column(JSON, default=list) # Orders the pending receipt may belong to
+    pending_receipt_url = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Numeric, JSON
+from datetime import datetime
+from app.core.database import Base
+
+class CustomerProfile(Base):
+    """
+    Denormalized "customer 360" read model: one row per customer with everything the detail view
+    and the n8n lookup need. Maintained by app.services.customer_profiles on every order, pet,
+    chat and customer write, in the same transaction.
+    """
+    __tablename__ = "customer_profiles"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    phone_key = Column(String, index=True, nullable=True) # Customer.phone_key, for lookups by phone
+    lifetime_value = Column(Numeric(12, 2), default=0, nullable=False) # Total of purchased orders
+    order_count = Column(Integer, default=0, nullable=False) # Purchased orders
+    open_order_count = Column(Integer, default=0, nullable=False)
+    last_order_at = Column(DateTime, nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+    customer = Column(JSON, nullable=False) # Customer columns
+    pets = Column(JSON, default=list)
+    last_order = Column(JSON, nullable=True)
+    open_orders = Column(JSON, default=list) # Latest first, with item lines
+    orders = Column(JSON(none_as_null=True), nullable=True) # Every order, latest first, with item lines (NULL: built before this column)
+    favorite_products = Column(JSON, default=list) # Most bought (units), with product names
+    recent_interactions = Column(JSON, default=list) # Last 10 chat messages, oldest first
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,14 +1,25 @@
+import re
+from typing import Optional
 from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, JSON, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 from app.core.database import Base
 
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Digits only, without the 506 country code: "+506 8888-7777" -> "88887777"."""
+    digits = re.sub(r"\D", "", phone or "")
+    if digits.startswith("506") and len(digits) > 8:
+        digits = digits[3:]
+    return digits or None
+
 class Customer(Base):
     __tablename__ = "customers"
 
     id = Column(Integer, primary_key=True, index=True)
     full_name = Column(String, index=True, nullable=False)
     phone = Column(String, index=True, nullable=True)
+    # normalize_phone(phone), kept in sync by _sync_phone_key; one customer per phone
+    phone_key = Column(String, unique=True, index=True, nullable=True)
     email = Column(String, index=True, nullable=True)
     is_active = Column(Boolean, default=True)
     ai_active = Column(Boolean, default=True)
@@ -19,8 +30,14 @@ class Customer(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    pets = relationship("Pet", back_populates="owner", cascade="all, delete-orphan", lazy="selectin")
-    orders = relationship("Order", back_populates="customer", lazy="selectin")
+    # Never loaded implicitly: queries opt in with selectinload() so a plain select stays one query
+    pets = relationship("Pet", back_populates="owner", cascade="all, delete-orphan", lazy="raise_on_sql")
+    orders = relationship("Order", back_populates="customer", lazy="raise_on_sql")
+
+    @validates("phone")
+    def _sync_phone_key(self, key, phone):
+        self.phone_key = normalize_phone(phone)
+        return phone
 
 class Pet(Base):
     __tablename__ = "pets"
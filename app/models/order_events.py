@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.core.database import Base
+
+class OrderEvent(Base):
+    """Append-only history of order status transitions."""
+    __tablename__ = "order_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    from_status = Column(String, nullable=True) # null for the creation event
+    to_status = Column(String, nullable=False)
+    source = Column(String, nullable=False) # web, whatsapp, backfill
+    user_id = Column(Integer, nullable=True) # null if system/whatsapp
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    order = relationship("Order")
+
+    __table_args__ = (
+        # Per-order history in order (LEAD() over order_id for time-in-state)
+        Index("ix_order_events_order_id_created_at", "order_id", "created_at"),
+        # Funnel / latency reports by state and time range
+        Index("ix_order_events_to_status_created_at", "to_status", "created_at"),
+    )
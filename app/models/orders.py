@@ -1,8 +1,21 @@
-from sqlalchemy import Column, Integer, String, Boolean, Numeric, ForeignKey, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, Numeric, ForeignKey, DateTime, Text, JSON, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
 
+# Statuses the WhatsApp receipt flow looks orders up by (see app/services/receipt_flow.py)
+RECEIPT_WAITING_STATUSES = (
+    "created",
+    "pending_payment",
+    "awaiting_receipt_confirmation",
+    "awaiting_receipt_confirmation_multiple",
+    "awaiting_receipt_selection",
+)
+# Orders that count as a purchase (refill predictions, campaign segments, demand forecast)
+PURCHASED_STATUSES = ("paid", "completed")
+
+_waiting_statuses_sql = text("status IN (" + ", ".join(f"'{s}'" for s in RECEIPT_WAITING_STATUSES) + ")")
+
 class Order(Base):
     __tablename__ = "orders"
 
@@ -22,20 +35,34 @@ class Order(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    customer = relationship("Customer", back_populates="orders", lazy="selectin")
-    pet = relationship("Pet", back_populates="orders", lazy="selectin")
-    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan", lazy="selectin")
-    created_by = relationship("User", lazy="selectin")
+    # Never loaded implicitly: queries opt in with selectinload() so a plain select stays one query
+    customer = relationship("Customer", back_populates="orders", lazy="raise_on_sql")
+    pet = relationship("Pet", back_populates="orders", lazy="raise_on_sql")
+    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan", lazy="raise_on_sql")
+    created_by = relationship("User", lazy="raise_on_sql")
+
+    __table_args__ = (
+        # Backs keyset pagination on GET /orders (ORDER BY created_at DESC, id DESC)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        # Incremental jobs pick up orders changed since their last run
+        Index("ix_orders_updated_at", "updated_at"),
+        # Partial index: only open orders are looked up per customer by the receipt flow
+        Index(
+            "ix_orders_customer_id_status_waiting", "customer_id", "status",
+            postgresql_where=_waiting_statuses_sql,
+            sqlite_where=_waiting_statuses_sql,
+        ),
+    )
 
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True, nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
     unit_price_at_moment = Column(Numeric(10, 2), nullable=False)
     subtotal = Column(Numeric(10, 2), nullable=False)
 
     order = relationship("Order", back_populates="items")
-    product = relationship("Product", back_populates="order_items", lazy="selectin")
+    product = relationship("Product", back_populates="order_items", lazy="raise_on_sql")
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+from datetime import datetime
+from app.core.database import Base
+
+class OutboxEvent(Base):
+    """
+    Side effects (WhatsApp sends, n8n notifications) written in the same transaction
+    as the change that caused them, and delivered later by the outbox relay.
+    One row per destination so each one is retried independently.
+    """
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    destination = Column(String, nullable=False) # whatsapp, whatsapp_template, n8n
+    event_type = Column(String, nullable=False) # e.g. order.status_changed
+    aggregate_type = Column(String, nullable=False) # e.g. order
+    aggregate_id = Column(Integer, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, default="pending", nullable=False) # pending, sent, failed, cancelled
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # The relay polls for due pending events
+        Index("ix_outbox_events_status_next_attempt_at", "status", "next_attempt_at"),
+        Index("ix_outbox_events_aggregate", "aggregate_type", "aggregate_id"),
+    )
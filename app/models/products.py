@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Numeric, ForeignKey, DateTime, Text, FetchedValue, JSON
+from sqlalchemy import Column, Integer, String, Boolean, Numeric, ForeignKey, DateTime, Text, FetchedValue, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -39,6 +39,28 @@ class InventoryMovement(Base):
     product = relationship("Product", back_populates="inventory_movements")
     created_by = relationship("User")
 
+    __table_args__ = (
+        # Ledger tail after a snapshot: product_id = ? AND id > snapshot.last_movement_id
+        Index("ix_inventory_movements_product_id_id", "product_id", "id"),
+    )
+
+class InventorySnapshot(Base):
+    """
+    Ledger balance of one product, covering every movement up to last_movement_id.
+    Written by app.services.inventory_ledger.take_snapshots.
+    """
+    __tablename__ = "inventory_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    taken_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    stock = Column(Integer, nullable=False)
+    last_movement_id = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_inventory_snapshots_product_id_taken_at", "product_id", "taken_at"),
+    )
+
 class InventoryConfig(Base):
     __tablename__ = "inventory_config"
 
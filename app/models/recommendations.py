@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Float
+from datetime import datetime
+from app.core.database import Base
+
+class ProductNeighbor(Base):
+    """
+    Top-K products bought together with a product (recency-weighted cosine similarity of their
+    orders), precomputed by app.services.recommendations.
+    """
+    __tablename__ = "product_neighbors"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False) # 1 = most similar
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class CustomerRecommendation(Base):
+    """Top-K products a customer hasn't bought yet, suited to their pets' species."""
+    __tablename__ = "customer_recommendations"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
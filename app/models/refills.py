@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Float, Index
+from datetime import datetime
+from app.core.database import Base
+
+class RefillPrediction(Base):
+    """
+    When a customer will need more of a product they buy repeatedly for a pet (food, medication),
+    inferred from order history by app.services.refills. pet_id is None when the purchases
+    can't be attributed to a single pet.
+    """
+    __tablename__ = "refill_predictions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), index=True, nullable=False)
+    pet_id = Column(Integer, ForeignKey("pets.id", ondelete="SET NULL"), nullable=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    purchases = Column(Integer, nullable=False)
+    unit_days = Column(Float, nullable=False) # Median days one unit lasts
+    last_purchase_on = Column(Date, nullable=False)
+    last_quantity = Column(Integer, nullable=False)
+    next_refill_on = Column(Date, nullable=False)
+    remind_on = Column(Date, nullable=False)
+    # Outbox event of the scheduled reminder, and the refill date it was scheduled for
+    reminder_event_id = Column(Integer, ForeignKey("outbox_events.id", ondelete="SET NULL"), nullable=True)
+    reminded_for = Column(Date, nullable=True)
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # The nightly scheduler looks up predictions whose reminder day has come
+        Index("ix_refill_predictions_remind_on", "remind_on"),
+    )
+
+class JobCursor(Base):
+    """High-water mark of an incremental batch job (e.g. the last orders.updated_at it processed)."""
+    __tablename__ = "job_cursors"
+
+    name = Column(String, primary_key=True)
+    position = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
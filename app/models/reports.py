@@ -0,0 +1,53 @@
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, Date, DateTime, Float, JSON, Index, UniqueConstraint
+from datetime import datetime
+from app.core.database import Base
+
+class DailySales(Base):
+    """Per-day order rollup keyed by Costa Rica local date, status and channel (created_via)."""
+    __tablename__ = "daily_sales"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, index=True, nullable=False)
+    status = Column(String, nullable=False)
+    channel = Column(String, nullable=False) # web, whatsapp
+    order_count = Column(Integer, default=0, nullable=False)
+    total_amount = Column(Numeric(12, 2), default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("day", "status", "channel", name="uq_daily_sales_day_status_channel"),
+    )
+
+class DailyProductSales(Base):
+    """Same rollup as DailySales, broken down by product (category denormalized for reporting)."""
+    __tablename__ = "daily_product_sales"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    status = Column(String, nullable=False)
+    channel = Column(String, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    category = Column(String, index=True, nullable=True)
+    quantity = Column(Integer, default=0, nullable=False)
+    total_amount = Column(Numeric(12, 2), default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("day", "status", "channel", "product_id", name="uq_daily_product_sales_key"),
+        # Covers the forecast's date-range scan (app/services/inventory_forecast.py) without table lookups
+        Index("ix_daily_product_sales_day_status_product_qty", "day", "status", "product_id", "quantity"),
+    )
+
+class StockForecast(Base):
+    """
+    Demand forecast and suggested reorder point per product, recomputed for the whole catalog
+    by app.services.inventory_forecast.refresh.
+    """
+    __tablename__ = "stock_forecasts"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    daily_demand = Column(Float, nullable=False) # Recency-weighted units per day
+    demand_std = Column(Float, nullable=False)
+    weekday_factors = Column(JSON, nullable=False) # Monday..Sunday multipliers on daily_demand
+    lead_time_demand = Column(Float, nullable=False)
+    reorder_point = Column(Integer, nullable=False)
+    days_until_stockout = Column(Float, nullable=True) # None: stock outlasts the forecast horizon
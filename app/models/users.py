@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON, Index
 from datetime import datetime
 from app.core.database import Base
 
@@ -23,3 +23,9 @@ class AuditLog(Base):
     changes = Column(JSON, nullable=True) # stores before/after
     user_id = Column(Integer, index=True, nullable=True) # null if system/whatsapp
     timestamp = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # GET /audit: one entity's history, or all changes to an entity type in a time range
+        Index("ix_audit_logs_entity_entity_id_timestamp", "entity", "entity_id", "timestamp"),
+        Index("ix_audit_logs_entity_timestamp", "entity", "timestamp"),
+    )
@@ -0,0 +1,58 @@
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Any
+
+class AIContextCustomer(BaseModel):
+    id: int
+    name: str
+    phone: Optional[str] = None
+    ai_active: bool
+    payment_method: Optional[str] = None
+    addresses: List[Dict[str, Any]] = []
+    notes: Optional[str] = None
+
+class AIContextPet(BaseModel):
+    id: int
+    name: str
+    species: str
+    breed: Optional[str] = None
+    age: Optional[str] = None
+    weight: Optional[str] = None
+    allergies: Optional[str] = None
+    notes: Optional[str] = None
+
+class AIContextOrder(BaseModel):
+    id: int
+    status: str
+    total: float
+    created: Optional[str] = None
+    address: Optional[str] = None
+    payment_method: Optional[str] = None
+    items: List[str] # "2 x Dog Chow 3kg"
+
+class AIContextMessage(BaseModel):
+    sender: str # user, ai or admin
+    type: Optional[str] = None
+    text: Optional[str] = None
+    at: Optional[str] = None
+
+class AIContextProduct(BaseModel):
+    id: int
+    name: str
+    price: float
+    stock: int
+    why: str # "recompra <date>" or "comprado junto"
+
+class AIContextStore(BaseModel):
+    name: Optional[str] = None
+    addresses: List[Dict[str, Any]] = []
+    sinpe: Optional[str] = None
+    account: Optional[str] = None
+    service_phone: Optional[str] = None
+
+class AIContext(BaseModel):
+    customer: Optional[AIContextCustomer] = None
+    pets: List[AIContextPet] = []
+    orders: List[AIContextOrder] = []
+    messages: List[AIContextMessage] = []
+    products: List[AIContextProduct] = []
+    store: Optional[AIContextStore] = None
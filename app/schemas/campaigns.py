@@ -0,0 +1,57 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
+from datetime import datetime
+
+class CampaignSegment(BaseModel):
+    """Who gets a campaign. Every criterion that is set must match; an empty segment is every active customer."""
+    species: Optional[List[str]] = None # Has a pet of one of these species (e.g. ["Perro"])
+    ordered_product_ids: Optional[List[int]] = None # Bought one of these products...
+    ordered_categories: Optional[List[str]] = None # ...or something in these categories
+    ordered_since: Optional[datetime] = None # Only purchases after this date count for the two above
+    min_orders: Optional[int] = None # At least this many purchases
+    no_orders_since: Optional[datetime] = None # Lapsed: no purchase after this date
+    ai_active: Optional[bool] = None
+    include_inactive: bool = False
+
+class CampaignCreate(BaseModel):
+    name: str
+    template_name: str
+    language_code: str = "es"
+    parameters: List[str] = [] # Body parameters; "{first_name}" and "{full_name}" are filled in per recipient
+    segment: CampaignSegment = Field(default_factory=CampaignSegment)
+
+class CampaignPreview(BaseModel):
+    recipients: int
+    sample: List[Dict[str, Optional[str]]]
+
+class Campaign(BaseModel):
+    id: int
+    name: str
+    template_name: str
+    language_code: str
+    parameters: List[str]
+    segment: CampaignSegment
+    status: str
+    total_recipients: int
+    sent_count: int
+    failed_count: int
+    created_by_user_id: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class CampaignRecipient(BaseModel):
+    id: int
+    customer_id: Optional[int] = None
+    phone: str
+    name: Optional[str] = None
+    status: str
+    attempts: int
+    last_error: Optional[str] = None
+    sent_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -56,6 +56,16 @@ class CustomerBasic(CustomerBase):
 class CustomerCreate(CustomerBase):
     pass
 
+class CustomerUpsert(BaseModel):
+    """Fields to set on the customer found or created by PUT /customers/by-phone/{phone} (all optional)."""
+    full_name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    is_active: Optional[bool] = None
+    address: Optional[str] = None
+    addresses: Optional[List[dict]] = None
+    default_payment_method: Optional[str] = None
+    notes: Optional[str] = None
+
 class CustomerUpdate(BaseModel):
     full_name: Optional[str] = None
     phone: Optional[str] = None
@@ -139,3 +149,47 @@ class Customer(CustomerBase):
     
     class Config:
         from_attributes = True
+
+class CustomerProfileOrderItem(BaseModel):
+    name: str
+    quantity: int
+    unit_price_at_moment: Optional[float] = None
+    subtotal: Optional[float] = None
+
+class CustomerProfileOrder(BaseModel):
+    id: int
+    status: str
+    total_amount: float
+    payment_method: Optional[str] = None
+    payment_proof: Optional[str] = None
+    delivery_address: Optional[str] = None
+    created_at: Optional[datetime] = None
+    items: List[CustomerProfileOrderItem] = []
+
+class CustomerProfileProduct(BaseModel):
+    product_id: int
+    name: str
+    quantity: int # Units bought
+
+class CustomerProfileCustomer(CustomerBasic):
+    ai_active: Optional[bool] = True
+    updated_at: Optional[datetime] = None
+
+class CustomerProfile(BaseModel):
+    """Customer 360 from the customer_profiles read model (one row)."""
+    customer_id: int
+    lifetime_value: float
+    order_count: int
+    open_order_count: int
+    last_order_at: Optional[datetime] = None
+    last_message_at: Optional[datetime] = None
+    customer: CustomerProfileCustomer
+    pets: List[Pet] = []
+    last_order: Optional[CustomerProfileOrder] = None
+    open_orders: List[CustomerProfileOrder] = []
+    favorite_products: List[CustomerProfileProduct] = []
+    recent_interactions: List[CustomerInteraction] = []
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
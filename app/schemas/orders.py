@@ -1,6 +1,6 @@
 from pydantic import BaseModel, condecimal, computed_field
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date
 from app.schemas.customers import CustomerBasic
 from app.schemas.products import Product
 
@@ -95,3 +95,67 @@ class Order(OrderBase):
 
     class Config:
         from_attributes = True
+
+class OrderStats(BaseModel):
+    day: date
+    orders_today: int
+    sales_today: condecimal(max_digits=12, decimal_places=2) # type: ignore
+    orders_this_month: int
+    monthly_sales: condecimal(max_digits=12, decimal_places=2) # type: ignore
+
+class OrderListItem(BaseModel):
+    """Compact row for order listings. Full item detail comes from GET /orders/{id}."""
+    id: int
+    customer_id: int
+    customer_name: Optional[str] = None
+    customer_phone: Optional[str] = None
+    customer_address: Optional[str] = None
+    status: str
+    total_amount: condecimal(max_digits=10, decimal_places=2) # type: ignore
+    item_count: int = 0
+    payment_method: Optional[str] = None
+    payment_proof: Optional[str] = None
+    delivery_address: Optional[str] = None
+    created_via: Optional[str] = None
+    created_at: datetime
+
+    @computed_field
+    @property
+    def has_payment_receipt(self) -> bool:
+        return bool(self.payment_proof)
+
+    @computed_field
+    @property
+    def payment_receipt_url(self) -> Optional[str]:
+        if not self.payment_proof:
+            return None
+        return f"/lavete/api/v1/orders/{self.id}/receipt"
+
+    class Config:
+        from_attributes = True
+
+class OrderEvent(BaseModel):
+    id: int
+    order_id: int
+    from_status: Optional[str] = None
+    to_status: str
+    source: str
+    user_id: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class OrderStateStats(BaseModel):
+    status: str
+    orders_entered: int
+    orders_exited: int
+    avg_seconds: Optional[float] = None
+    p50_seconds: Optional[float] = None
+    p90_seconds: Optional[float] = None
+    currently_in_state: int = 0
+
+class OrderStatusFlowReport(BaseModel):
+    start: date
+    end: date
+    states: List[OrderStateStats] = []
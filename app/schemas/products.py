@@ -42,6 +42,45 @@ class Product(ProductBase):
     class Config:
         from_attributes = True
 
+class StockAsOf(BaseModel):
+    product_id: int
+    at: datetime
+    stock: int
+
+class StockDrift(BaseModel):
+    product_id: int
+    sku: str
+    name: str
+    stock: int
+    ledger_stock: int
+    drift: int
+
+class StockForecast(BaseModel):
+    product_id: int
+    sku: str
+    name: str
+    stock: int
+    min_stock: int
+    computed_at: datetime
+    daily_demand: float
+    demand_std: float
+    weekday_factors: List[float]
+    lead_time_demand: float
+    reorder_point: int
+    days_until_stockout: Optional[float] = None
+
+class RelatedProduct(BaseModel):
+    id: int
+    sku: str
+    name: str
+    category: str
+    brand: Optional[str] = None
+    price: condecimal(max_digits=10, decimal_places=2) # type: ignore
+    stock: int
+    image_url: Optional[str] = None
+    target_animals: Optional[List[str]] = []
+    score: float
+
 from typing import List, Dict, Any
 
 # Inventory Config Schemas
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -24,3 +24,15 @@ class User(UserBase):
 
     class Config:
         from_attributes = True
+
+class AuditLog(BaseModel):
+    id: int
+    entity: str
+    entity_id: int
+    action: str
+    changes: Optional[Dict[str, Any]] = None # update: {field: [before, after]}; create/delete: {field: value}
+    user_id: Optional[int] = None
+    timestamp: datetime
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,186 @@
+"""
+One compact document per conversation turn for the n8n agent (GET /ai/context/{phone}).
+
+Instead of the full customer (every order with items and products) plus the whole catalog, the
+agent gets what it needs to answer: the customer, their pets, the last messages, open orders,
+a few relevant products (refills due soon, then co-purchase recommendations) and the store
+config. It is built with a fixed number of queries, whatever the customer's history, and trimmed
+to AI_CONTEXT_MAX_TOKENS: the oldest messages and the least relevant products go first.
+
+A built context is cached per phone together with the id of the newest chat message; the next
+turn's message changes that id, so each turn costs one indexed lookup when nothing changed and a
+rebuild after. AI_CONTEXT_CACHE_SECONDS bounds staleness of orders and pets in between.
+"""
+import json
+from datetime import timedelta
+from typing import List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.timezone import cr_today
+from app.models.chat import ChatMessage
+from app.models.customers import Customer, Pet
+from app.models.orders import Order, OrderItem
+from app.models.products import InventoryConfig, Product
+from app.models.refills import RefillPrediction
+from app.services import customer_lookup, recommendations
+
+CLOSED_ORDER_STATUSES = ("completed", "cancelled", "refunded")
+OPEN_ORDERS = 5
+REFILL_WINDOW = timedelta(days=14)
+
+_cache = TTLCache(ttl_seconds=settings.AI_CONTEXT_CACHE_SECONDS, max_size=2000)
+
+def _cut(text: Optional[str], limit: int) -> Optional[str]:
+    if text is None or len(text) <= limit:
+        return text
+    return text[:limit - 1] + "…"
+
+def _tokens(document: dict) -> int:
+    return len(json.dumps(document, ensure_ascii=False, default=str)) // 4
+
+def _fit(document: dict) -> dict:
+    """Drop the oldest messages, then the last products, until the document fits the budget."""
+    while _tokens(document) > settings.AI_CONTEXT_MAX_TOKENS:
+        if len(document["messages"]) > 2:
+            document["messages"].pop(0)
+        elif document["products"]:
+            document["products"].pop()
+        elif document["messages"]:
+            document["messages"].pop(0)
+        else:
+            break
+    return document
+
+async def _latest_message_id(db: AsyncSession, phones: List[str]) -> Optional[int]:
+    result = await db.execute(select(func.max(ChatMessage.id)).where(ChatMessage.customer_phone.in_(phones)))
+    return result.scalar()
+
+async def _products(db: AsyncSession, customer_id: int) -> List[dict]:
+    """Refills due in the next two weeks, then recommendations; in-stock active products only."""
+    today = cr_today()
+    result = await db.execute(
+        select(Product.id, Product.name, Product.price, Product.stock, RefillPrediction.next_refill_on)
+        .join(Product, Product.id == RefillPrediction.product_id)
+        .where(
+            RefillPrediction.customer_id == customer_id,
+            RefillPrediction.next_refill_on <= today + REFILL_WINDOW,
+            Product.is_active.is_not(False),
+        )
+        .order_by(RefillPrediction.next_refill_on)
+    )
+    products = {
+        row.id: {"id": row.id, "name": row.name, "price": float(row.price), "stock": row.stock,
+                 "why": f"recompra {row.next_refill_on.isoformat()}"}
+        for row in result.all()
+    }
+    for item in await recommendations.for_customer_id(db, customer_id, limit=settings.AI_CONTEXT_PRODUCTS):
+        if item["id"] not in products and item["stock"] > 0:
+            products[item["id"]] = {"id": item["id"], "name": item["name"], "price": float(item["price"]),
+                                    "stock": item["stock"], "why": "comprado junto"}
+    return list(products.values())[:settings.AI_CONTEXT_PRODUCTS]
+
+async def build(db: AsyncSession, phone: str) -> dict:
+    phones = customer_lookup.message_phones(phone)
+    result = await db.execute(
+        select(Customer.id, Customer.full_name, Customer.phone, Customer.ai_active,
+               Customer.default_payment_method, Customer.addresses, Customer.address, Customer.notes)
+        .where(customer_lookup.phone_match(phone))
+        .order_by(Customer.phone_key.is_(None), Customer.id)
+        .limit(1)
+    )
+    customer = result.first()
+
+    result = await db.execute(
+        select(ChatMessage.sender, ChatMessage.message_type, ChatMessage.content, ChatMessage.created_at)
+        .where(ChatMessage.customer_phone.in_(phones))
+        .order_by(ChatMessage.id.desc())
+        .limit(settings.AI_CONTEXT_MESSAGES)
+    )
+    messages = [
+        {"sender": m.sender, "type": m.message_type, "text": _cut(m.content, settings.AI_CONTEXT_MESSAGE_CHARS),
+         "at": m.created_at.isoformat(timespec="minutes") if m.created_at else None}
+        for m in reversed(result.all())
+    ]
+
+    result = await db.execute(select(InventoryConfig).limit(1))
+    config = result.scalars().first()
+    store = {
+        "name": config.business_name,
+        "addresses": config.store_addresses or [],
+        "sinpe": config.sinpe_number,
+        "account": config.account_number,
+        "service_phone": config.customer_service_phone,
+    } if config else None
+
+    document = {"customer": None, "pets": [], "orders": [], "messages": messages, "products": [], "store": store}
+    if customer is None:
+        return _fit(document)
+
+    document["customer"] = {
+        "id": customer.id,
+        "name": customer.full_name,
+        "phone": customer.phone,
+        "ai_active": customer.ai_active is not False,
+        "payment_method": customer.default_payment_method,
+        "addresses": customer.addresses or ([{"address": customer.address}] if customer.address else []),
+        "notes": _cut(customer.notes, 300),
+    }
+
+    result = await db.execute(
+        select(Pet.id, Pet.name, Pet.species, Pet.breed, Pet.age_notes, Pet.weight, Pet.allergies, Pet.medical_notes)
+        .where(Pet.customer_id == customer.id)
+        .order_by(Pet.id)
+    )
+    document["pets"] = [
+        {"id": p.id, "name": p.name, "species": p.species, "breed": p.breed, "age": p.age_notes,
+         "weight": p.weight, "allergies": _cut(p.allergies, 200), "notes": _cut(p.medical_notes, 200)}
+        for p in result.all()
+    ]
+
+    # Latest open orders with their lines, in one query
+    open_orders = (
+        select(Order.id)
+        .where(Order.customer_id == customer.id, Order.status.not_in(CLOSED_ORDER_STATUSES))
+        .order_by(Order.created_at.desc())
+        .limit(OPEN_ORDERS)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(Order.id, Order.status, Order.total_amount, Order.created_at, Order.delivery_address,
+               Order.payment_method, OrderItem.quantity, Product.name)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(Order.id.in_(open_orders))
+        .order_by(Order.created_at.desc(), Order.id.desc(), OrderItem.id)
+    )
+    orders = {}
+    for row in result.all():
+        order = orders.setdefault(row.id, {
+            "id": row.id, "status": row.status, "total": float(row.total_amount),
+            "created": row.created_at.date().isoformat() if row.created_at else None,
+            "address": row.delivery_address, "payment_method": row.payment_method, "items": [],
+        })
+        order["items"].append(f"{row.quantity} x {row.name}")
+    document["orders"] = list(orders.values())
+
+    document["products"] = await _products(db, customer.id)
+    return _fit(document)
+
+async def get(db: AsyncSession, phone: str) -> dict:
+    """The context for a phone, rebuilt only when a message arrived since it was cached."""
+    key = customer_lookup.cache_key(phone)
+    latest = await _latest_message_id(db, customer_lookup.message_phones(phone))
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == latest:
+        return cached[1]
+    document = await build(db, phone)
+    _cache.set(key, (latest, document))
+    return document
+
+def invalidate(phone: str):
+    """Drop the cached context of a phone (for changes that don't add a chat message)."""
+    _cache.invalidate(customer_lookup.cache_key(phone))
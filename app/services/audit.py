@@ -0,0 +1,177 @@
+"""
+Audit trail for product, order and customer changes, written off the request path.
+
+SQLAlchemy session events collect a before/after diff of every audited row a flush touches;
+when the transaction commits the entries go to an in-memory buffer (a rollback discards them).
+`run_writer`, started in app.main, bulk-inserts the buffer into audit_logs every
+AUDIT_FLUSH_INTERVAL_MS or as soon as AUDIT_BATCH_SIZE rows are waiting.
+
+Backpressure: `get_db` awaits `wait_for_capacity()` after the request's session closes, so if the
+writer falls behind AUDIT_MAX_PENDING rows, the requests producing changes wait for it instead of
+growing the buffer without bound. On shutdown `flush_all()` writes whatever is left.
+"""
+import asyncio
+import logging
+from collections import deque
+from contextvars import ContextVar
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import event, inspect, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.customers import Customer
+from app.models.orders import Order
+from app.models.products import Product
+from app.models.users import AuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDITED = {Product: "product", Order: "order", Customer: "customer"}
+
+# Set by deps.get_current_user; None for webhook / background changes
+current_user_id: ContextVar[Optional[int]] = ContextVar("audit_user_id", default=None)
+
+_buffer: deque = deque()
+_wakeup: Optional[asyncio.Event] = None
+_drained: Optional[asyncio.Event] = None
+_writer_running = False
+
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+def _get_drained() -> asyncio.Event:
+    global _drained
+    if _drained is None:
+        _drained = asyncio.Event()
+        _drained.set()
+    return _drained
+
+def _jsonable(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool, list, dict)):
+        return value
+    return str(value)
+
+def _diff(obj, action: str) -> dict:
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if action == "update":
+            history = state.attrs[key].history
+            if not history.has_changes():
+                continue
+            before = history.deleted[0] if history.deleted else None
+            after = history.added[0] if history.added else None
+            if before == after:
+                continue
+            changes[key] = [_jsonable(before), _jsonable(after)]
+        else:
+            value = state.attrs[key].value
+            if value is not None:
+                changes[key] = _jsonable(value)
+    return changes
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    pending = session.info.setdefault("audit_pending", [])
+    user_id = current_user_id.get()
+    for objects, action in ((session.new, "create"), (session.dirty, "update"), (session.deleted, "delete")):
+        for obj in objects:
+            entity = AUDITED.get(type(obj))
+            if entity is None:
+                continue
+            changes = _diff(obj, action)
+            if action == "update" and not changes:
+                continue
+            pending.append({
+                "entity": entity,
+                # New objects only get their identity key after this hook; the PK is already set
+                "entity_id": inspect(obj).mapper.primary_key_from_instance(obj)[0],
+                "action": action,
+                "changes": changes,
+                "user_id": user_id,
+            })
+
+@event.listens_for(Session, "after_commit")
+def _publish(session):
+    pending = session.info.pop("audit_pending", None)
+    if not pending:
+        return
+    session.info["audit_published"] = True # get_db applies backpressure only to these sessions
+    now = datetime.utcnow()
+    for entry in pending:
+        entry["timestamp"] = now
+    _buffer.extend(pending)
+    if len(_buffer) >= settings.AUDIT_BATCH_SIZE:
+        _get_wakeup().set()
+    if len(_buffer) >= settings.AUDIT_MAX_PENDING:
+        _get_drained().clear()
+        _get_wakeup().set()
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("audit_pending", None)
+
+async def wait_for_capacity():
+    """Block the caller while the buffer is over AUDIT_MAX_PENDING (no-op otherwise)."""
+    if _writer_running and len(_buffer) >= settings.AUDIT_MAX_PENDING:
+        await _get_drained().wait()
+
+async def _write_batch() -> int:
+    from app.core.database import AsyncSessionLocal
+
+    batch = [_buffer.popleft() for _ in range(min(len(_buffer), settings.AUDIT_BATCH_SIZE))]
+    if not batch:
+        return 0
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(AuditLog), batch)
+            await db.commit()
+    except Exception:
+        # Keep the rows for the next attempt, in order
+        _buffer.extendleft(reversed(batch))
+        raise
+    if len(_buffer) < settings.AUDIT_MAX_PENDING:
+        _get_drained().set()
+    return len(batch)
+
+async def flush_all():
+    """Write everything buffered (call on shutdown)."""
+    while _buffer:
+        await _write_batch()
+    _get_drained().set()
+
+async def run_writer():
+    """Background loop: bulk-insert buffered audit entries every interval or when a batch is full."""
+    global _writer_running
+    _writer_running = True
+    wakeup = _get_wakeup()
+    try:
+        while True:
+            try:
+                while len(_buffer) >= settings.AUDIT_BATCH_SIZE:
+                    await _write_batch()
+                await _write_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Audit writer error", extra={"pending": len(_buffer)})
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=settings.AUDIT_FLUSH_INTERVAL_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+    finally:
+        # Nobody drains the buffer any more: don't make requests wait on it
+        _writer_running = False
+        _get_drained().set()
@@ -0,0 +1,354 @@
+"""
+WhatsApp template campaigns to customer segments, sent in the background.
+
+A campaign moves draft -> resolving -> sending -> completed (or paused / cancelled by an admin):
+
+  resolving  The segment (app.schemas.campaigns.CampaignSegment, compiled by `segment_filter`
+             into EXISTS filters over pets and orders) is walked in customer-id keyset batches;
+             each batch is inserted into campaign_recipients (one row per phone) and
+             `resolved_through` is checkpointed with it.
+  sending    Pending recipients are claimed in batches and sent by CAMPAIGN_CONCURRENCY workers
+             sharing one HTTP client, paced by a token bucket at CAMPAIGN_SENDS_PER_SECOND.
+             Throttling responses pause the bucket and requeue the recipient; other failures
+             are retried up to CAMPAIGN_MAX_ATTEMPTS.
+
+`run_campaigns` (started in app.main) runs one campaign at a time per worker process, under a
+lease on the campaign row tagged with the run's owner token. A heartbeat task keeps the lease
+alive while a batch is in flight (however long throttling pauses it), and every renewal only
+applies while the token still matches, so a runner that lost its lease stops instead of sending
+alongside the new one. If the process dies, the lease expires and the next runner resumes:
+recipients left in "sending" go back to pending (at-least-once, like the outbox), and resolution
+continues after `resolved_through`.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import httpx
+from sqlalchemy import bindparam, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.rate_limit import AsyncTokenBucket
+from app.models.campaigns import Campaign, CampaignRecipient
+from app.models.chat import ChatMessage
+from app.models.customers import Customer, Pet
+from app.models.orders import PURCHASED_STATUSES, Order, OrderItem
+from app.models.products import Product
+from app.schemas.campaigns import CampaignSegment
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("resolving", "sending")
+# How long a runner owns a campaign without renewing (the heartbeat renews it every third of this)
+LEASE = timedelta(seconds=60)
+RESOLVE_BATCH = 1000
+# Meta error codes for rate / spam throttling (besides HTTP 429)
+THROTTLE_CODES = ("130429", "131048", "131056", "80007")
+
+_wakeup: Optional[asyncio.Event] = None
+
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+def notify():
+    """Ask the runner to look for campaigns now (call after starting / resuming one)."""
+    _get_wakeup().set()
+
+def segment_filter(segment: CampaignSegment) -> list:
+    """WHERE clauses on Customer for a segment."""
+    filters = [Customer.phone.is_not(None), Customer.phone != ""]
+    if not segment.include_inactive:
+        filters.append(Customer.is_active.is_not(False))
+    if segment.ai_active is not None:
+        filters.append(Customer.ai_active == segment.ai_active)
+    if segment.species:
+        filters.append(exists().where(
+            Pet.customer_id == Customer.id,
+            func.lower(Pet.species).in_([s.lower() for s in segment.species]),
+        ))
+
+    purchased = [Order.customer_id == Customer.id, Order.status.in_(PURCHASED_STATUSES)]
+    if segment.ordered_product_ids or segment.ordered_categories:
+        bought = []
+        if segment.ordered_product_ids:
+            bought.append(OrderItem.product_id.in_(segment.ordered_product_ids))
+        if segment.ordered_categories:
+            bought.append(OrderItem.product_id.in_(
+                select(Product.id).where(Product.category.in_(segment.ordered_categories))
+            ))
+        conditions = purchased + [OrderItem.order_id == Order.id, or_(*bought)]
+        if segment.ordered_since:
+            conditions.append(Order.created_at >= segment.ordered_since)
+        filters.append(exists().where(*conditions))
+    if segment.min_orders:
+        filters.append(
+            select(func.count(Order.id)).where(*purchased).scalar_subquery() >= segment.min_orders
+        )
+    if segment.no_orders_since:
+        filters.append(~exists().where(*purchased, Order.created_at >= segment.no_orders_since))
+    return filters
+
+async def preview(db: AsyncSession, segment: CampaignSegment, sample: int = 20):
+    filters = segment_filter(segment)
+    result = await db.execute(select(func.count(func.distinct(Customer.phone))).where(*filters))
+    count = result.scalar()
+    result = await db.execute(
+        select(Customer.full_name, Customer.phone).where(*filters).order_by(Customer.id).limit(sample)
+    )
+    return count, [{"name": name, "phone": phone} for name, phone in result.all()]
+
+def _render(parameters: List[str], name: Optional[str]) -> Optional[list]:
+    if not parameters:
+        return None
+    full_name = name or ""
+    values = {"full_name": full_name, "first_name": full_name.split(" ")[0]}
+    texts = [p.replace("{first_name}", values["first_name"]).replace("{full_name}", values["full_name"]) for p in parameters]
+    return [{"type": "body", "parameters": [{"type": "text", "text": t} for t in texts]}]
+
+def _insert_for(db: AsyncSession):
+    return pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+async def _acquire(db: AsyncSession, campaign_id: int, owner: str) -> bool:
+    """Take the lease on an active campaign if it is free or expired. Commits."""
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(Campaign)
+        .where(
+            Campaign.id == campaign_id,
+            Campaign.status.in_(ACTIVE_STATUSES),
+            or_(Campaign.lease_until.is_(None), Campaign.lease_until < now),
+        )
+        .values(lease_until=now + LEASE, lease_owner=owner)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+async def _extend(db: AsyncSession, campaign_id: int, owner: str) -> bool:
+    """Push the lease out if `owner` still holds it. Doesn't commit."""
+    result = await db.execute(
+        update(Campaign)
+        .where(Campaign.id == campaign_id, Campaign.lease_owner == owner)
+        .values(lease_until=datetime.utcnow() + LEASE)
+    )
+    return result.rowcount == 1
+
+async def _renew(db: AsyncSession, campaign: Campaign, owner: str) -> bool:
+    """
+    Commit the batch and extend the lease; False once an admin paused or cancelled the campaign
+    or another runner took it over.
+    """
+    await db.flush()
+    owned = await _extend(db, campaign.id, owner)
+    # Also reloads the counters, which are bumped with SQL expressions
+    await db.refresh(campaign, ["status", "sent_count", "failed_count"])
+    active = campaign.status in ACTIVE_STATUSES
+    if owned and not active:
+        campaign.lease_until = None
+        campaign.lease_owner = None
+    await db.commit()
+    if not owned:
+        logger.warning("Campaign lease lost, stopping", extra={"campaign_id": campaign.id})
+    return owned and active
+
+async def _heartbeat(campaign_id: int, owner: str, session_factory):
+    """Keep the lease alive while this run works (a batch can wait out throttling for longer than LEASE)."""
+    while True:
+        await asyncio.sleep(LEASE.total_seconds() / 3)
+        try:
+            async with session_factory() as db:
+                owned = await _extend(db, campaign_id, owner)
+                await db.commit()
+        except Exception:
+            logger.exception("Campaign lease heartbeat failed", extra={"campaign_id": campaign_id})
+            continue
+        if not owned:
+            return
+
+async def _resolve(db: AsyncSession, campaign: Campaign, owner: str) -> bool:
+    filters = segment_filter(CampaignSegment(**(campaign.segment or {})))
+    insert = _insert_for(db)
+    while True:
+        result = await db.execute(
+            select(Customer.id, Customer.phone, Customer.full_name)
+            .where(*filters, Customer.id > campaign.resolved_through)
+            .order_by(Customer.id)
+            .limit(RESOLVE_BATCH)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        await db.execute(
+            insert(CampaignRecipient).on_conflict_do_nothing(index_elements=["campaign_id", "phone"]),
+            [{"campaign_id": campaign.id, "customer_id": cid, "phone": phone.strip(), "name": name} for cid, phone, name in rows],
+        )
+        campaign.resolved_through = rows[-1].id
+        if not await _renew(db, campaign, owner):
+            return False
+
+    result = await db.execute(
+        select(func.count(CampaignRecipient.id)).where(CampaignRecipient.campaign_id == campaign.id)
+    )
+    campaign.total_recipients = result.scalar()
+    campaign.status = "sending"
+    await db.commit()
+    logger.info("Campaign resolved", extra={"campaign_id": campaign.id, "recipients": campaign.total_recipients})
+    return True
+
+def _is_throttled(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    detail = str(getattr(error, "detail", error))
+    return status == 429 or any(code in detail for code in THROTTLE_CODES)
+
+async def _send_batch(campaign: Campaign, recipients: list, bucket: AsyncTokenBucket, http: httpx.AsyncClient) -> list:
+    from app.core.whatsapp import whatsapp_client
+
+    semaphore = asyncio.Semaphore(settings.CAMPAIGN_CONCURRENCY)
+
+    async def send(recipient_id, phone, name, attempts):
+        async with semaphore:
+            await bucket.acquire()
+            try:
+                await whatsapp_client.send_template_message(
+                    to=phone,
+                    template_name=campaign.template_name,
+                    language_code=campaign.language_code,
+                    components=_render(campaign.parameters, name),
+                    http_client=http,
+                )
+                return {"rid": recipient_id, "phone": phone, "status": "sent", "error": None, "attempts": attempts + 1}
+            except Exception as e:
+                error = str(getattr(e, "detail", e))[:2000]
+                if _is_throttled(e):
+                    # Everyone waits; this one goes back to the queue without using up an attempt
+                    bucket.pause(settings.CAMPAIGN_THROTTLE_BACKOFF_SECONDS)
+                    return {"rid": recipient_id, "phone": phone, "status": "pending", "error": error, "attempts": attempts}
+                attempts += 1
+                status = "failed" if attempts >= settings.CAMPAIGN_MAX_ATTEMPTS else "pending"
+                return {"rid": recipient_id, "phone": phone, "status": status, "error": error, "attempts": attempts}
+
+    return await asyncio.gather(*(send(*r) for r in recipients))
+
+async def _send(db: AsyncSession, campaign: Campaign, owner: str):
+    bucket = AsyncTokenBucket(settings.CAMPAIGN_SENDS_PER_SECOND, burst=settings.CAMPAIGN_CONCURRENCY)
+    batch_size = settings.CAMPAIGN_CONCURRENCY * 4
+    display = f"[Campaña: {campaign.name}] Plantilla {campaign.template_name}"
+    async with httpx.AsyncClient(timeout=15.0) as http:
+        while True:
+            result = await db.execute(
+                select(CampaignRecipient.id, CampaignRecipient.phone, CampaignRecipient.name, CampaignRecipient.attempts)
+                .where(CampaignRecipient.campaign_id == campaign.id, CampaignRecipient.status == "pending")
+                .order_by(CampaignRecipient.id)
+                .limit(batch_size)
+            )
+            recipients = result.all()
+            if not recipients:
+                break
+            await db.execute(
+                update(CampaignRecipient)
+                .where(CampaignRecipient.id.in_([r.id for r in recipients]))
+                .values(status="sending")
+            )
+            await db.commit()
+
+            outcomes = await _send_batch(campaign, recipients, bucket, http)
+
+            now = datetime.utcnow()
+            await db.execute(
+                update(CampaignRecipient.__table__)
+                .where(CampaignRecipient.__table__.c.id == bindparam("rid"))
+                .values(
+                    status=bindparam("status"),
+                    last_error=bindparam("error"),
+                    attempts=bindparam("attempts"),
+                    sent_at=bindparam("sent_at"),
+                ),
+                [dict(o, sent_at=now if o["status"] == "sent" else None) for o in outcomes],
+            )
+            sent = [o for o in outcomes if o["status"] == "sent"]
+            db.add_all([
+                ChatMessage(customer_phone=o["phone"], sender="admin", message_type="template", content=display)
+                for o in sent
+            ])
+            campaign.sent_count = Campaign.sent_count + len(sent)
+            campaign.failed_count = Campaign.failed_count + sum(1 for o in outcomes if o["status"] == "failed")
+            if not await _renew(db, campaign, owner):
+                return
+
+    campaign.status = "completed"
+    campaign.finished_at = datetime.utcnow()
+    campaign.lease_until = None
+    campaign.lease_owner = None
+    await db.commit()
+    logger.info(
+        "Campaign completed",
+        extra={"campaign_id": campaign.id, "sent": campaign.sent_count, "failed": campaign.failed_count},
+    )
+
+async def run_campaign(campaign_id: int, session_factory=AsyncSessionLocal) -> bool:
+    """Run (or resume) one campaign if no other worker holds it. Returns whether it ran."""
+    owner = uuid.uuid4().hex
+    async with session_factory() as db:
+        if not await _acquire(db, campaign_id, owner):
+            return False
+        campaign = await db.get(Campaign, campaign_id, populate_existing=True)
+        # Whoever held the lease before us is gone: its in-flight sends are retried
+        await db.execute(
+            update(CampaignRecipient)
+            .where(CampaignRecipient.campaign_id == campaign_id, CampaignRecipient.status == "sending")
+            .values(status="pending")
+        )
+        await db.commit()
+        heartbeat = asyncio.create_task(_heartbeat(campaign_id, owner, session_factory))
+        try:
+            if campaign.status == "resolving" and not await _resolve(db, campaign, owner):
+                return True
+            await _send(db, campaign, owner)
+        except BaseException:
+            # Let the next runner take over right away instead of waiting for the lease
+            await db.rollback()
+            await db.execute(
+                update(Campaign)
+                .where(Campaign.id == campaign_id, Campaign.lease_owner == owner)
+                .values(lease_until=None, lease_owner=None)
+            )
+            await db.commit()
+            raise
+        finally:
+            heartbeat.cancel()
+    return True
+
+async def run_campaigns():
+    """Background loop: run active campaigns whose lease is free, then wait for a notify or the poll interval."""
+    wakeup = _get_wakeup()
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(Campaign.id)
+                    .where(
+                        Campaign.status.in_(ACTIVE_STATUSES),
+                        or_(Campaign.lease_until.is_(None), Campaign.lease_until < datetime.utcnow()),
+                    )
+                    .order_by(Campaign.id)
+                )
+                campaign_ids = result.scalars().all()
+            for campaign_id in campaign_ids:
+                await run_campaign(campaign_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Campaign runner error")
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=settings.CAMPAIGN_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
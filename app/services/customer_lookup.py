@@ -0,0 +1,103 @@
+"""
+Phone -> customer resolution for the WhatsApp webhook.
+
+Every inbound message needs the sender's id, name and ai_active flag. Those are kept in a
+bounded per-process LRU so chatty customers cost no DB reads; misses use a column-only select
+so the customer's orders and pets are never loaded. Endpoints that change these fields call
+`invalidate()`; the TTL bounds staleness across uvicorn workers.
+
+`get_or_create` is the only way customers are created from a phone (webhook, PUT
+/customers/by-phone/{phone}): an INSERT ... ON CONFLICT DO NOTHING on the unique phone_key, so
+two messages arriving together can't create the same customer twice. Every phone lookup goes
+through `phone_match`, so a customer is found whatever format the phone was stored or asked in.
+"""
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.models.customers import Customer, normalize_phone
+
+class CustomerRef(NamedTuple):
+    id: int
+    full_name: str
+    ai_active: bool
+
+_cache = TTLCache(ttl_seconds=60, max_size=5000)
+
+def clean_phone(phone: str) -> str:
+    """Local 8-digit form of a phone (drops the 506 country code)."""
+    if phone.startswith("506") and len(phone) > 8:
+        return phone[3:]
+    return phone
+
+def phones_to_check(phone: str) -> List[str]:
+    phones = [phone]
+    if clean_phone(phone) != phone:
+        phones.append(clean_phone(phone))
+    return phones
+
+def cache_key(phone: str) -> str:
+    """Same key for every format of a phone ("+506 8888-7777", "88887777", ...)."""
+    return normalize_phone(phone) or phone
+
+def message_phones(phone: str) -> List[str]:
+    """The customer_phone values chat messages for this phone may be stored under."""
+    key = cache_key(phone)
+    return list(dict.fromkeys([phone, key, f"506{key}"]))
+
+def phone_match(phone: str):
+    """
+    WHERE clause for the customer with this phone in any format: the unique phone_key, or the raw
+    phone for the few legacy duplicates the phone_key migration left without a key.
+    """
+    return or_(
+        Customer.phone_key == normalize_phone(phone),
+        and_(Customer.phone_key.is_(None), Customer.phone.in_(phones_to_check(phone))),
+    )
+
+def invalidate(phone: str):
+    """Drop the cached entry for a phone in any of its formats (call after changing the customer)."""
+    _cache.invalidate(cache_key(phone))
+
+async def resolve(db: AsyncSession, phone: str) -> Optional[CustomerRef]:
+    ref = _cache.get(cache_key(phone))
+    if ref is not None:
+        return ref
+
+    result = await db.execute(
+        select(Customer.id, Customer.full_name, Customer.ai_active)
+        .where(phone_match(phone))
+        .order_by(Customer.phone_key.is_(None))
+        .limit(1)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    ref = CustomerRef(row.id, row.full_name, row.ai_active is not False)
+    _cache.set(cache_key(phone), ref)
+    return ref
+
+async def get_or_create(db: AsyncSession, phone: str, **defaults) -> Tuple[int, bool]:
+    """
+    Id of the customer with this phone, created with `defaults` (full_name, notes, ...) if there
+    is none, and whether it was created. Safe under concurrency. Does not commit.
+    """
+    key = normalize_phone(phone)
+    if key is None:
+        raise ValueError(f"Not a phone number: {phone!r}")
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    result = await db.execute(
+        insert(Customer)
+        .values(phone=key, phone_key=key, **defaults)
+        .on_conflict_do_nothing(index_elements=["phone_key"])
+        .returning(Customer.id)
+    )
+    customer_id = result.scalar()
+    if customer_id is not None:
+        return customer_id, True
+    result = await db.execute(select(Customer.id).where(Customer.phone_key == key))
+    return result.scalar_one(), False
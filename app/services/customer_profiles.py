@@ -0,0 +1,353 @@
+"""
+customer_profiles read model, kept up to date on write.
+
+Session events see every customer, pet, order, order item and chat message a transaction writes
+(as app.services.audit does), and just before it commits the affected profiles are updated on
+the same connection, so a read after the write always sees it:
+
+  chat message     recent_interactions / last_message_at of the phone's profile (row locked, appended)
+  customer update  the customer document only (one UPDATE from the object's state)
+  customer delete  the profile row
+  order, item, pet the customer's profile is rebuilt (a fixed set of queries, batched over customers)
+
+Rebuilds lock the existing profile rows before reading chat messages, and appends lock the row
+they append to, so concurrent message appends and rebuilds of one customer don't lose each other's
+messages: whoever commits second sees the first one's write.
+
+`as_customer` shapes a profile as app.schemas.customers.Customer (with every order) for
+GET /customers/phone/{phone}, the n8n lookup.
+
+Rows written with Core statements (bulk updates, customer_lookup.get_or_create) are not seen.
+`get` builds a missing or outdated profile in memory without storing it;
+scripts/rebuild_customer_profiles.py stores them (`--missing` after each deploy, everything to
+repair drift).
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, delete, event, func, inspect, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.chat import ChatMessage
+from app.models.customer_profiles import CustomerProfile
+from app.models.customers import Customer, Pet, normalize_phone
+from app.models.orders import PURCHASED_STATUSES, Order, OrderItem
+from app.models.products import Product
+from app.services import customer_lookup
+
+CLOSED_ORDER_STATUSES = ("completed", "cancelled", "refunded")
+RECENT_MESSAGES = 10
+OPEN_ORDERS = 5
+FAVORITE_PRODUCTS = 5
+CHUNK = 500
+
+CUSTOMER_FIELDS = ("id", "full_name", "phone", "email", "is_active", "ai_active", "address", "addresses",
+                   "default_payment_method", "notes", "created_at", "updated_at")
+PET_FIELDS = ("id", "customer_id", "name", "species", "breed", "birthdate", "age_notes", "weight",
+              "allergies", "medical_notes", "created_at")
+
+def _jsonable(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _document(row, fields) -> dict:
+    return {field: _jsonable(getattr(row, field)) for field in fields}
+
+def _message(message) -> dict:
+    return {
+        "sender": message.sender,
+        "message_type": message.message_type or "text",
+        "content": message.content,
+        "created_at": _jsonable(message.created_at or datetime.utcnow()),
+    }
+
+def _chunks(ids: Iterable) -> Iterable[list]:
+    ids = sorted(ids)
+    for i in range(0, len(ids), CHUNK):
+        yield ids[i:i + CHUNK]
+
+def _phone_variants(key: str) -> List[str]:
+    return [key, f"506{key}"]
+
+def _build_rows(conn: Connection, customer_ids: List[int]) -> List[dict]:
+    """customer_profiles rows for these customers, read from the source tables (nothing written)."""
+    result = conn.execute(select(*(getattr(Customer, f) for f in CUSTOMER_FIELDS), Customer.phone_key).where(Customer.id.in_(customer_ids)))
+    customers = {row.id: row for row in result.all()}
+    if not customers:
+        return []
+
+    pets = defaultdict(list)
+    result = conn.execute(select(*(getattr(Pet, f) for f in PET_FIELDS)).where(Pet.customer_id.in_(customers)).order_by(Pet.id))
+    for row in result.all():
+        pets[row.customer_id].append(_document(row, PET_FIELDS))
+
+    purchased = Order.status.in_(PURCHASED_STATUSES)
+    result = conn.execute(
+        select(
+            Order.customer_id,
+            func.sum(case((purchased, Order.total_amount), else_=0)),
+            func.sum(case((purchased, 1), else_=0)),
+            func.sum(case((Order.status.not_in(CLOSED_ORDER_STATUSES), 1), else_=0)),
+            func.max(Order.created_at),
+            func.max(Order.id),
+        )
+        .where(Order.customer_id.in_(customers))
+        .group_by(Order.customer_id)
+    )
+    totals = {row[0]: row[1:] for row in result.all()}
+
+    # Every order with its lines (the n8n lookup returns them all); open and last orders are picked from them
+    result = conn.execute(
+        select(Order.id, Order.customer_id, Order.status, Order.total_amount, Order.payment_method,
+               Order.payment_proof, Order.delivery_address, Order.created_at,
+               OrderItem.quantity, OrderItem.unit_price_at_moment, OrderItem.subtotal, Product.name)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .where(Order.customer_id.in_(customers))
+        .order_by(Order.created_at.desc(), Order.id.desc(), OrderItem.id)
+    )
+    orders: Dict[int, dict] = {}
+    orders_by_customer = defaultdict(list)
+    for row in result.all():
+        if row.id not in orders:
+            orders_by_customer[row.customer_id].append(row.id)
+        order = orders.setdefault(row.id, {
+            "id": row.id, "customer_id": row.customer_id, "status": row.status,
+            "total_amount": _jsonable(row.total_amount), "payment_method": row.payment_method,
+            "payment_proof": row.payment_proof, "delivery_address": row.delivery_address,
+            "created_at": _jsonable(row.created_at), "items": [],
+        })
+        if row.name is not None:
+            order["items"].append({
+                "name": row.name, "quantity": row.quantity,
+                "unit_price_at_moment": _jsonable(row.unit_price_at_moment), "subtotal": _jsonable(row.subtotal),
+            })
+
+    result = conn.execute(
+        select(Order.customer_id, OrderItem.product_id, Product.name, func.sum(OrderItem.quantity).label("units"))
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(Order.customer_id.in_(customers), purchased)
+        .group_by(Order.customer_id, OrderItem.product_id, Product.name)
+    )
+    favorites = defaultdict(list)
+    for row in result.all():
+        favorites[row.customer_id].append({"product_id": row.product_id, "name": row.name, "quantity": int(row.units)})
+
+    # Last messages per phone (messages are stored with or without the 506 prefix)
+    owner = {}
+    for customer in customers.values():
+        if customer.phone_key:
+            for phone in _phone_variants(customer.phone_key):
+                owner[phone] = customer.id
+        if customer.phone:
+            owner.setdefault(customer.phone, customer.id)
+    messages = defaultdict(list)
+    for chunk in _chunks(owner):
+        ranked = (
+            select(ChatMessage.id, ChatMessage.customer_phone, ChatMessage.sender, ChatMessage.message_type,
+                   ChatMessage.content, ChatMessage.created_at,
+                   func.row_number().over(partition_by=ChatMessage.customer_phone, order_by=ChatMessage.id.desc()).label("rn"))
+            .where(ChatMessage.customer_phone.in_(chunk))
+            .subquery()
+        )
+        result = conn.execute(select(ranked).where(ranked.c.rn <= RECENT_MESSAGES))
+        for row in result.all():
+            messages[owner[row.customer_phone]].append(row)
+
+    now = datetime.utcnow()
+    rows = []
+    for customer_id, customer in customers.items():
+        lifetime_value, order_count, open_count, last_order_at, last_order_id = totals.get(customer_id, (0, 0, 0, None, None))
+        customer_orders = [orders[order_id] for order_id in orders_by_customer[customer_id]]
+        recent = sorted(messages[customer_id], key=lambda m: m.id)[-RECENT_MESSAGES:]
+        rows.append({
+            "customer_id": customer_id,
+            "phone_key": customer.phone_key,
+            "lifetime_value": lifetime_value or 0,
+            "order_count": order_count or 0,
+            "open_order_count": open_count or 0,
+            "last_order_at": last_order_at,
+            "last_message_at": recent[-1].created_at if recent else None,
+            "customer": _document(customer, CUSTOMER_FIELDS),
+            "pets": pets[customer_id],
+            "last_order": orders.get(last_order_id),
+            "open_orders": [o for o in customer_orders if o["status"] not in CLOSED_ORDER_STATUSES][:OPEN_ORDERS],
+            "orders": customer_orders,
+            "favorite_products": sorted(favorites[customer_id], key=lambda f: -f["quantity"])[:FAVORITE_PRODUCTS],
+            "recent_interactions": [_message(m) for m in recent],
+            "updated_at": now,
+        })
+    return rows
+
+def _rebuild_chunk(conn: Connection, customer_ids: List[int]) -> int:
+    if conn.dialect.name != "sqlite": # SQLite writers already hold the database write lock here
+        conn.execute(
+            select(CustomerProfile.customer_id)
+            .where(CustomerProfile.customer_id.in_(customer_ids))
+            .order_by(CustomerProfile.customer_id)
+            .with_for_update()
+        )
+    rows = _build_rows(conn, customer_ids)
+    if not rows:
+        return 0
+    insert = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(CustomerProfile)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["customer_id"],
+        set_={c.name: stmt.excluded[c.name] for c in CustomerProfile.__table__.columns if c.name != "customer_id"},
+    )
+    conn.execute(stmt, rows)
+    return len(rows)
+
+def rebuild(conn: Connection, customer_ids: Iterable[int]) -> int:
+    """Recompute the profiles of these customers from scratch (sync; on the caller's transaction)."""
+    return sum(_rebuild_chunk(conn, chunk) for chunk in _chunks(set(customer_ids)))
+
+def _append_messages(conn: Connection, new_messages: Dict[str, list]):
+    by_key = defaultdict(list)
+    for phone, messages in new_messages.items():
+        key = normalize_phone(phone)
+        if key:
+            by_key[key].extend(messages)
+    if not by_key:
+        return
+    result = conn.execute(
+        select(CustomerProfile.customer_id, CustomerProfile.phone_key, CustomerProfile.recent_interactions)
+        .where(CustomerProfile.phone_key.in_(list(by_key)))
+        .order_by(CustomerProfile.customer_id)
+        .with_for_update() # Another transaction's append or rebuild commits first, then we read it
+    )
+    for customer_id, key, recent in result.all():
+        recent = ((recent or []) + by_key[key])[-RECENT_MESSAGES:]
+        conn.execute(
+            update(CustomerProfile)
+            .where(CustomerProfile.customer_id == customer_id)
+            .values(recent_interactions=recent, last_message_at=datetime.fromisoformat(recent[-1]["created_at"]),
+                    updated_at=datetime.utcnow())
+        )
+
+def _changes(session: Session) -> dict:
+    return session.info.setdefault("customer_profiles", {
+        "rebuild": set(), "orders": set(), "customers": {}, "deleted": set(), "messages": defaultdict(list),
+    })
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    changes = None
+    for objects, action in ((session.new, "create"), (session.dirty, "update"), (session.deleted, "delete")):
+        for obj in objects:
+            if not isinstance(obj, (Customer, Pet, Order, OrderItem, ChatMessage)):
+                continue
+            changes = changes or _changes(session)
+            if isinstance(obj, ChatMessage):
+                if action == "create":
+                    changes["messages"][obj.customer_phone].append(_message(obj))
+            elif isinstance(obj, Customer):
+                if action == "delete":
+                    changes["deleted"].add(obj.id)
+                elif action == "create":
+                    changes["rebuild"].add(obj.id)
+                else:
+                    changes["customers"][obj.id] = _document(obj, CUSTOMER_FIELDS) | {"phone_key": obj.phone_key}
+            elif isinstance(obj, OrderItem):
+                changes["orders"].add(obj.order_id)
+            elif obj.customer_id is not None:
+                changes["rebuild"].add(obj.customer_id)
+                # An order or pet moved to another customer: the old one changes too
+                history = inspect(obj).attrs.customer_id.history
+                changes["rebuild"].update(c for c in history.deleted if c is not None)
+
+@event.listens_for(Session, "before_commit")
+def _apply(session):
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    changes = session.info.pop("customer_profiles", None)
+    if not changes:
+        return
+    conn = session.connection()
+    rebuild_ids = changes["rebuild"]
+    if changes["orders"]:
+        result = conn.execute(select(Order.customer_id).where(Order.id.in_(changes["orders"])))
+        rebuild_ids.update(result.scalars().all())
+    rebuild_ids -= changes["deleted"]
+
+    if changes["deleted"]:
+        conn.execute(delete(CustomerProfile).where(CustomerProfile.customer_id.in_(changes["deleted"])))
+    for customer_id, document in changes["customers"].items():
+        if customer_id in rebuild_ids or customer_id in changes["deleted"]:
+            continue
+        phone_key = document.pop("phone_key")
+        conn.execute(
+            update(CustomerProfile)
+            .where(CustomerProfile.customer_id == customer_id)
+            .values(customer=document, phone_key=phone_key, updated_at=datetime.utcnow())
+        )
+    if rebuild_ids:
+        rebuild(conn, rebuild_ids)
+    if changes["messages"]:
+        # Rebuilt profiles already include the messages flushed in this transaction
+        rebuilt = set()
+        if rebuild_ids:
+            result = conn.execute(select(Customer.phone_key).where(Customer.id.in_(rebuild_ids)))
+            rebuilt = set(result.scalars().all())
+        _append_messages(conn, {
+            phone: messages for phone, messages in changes["messages"].items()
+            if normalize_phone(phone) not in rebuilt
+        })
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("customer_profiles", None)
+
+def as_customer(profile: CustomerProfile) -> dict:
+    """The profile as app.schemas.customers.Customer data."""
+    return {
+        **profile.customer,
+        "pets": profile.pets or [],
+        "orders": [
+            {**o, "items": [
+                {"product": {"name": i["name"]}, "quantity": i["quantity"],
+                 "unit_price_at_moment": i.get("unit_price_at_moment") or 0, "subtotal": i.get("subtotal") or 0}
+                for i in o["items"]
+            ]}
+            for o in profile.orders or []
+        ],
+        "recent_interactions": profile.recent_interactions or [],
+    }
+
+async def get(db: AsyncSession, phone: str) -> Optional[CustomerProfile]:
+    """
+    Profile of the customer with this phone; None for unknown phones.
+    A missing or outdated row (not backfilled yet) is built in memory from db and not stored,
+    so reads never write.
+    """
+    key = normalize_phone(phone)
+    if key is None:
+        return None
+    result = await db.execute(select(CustomerProfile).where(CustomerProfile.phone_key == key))
+    profile = result.scalars().first()
+    if profile is None:
+        result = await db.execute(
+            select(Customer.id).where(customer_lookup.phone_match(phone)).order_by(Customer.phone_key.is_(None)).limit(1)
+        )
+        customer_id = result.scalar()
+        if customer_id is None:
+            return None
+        # Legacy customers without a phone_key have a profile, just not one found by phone_key
+        profile = await db.get(CustomerProfile, customer_id)
+    else:
+        customer_id = profile.customer_id
+    if profile is not None and profile.orders is not None:
+        return profile
+    rows = await db.run_sync(lambda session: _build_rows(session.connection(), [customer_id]))
+    return CustomerProfile(**rows[0]) if rows else None
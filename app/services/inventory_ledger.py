@@ -0,0 +1,131 @@
+"""
+Inventory ledger: every change to Product.stock goes through `record` / `set_stock`, which
+write the matching InventoryMovement in the same transaction.
+
+Movement quantities are positive for "in" and "out"; "adjustment" quantities carry their sign.
+`take_snapshots` periodically stores each product's ledger balance, so the stock at any point
+in time is the last snapshot before it plus the (short) tail of movements after that snapshot.
+`reconcile` compares that balance with Product.stock.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.products import InventoryMovement, InventorySnapshot, Product
+
+SIGNED_QUANTITY = case(
+    (InventoryMovement.type == "out", -InventoryMovement.quantity),
+    else_=InventoryMovement.quantity,
+)
+
+def record(db: AsyncSession, product: Product, type: str, quantity: int, reason: str, user_id: Optional[int] = None):
+    """Apply a movement to product.stock and add it to the ledger. Does not commit."""
+    if quantity == 0:
+        return
+    if type not in ("in", "out", "adjustment"):
+        raise ValueError(f"Unknown movement type: {type!r}")
+    product.stock = (product.stock or 0) + (-quantity if type == "out" else quantity)
+    db.add(InventoryMovement(
+        product=product,
+        type=type,
+        quantity=quantity,
+        reason=reason,
+        created_by_user_id=user_id,
+    ))
+
+def set_stock(db: AsyncSession, product: Product, stock: int, reason: str, user_id: Optional[int] = None):
+    """Set an absolute stock level (manual edit, import) as an adjustment for the difference."""
+    record(db, product, "adjustment", stock - (product.stock or 0), reason, user_id)
+
+def _latest_snapshots(before: Optional[datetime], product_id: Optional[int]):
+    """Latest snapshot id per product (taken at or before `before`, if given)."""
+    query = select(InventorySnapshot.product_id, func.max(InventorySnapshot.id).label("snapshot_id"))
+    if before is not None:
+        query = query.where(InventorySnapshot.taken_at <= before)
+    if product_id is not None:
+        query = query.where(InventorySnapshot.product_id == product_id)
+    return query.group_by(InventorySnapshot.product_id).subquery()
+
+def _balances(at: Optional[datetime] = None, product_id: Optional[int] = None):
+    """
+    (product_id, ledger stock, last movement id) per product: latest snapshot + movements after it.
+    Both the snapshot lookup and the movement tail are index range scans.
+    """
+    latest = _latest_snapshots(at, product_id)
+    snapshot = (
+        select(InventorySnapshot.product_id, InventorySnapshot.stock, InventorySnapshot.last_movement_id)
+        .join(latest, InventorySnapshot.id == latest.c.snapshot_id)
+        .subquery()
+    )
+    tail_filter = [InventoryMovement.id > func.coalesce(snapshot.c.last_movement_id, 0)]
+    if at is not None:
+        tail_filter.append(InventoryMovement.created_at <= at)
+    tail = (
+        select(
+            Product.id.label("product_id"),
+            func.coalesce(func.sum(SIGNED_QUANTITY), 0).label("delta"),
+            func.max(InventoryMovement.id).label("last_movement_id"),
+        )
+        .select_from(Product)
+        .outerjoin(snapshot, snapshot.c.product_id == Product.id)
+        .outerjoin(InventoryMovement, and_(InventoryMovement.product_id == Product.id, *tail_filter))
+    )
+    if product_id is not None:
+        tail = tail.where(Product.id == product_id)
+    tail = tail.group_by(Product.id).subquery()
+    query = (
+        select(
+            Product.id,
+            (func.coalesce(snapshot.c.stock, 0) + tail.c.delta).label("ledger_stock"),
+            func.coalesce(tail.c.last_movement_id, snapshot.c.last_movement_id, 0).label("last_movement_id"),
+            (tail.c.last_movement_id.is_not(None)).label("has_tail"),
+            (snapshot.c.product_id.is_not(None)).label("has_snapshot"),
+        )
+        .join(tail, tail.c.product_id == Product.id)
+        .outerjoin(snapshot, snapshot.c.product_id == Product.id)
+    )
+    if product_id is not None:
+        query = query.where(Product.id == product_id)
+    return query
+
+async def stock_as_of(db: AsyncSession, product_id: int, at: datetime) -> int:
+    result = await db.execute(_balances(at, product_id))
+    row = result.first()
+    return row.ledger_stock if row else 0
+
+async def take_snapshots(db: AsyncSession) -> int:
+    """Snapshot every product whose ledger moved since its last snapshot. Does not commit."""
+    now = datetime.utcnow()
+    result = await db.execute(_balances())
+    count = 0
+    for row in result.all():
+        if row.has_snapshot and not row.has_tail:
+            continue
+        db.add(InventorySnapshot(
+            product_id=row.id, taken_at=now, stock=row.ledger_stock, last_movement_id=row.last_movement_id,
+        ))
+        count += 1
+    return count
+
+async def reconcile(db: AsyncSession) -> List[dict]:
+    """Products whose stock column disagrees with the ledger."""
+    balances = _balances().subquery()
+    result = await db.execute(
+        select(Product.id, Product.sku, Product.name, Product.stock, balances.c.ledger_stock)
+        .join(balances, balances.c.id == Product.id)
+        .where(Product.stock != balances.c.ledger_stock)
+        .order_by(Product.id)
+    )
+    return [
+        {
+            "product_id": row.id,
+            "sku": row.sku,
+            "name": row.name,
+            "stock": row.stock,
+            "ledger_stock": row.ledger_stock,
+            "drift": row.stock - row.ledger_stock,
+        }
+        for row in result.all()
+    ]
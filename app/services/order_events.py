@@ -0,0 +1,119 @@
+"""
+Order status history (order_events) and the reports computed from it.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, func, case, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from app.models import Order
+from app.models.order_events import OrderEvent
+
+def record_transition(db: AsyncSession, order: Order, from_status: Optional[str], source: str, user_id: Optional[int] = None):
+    """Append an event if the status actually changed. Does not commit."""
+    if from_status == order.status:
+        return
+    db.add(OrderEvent(
+        order=order,
+        from_status=from_status,
+        to_status=order.status,
+        source=source,
+        user_id=user_id,
+    ))
+
+def transition(db: AsyncSession, order: Order, to_status: str, source: str, user_id: Optional[int] = None):
+    """Set `order.status` and record the transition. Does not commit."""
+    from_status = order.status
+    order.status = to_status
+    record_transition(db, order, from_status, source, user_id)
+
+class seconds_between(FunctionElement):
+    """SQL expression: seconds elapsed between two timestamp columns."""
+    type = Float()
+    inherit_cache = True
+    name = "seconds_between"
+
+@compiles(seconds_between)
+def _compile_seconds_between_default(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"EXTRACT(EPOCH FROM ({compiler.process(end, **kw)} - {compiler.process(start, **kw)}))"
+
+@compiles(seconds_between, "sqlite")
+def _compile_seconds_between_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"((julianday({compiler.process(end, **kw)}) - julianday({compiler.process(start, **kw)})) * 86400.0)"
+
+def _percentile(ranked, pct: int):
+    # Nearest-rank percentile from ROW_NUMBER()/COUNT() windows; integer division works on SQLite and Postgres
+    return func.max(case((ranked.c.rn == (ranked.c.cnt * pct + 99) // 100, ranked.c.seconds)))
+
+async def status_flow_report(db: AsyncSession, start: datetime, end: datetime) -> list:
+    """
+    Per status: how many orders entered it in [start, end), how many left it and how long they
+    stayed (avg / p50 / p90 seconds), plus how many orders are in it right now.
+    """
+    orders_in_range = (
+        select(OrderEvent.order_id)
+        .where(OrderEvent.created_at >= start, OrderEvent.created_at < end)
+        .distinct()
+    )
+    # LEAD() must see each order's full history, so the range is applied after the window
+    events = (
+        select(
+            OrderEvent.order_id,
+            OrderEvent.to_status.label("status"),
+            OrderEvent.created_at.label("entered_at"),
+            func.lead(OrderEvent.created_at).over(
+                partition_by=OrderEvent.order_id,
+                order_by=(OrderEvent.created_at, OrderEvent.id),
+            ).label("left_at"),
+        )
+        .where(OrderEvent.order_id.in_(orders_in_range))
+        .subquery()
+    )
+    in_range = (events.c.entered_at >= start, events.c.entered_at < end)
+
+    entered = await db.execute(
+        select(events.c.status, func.count(func.distinct(events.c.order_id)))
+        .where(*in_range)
+        .group_by(events.c.status)
+    )
+    report = {
+        status: {"status": status, "orders_entered": count, "orders_exited": 0,
+                 "avg_seconds": None, "p50_seconds": None, "p90_seconds": None, "currently_in_state": 0}
+        for status, count in entered.all()
+    }
+
+    duration = seconds_between(events.c.entered_at, events.c.left_at)
+    ranked = (
+        select(
+            events.c.status,
+            duration.label("seconds"),
+            func.row_number().over(partition_by=events.c.status, order_by=duration).label("rn"),
+            func.count().over(partition_by=events.c.status).label("cnt"),
+        )
+        .where(events.c.left_at.isnot(None), *in_range)
+        .subquery()
+    )
+    latencies = await db.execute(
+        select(
+            ranked.c.status,
+            func.count(),
+            func.avg(ranked.c.seconds),
+            _percentile(ranked, 50),
+            _percentile(ranked, 90),
+        ).group_by(ranked.c.status)
+    )
+    for status, exited, avg_s, p50, p90 in latencies.all():
+        row = report[status]
+        row.update(orders_exited=exited, avg_seconds=avg_s, p50_seconds=p50, p90_seconds=p90)
+
+    current = await db.execute(select(Order.status, func.count(Order.id)).group_by(Order.status))
+    for status, count in current.all():
+        if status in report:
+            report[status]["currently_in_state"] = count
+
+    return sorted(report.values(), key=lambda r: -r["orders_entered"])
@@ -0,0 +1,213 @@
+"""
+Transactional outbox for order notifications.
+
+Request handlers only insert OutboxEvent rows next to the order change and commit once.
+The relay task started in app.main delivers them to WhatsApp / n8n with retries, so a slow
+Meta API never blocks the admin UI and a crash can't leave a paid order without its event.
+Delivery is at-least-once per destination; claiming uses a lease so a crashed worker's
+events become due again instead of being lost.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+import httpx
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.chat import ChatMessage
+from app.models.orders import Order
+from app.models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+ORDER_STATUS_CHANGED = "order.status_changed"
+
+# How long a claimed event is hidden from other workers while it is being delivered
+CLAIM_LEASE = timedelta(seconds=60)
+
+_wakeup: Optional[asyncio.Event] = None
+
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+def notify():
+    """Ask the relay to poll now instead of waiting for the next interval (call after commit)."""
+    _get_wakeup().set()
+
+def enqueue(
+    db: AsyncSession,
+    destination: str,
+    event_type: str,
+    aggregate_type: str,
+    aggregate_id: int,
+    payload: dict,
+    not_before: Optional[datetime] = None,
+) -> OutboxEvent:
+    """Add an event (delivered as soon as possible, or not before `not_before`). Does not commit."""
+    event = OutboxEvent(
+        destination=destination,
+        event_type=event_type,
+        aggregate_type=aggregate_type,
+        aggregate_id=aggregate_id,
+        payload=payload,
+        next_attempt_at=not_before or datetime.utcnow(),
+    )
+    db.add(event)
+    return event
+
+async def cancel(db: AsyncSession, event_id: int) -> bool:
+    """Cancel an event that hasn't been delivered yet. Does not commit."""
+    result = await db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id == event_id, OutboxEvent.status == "pending")
+        .values(status="cancelled")
+    )
+    return result.rowcount == 1
+
+def enqueue_order_status_change(db: AsyncSession, order: Order, old_status: Optional[str]):
+    """
+    Record the notifications for an order status transition. Does not commit.
+    `order.customer` must be loaded.
+    """
+    if old_status == order.status:
+        return
+
+    customer = order.customer
+    payload = {
+        "order_id": order.id,
+        "old_status": old_status,
+        "new_status": order.status,
+        "customer_id": order.customer_id,
+        "customer_phone": customer.phone if customer else None,
+        "customer_name": customer.full_name if customer else None,
+        "total_amount": str(order.total_amount),
+    }
+
+    if order.status == "paid" and customer and customer.phone:
+        payload_wa = dict(payload, message=(
+            f"Hola {customer.full_name} el pago del pedido {order.id} fue confirmado, "
+            f"el pedido se encuentra en preparación"
+        ))
+        enqueue(db, "whatsapp", ORDER_STATUS_CHANGED, "order", order.id, payload_wa)
+
+    if settings.N8N_EVENTS_WEBHOOK_URL:
+        enqueue(db, "n8n", ORDER_STATUS_CHANGED, "order", order.id, payload)
+
+async def _deliver_whatsapp(db: AsyncSession, event: OutboxEvent):
+    from app.core.whatsapp import whatsapp_client
+
+    message = event.payload["message"]
+    phone = event.payload["customer_phone"]
+    await whatsapp_client.send_message(to=phone, content=message)
+    # Logged in the same transaction that marks the event as sent
+    db.add(ChatMessage(customer_phone=phone, sender="ai", message_type="text", content=message))
+
+async def _deliver_whatsapp_template(db: AsyncSession, event: OutboxEvent):
+    from app.core.whatsapp import whatsapp_client
+
+    payload = event.payload
+    phone = payload["customer_phone"]
+    await whatsapp_client.send_template_message(
+        to=phone,
+        template_name=payload["template_name"],
+        language_code=payload["language_code"],
+        components=payload.get("components"),
+    )
+    db.add(ChatMessage(customer_phone=phone, sender="ai", message_type="text", content=payload["summary"]))
+
+async def _deliver_n8n(db: AsyncSession, event: OutboxEvent):
+    async with httpx.AsyncClient() as client:
+        with metrics.observe_n8n("events") as outcome:
+            response = await client.post(
+                settings.N8N_EVENTS_WEBHOOK_URL,
+                json={"event_id": event.id, "event_type": event.event_type, **event.payload},
+                timeout=10.0,
+            )
+            outcome["value"] = str(response.status_code)
+        response.raise_for_status()
+
+_HANDLERS = {
+    "whatsapp": _deliver_whatsapp,
+    "whatsapp_template": _deliver_whatsapp_template,
+    "n8n": _deliver_n8n,
+}
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempts * 5, 3600))
+
+async def _claim(db: AsyncSession, event_id: int, now: datetime) -> bool:
+    result = await db.execute(
+        update(OutboxEvent)
+        .where(
+            OutboxEvent.id == event_id,
+            OutboxEvent.status == "pending",
+            OutboxEvent.next_attempt_at <= now,
+        )
+        .values(next_attempt_at=now + CLAIM_LEASE, attempts=OutboxEvent.attempts + 1)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+async def relay_once(session_factory=AsyncSessionLocal) -> int:
+    """Deliver one batch of due events. Returns how many were delivered."""
+    delivered = 0
+    async with session_factory() as db:
+        now = datetime.utcnow()
+        result = await db.execute(
+            select(OutboxEvent.id)
+            .where(OutboxEvent.status == "pending", OutboxEvent.next_attempt_at <= now)
+            .order_by(OutboxEvent.id)
+            .limit(settings.OUTBOX_BATCH_SIZE)
+        )
+        for event_id in result.scalars().all():
+            if not await _claim(db, event_id, now):
+                continue # Another worker got it
+            event = await db.get(OutboxEvent, event_id, populate_existing=True)
+            handler = _HANDLERS.get(event.destination)
+            try:
+                if handler is None:
+                    raise ValueError(f"No outbox handler for destination '{event.destination}'")
+                await handler(db, event)
+                event.status = "sent"
+                event.sent_at = datetime.utcnow()
+                event.last_error = None
+                delivered += 1
+            except Exception as e:
+                await db.rollback()
+                event = await db.get(OutboxEvent, event_id, populate_existing=True)
+                event.last_error = str(getattr(e, "detail", e))[:2000]
+                if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    event.status = "failed"
+                else:
+                    event.next_attempt_at = datetime.utcnow() + _backoff(event.attempts)
+                logger.warning(
+                    "Outbox delivery failed",
+                    extra={"event_id": event_id, "attempt": event.attempts, "error": event.last_error},
+                )
+            await db.commit()
+    return delivered
+
+async def run_relay():
+    """Background loop: deliver due events, then sleep until notified or the poll interval passes."""
+    wakeup = _get_wakeup()
+    while True:
+        try:
+            with metrics.track_in_flight("outbox_relay"):
+                await relay_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Outbox relay error")
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=settings.OUTBOX_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
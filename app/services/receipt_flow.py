@@ -0,0 +1,251 @@
+"""
+WhatsApp payment receipt interception.
+
+When a customer with open orders sends an image/document we ask whether it is a payment
+receipt and, if several orders are open, which order it belongs to. The conversation's
+position in that flow lives in ConversationState (one row per customer), so a normal text
+message costs a single primary-key lookup and only images query the customer's open orders.
+
+Every transition updates the orders, the state row and the AI reply in one commit, after
+the WhatsApp reply has been accepted by Meta.
+"""
+import re
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.whatsapp import whatsapp_client
+from app.models.chat import ChatMessage
+from app.models.conversations import ConversationState
+from app.models.orders import Order
+from app.services import sales_rollup, order_events
+from app.services.customer_lookup import CustomerRef
+
+IDLE = "idle"
+AWAITING_SINGLE = "awaiting_receipt_confirmation"
+AWAITING_MULTIPLE = "awaiting_receipt_confirmation_multiple"
+AWAITING_SELECTION = "awaiting_receipt_selection"
+
+YES_WORDS = ["si", "sí", "yes"]
+YES_NO_WORDS = YES_WORDS + ["no"]
+
+MSG_RECEIVED_THANKS = "¡Gracias! Hemos recibido tu comprobante para la orden #{order_id} y está en revisión para confirmación final."
+MSG_UNDERSTOOD = "Entendido. Por favor envíanos un texto si necesitas ayuda adicional."
+MSG_SELECT_ORDER = "Vemos que tienes varias órdenes pendientes. Por favor selecciona a cuál pertenece este comprobante:"
+
+class _Turn:
+    """Per-message context shared by the handlers."""
+
+    def __init__(self, db: AsyncSession, customer: CustomerRef, phone: str, msg_type: str, content: str):
+        self.db = db
+        self.customer = customer
+        self.phone = phone
+        self.msg_type = msg_type
+        self.content = content
+        self.user_text = content.strip().lower()
+
+    def set_status(self, order: Order, status: str):
+        before = sales_rollup.snapshot(order)
+        order_events.transition(self.db, order, status, source="whatsapp")
+        return before
+
+    async def reply(self, text: str, send):
+        """Send via WhatsApp, then log the AI message and commit the whole transition at once."""
+        await send
+        self.db.add(ChatMessage(customer_phone=self.phone, sender="ai", message_type="text", content=text))
+        await self.db.commit()
+
+def _set_state(state: ConversationState, value: str, orders: List[Order] = (), receipt_url: Optional[str] = None):
+    state.state = value
+    state.order_ids = [o.id for o in orders]
+    state.pending_receipt_url = receipt_url
+
+async def _load_state_orders(db: AsyncSession, state: ConversationState) -> List[Order]:
+    """Orders referenced by the state that are still in the state's status (admin may have moved them)."""
+    if not state.order_ids:
+        return []
+    result = await db.execute(
+        select(Order)
+        .where(Order.id.in_(state.order_ids), Order.status == state.state)
+        .order_by(Order.id)
+        .options(selectinload(Order.items)) # sales_rollup snapshots need the lines
+    )
+    return list(result.scalars().all())
+
+def _release(turn: _Turn, orders: List[Order], state: ConversationState):
+    """Put orders back to pending_payment without a receipt and clear the conversation state."""
+    for o in orders:
+        turn.set_status(o, "pending_payment")
+        o.pending_receipt_url = None
+    _set_state(state, IDLE)
+
+async def _handle_receipt_image(turn: _Turn, state: ConversationState) -> bool:
+    db = turn.db
+    open_ids = []
+    if state.state != IDLE:
+        open_ids = [o.id for o in await _load_state_orders(db, state)]
+        if not open_ids:
+            # The admin resolved these orders in the meantime; nothing left to ask about
+            _set_state(state, IDLE)
+
+    # The customer's other unpaid orders are offered as before. An open question's orders keep
+    # their status and receipt; if a new question replaces it in the state row, they are
+    # offered again with the next image instead of staying in a receipt sub-state.
+    result = await db.execute(
+        select(Order)
+        .where(
+            Order.customer_id == turn.customer.id,
+            Order.status.in_(["created", "pending_payment", AWAITING_SINGLE, AWAITING_MULTIPLE, AWAITING_SELECTION]),
+            Order.payment_proof.is_(None),
+            Order.id.not_in(open_ids),
+        )
+        .order_by(Order.id)
+        .options(selectinload(Order.items)) # sales_rollup snapshots need the lines
+    )
+    candidates = list(result.scalars().all())
+
+    if len(candidates) == 1:
+        # Case A: 1 pending order
+        order = candidates[0]
+        before = turn.set_status(order, AWAITING_SINGLE)
+        order.pending_receipt_url = turn.content
+        await sales_rollup.record_order_change(db, before, order)
+        _set_state(state, AWAITING_SINGLE, [order], turn.content)
+
+        msg_text = f"Hemos recibido una imagen. ¿Es este el comprobante de pago para tu orden #{order.id} por ₡{order.total_amount:,.2f}?"
+        await turn.reply(msg_text, whatsapp_client.send_interactive_buttons(
+            to=turn.phone,
+            body_text=msg_text,
+            buttons=[
+                {"id": "receipt_confirm_yes", "title": "SÍ"},
+                {"id": "receipt_confirm_no", "title": "NO"}
+            ]
+        ))
+    elif len(candidates) > 1:
+        # Case B Step 1: Multiple pending orders
+        for o in candidates:
+            before = turn.set_status(o, AWAITING_MULTIPLE)
+            o.pending_receipt_url = turn.content
+            await sales_rollup.record_order_change(db, before, o)
+        _set_state(state, AWAITING_MULTIPLE, candidates, turn.content)
+
+        msg_text = "Hemos recibido una imagen. ¿Es un comprobante de pago?"
+        await turn.reply(msg_text, whatsapp_client.send_interactive_buttons(
+            to=turn.phone,
+            body_text=msg_text,
+            buttons=[
+                {"id": "receipt_multiple_yes", "title": "SÍ"},
+                {"id": "receipt_multiple_no", "title": "NO"}
+            ]
+        ))
+    else:
+        # No pending orders
+        msg_text = "Aún no estoy entrenada para analizar imágenes. Por favor envíame texto."
+        await turn.reply(msg_text, whatsapp_client.send_message(turn.phone, msg_text))
+    return False
+
+async def _handle_single_confirmation(turn: _Turn, state: ConversationState, orders: List[Order]) -> bool:
+    order = orders[0]
+    is_yes = turn.content == "receipt_confirm_yes" or turn.user_text in YES_WORDS
+    turn.set_status(order, "pending_payment")
+    if is_yes:
+        order.payment_proof = order.pending_receipt_url
+        msg_text = MSG_RECEIVED_THANKS.format(order_id=order.id)
+    else:
+        msg_text = MSG_UNDERSTOOD
+    order.pending_receipt_url = None
+    _set_state(state, IDLE)
+    await turn.reply(msg_text, whatsapp_client.send_message(turn.phone, msg_text))
+    return False
+
+async def _handle_multiple_confirmation(turn: _Turn, state: ConversationState, orders: List[Order]) -> bool:
+    is_yes = turn.content == "receipt_multiple_yes" or turn.user_text in YES_WORDS
+    if not is_yes:
+        _release(turn, orders, state)
+        await turn.reply(MSG_UNDERSTOOD, whatsapp_client.send_message(turn.phone, MSG_UNDERSTOOD))
+        return False
+
+    for o in orders:
+        turn.set_status(o, AWAITING_SELECTION)
+    _set_state(state, AWAITING_SELECTION, orders, state.pending_receipt_url)
+
+    if len(orders) <= 3:
+        # Use Buttons
+        buttons = [{"id": f"order_receipt_{o.id}", "title": f"Orden #{o.id}"} for o in orders]
+        send = whatsapp_client.send_interactive_buttons(to=turn.phone, body_text=MSG_SELECT_ORDER, buttons=buttons)
+    else:
+        # Use List Menu
+        rows = [{"id": f"order_receipt_{o.id}", "title": f"Orden #{o.id}", "description": f"₡{o.total_amount:,.2f}"} for o in orders]
+        send = whatsapp_client.send_interactive_list(
+            to=turn.phone,
+            body_text=MSG_SELECT_ORDER,
+            button_text="Ver Órdenes",
+            sections=[{"title": "Órdenes Pendientes", "rows": rows[:10]}]
+        )
+    await turn.reply(MSG_SELECT_ORDER, send)
+    return False
+
+async def _handle_selection(turn: _Turn, state: ConversationState, orders: List[Order]) -> bool:
+    selected_id = None
+    if turn.msg_type == "interactive" and turn.content.startswith("order_receipt_"):
+        selected_id = int(turn.content.split("_")[-1])
+    elif turn.msg_type == "text":
+        # Try to extract numbers
+        match = re.search(r'\d+', turn.content)
+        if match:
+            selected_id = int(match.group(0))
+
+    if not selected_id:
+        msg_text = "Por favor selecciona una orden de la lista o envía el número de la orden."
+        await turn.reply(msg_text, whatsapp_client.send_message(turn.phone, msg_text))
+        return False
+
+    target_order = next((o for o in orders if o.id == selected_id), None)
+    if not target_order:
+        msg_text = "No encontré esa orden. Por favor selecciona una del menú."
+        await turn.reply(msg_text, whatsapp_client.send_message(turn.phone, msg_text))
+        return False
+
+    receipt_url = target_order.pending_receipt_url
+    # Revert the others, then attach the receipt to the selected one
+    _release(turn, orders, state)
+    target_order.payment_proof = receipt_url
+
+    msg_text = MSG_RECEIVED_THANKS.format(order_id=target_order.id)
+    await turn.reply(msg_text, whatsapp_client.send_message(turn.phone, msg_text))
+    return False
+
+async def handle_message(db: AsyncSession, customer: CustomerRef, phone: str, msg_type: str, content: str) -> bool:
+    """
+    Run the receipt interception for one inbound message.
+    Returns True if the message should still be forwarded to n8n (not handled here).
+    """
+    turn = _Turn(db, customer, phone, msg_type, content)
+    state = await db.get(ConversationState, customer.id)
+
+    if msg_type in ["image", "document"]:
+        if state is None:
+            state = ConversationState(customer_id=customer.id, state=IDLE, order_ids=[])
+            db.add(state)
+        return await _handle_receipt_image(turn, state)
+
+    if msg_type not in ["interactive", "text"] or state is None or state.state == IDLE:
+        return True
+
+    orders = await _load_state_orders(db, state)
+    if not orders:
+        # The admin resolved these orders in the meantime; nothing left to ask about
+        _set_state(state, IDLE)
+        await db.commit()
+        return True
+
+    is_yes_no = msg_type == "interactive" or turn.user_text in YES_NO_WORDS
+    if state.state == AWAITING_SINGLE and is_yes_no:
+        return await _handle_single_confirmation(turn, state, orders)
+    if state.state == AWAITING_MULTIPLE and is_yes_no:
+        return await _handle_multiple_confirmation(turn, state, orders)
+    if state.state == AWAITING_SELECTION:
+        return await _handle_selection(turn, state, orders)
+    return True
@@ -0,0 +1,304 @@
+"""
+"Bought together" recommendations from order history.
+
+The item-item co-occurrence matrix is built from purchased orders of the last
+RECOMMEND_LOOKBACK_DAYS, each order weighted 0.5 ** (age / RECOMMEND_HALF_LIFE_DAYS). It is kept
+sparse (dict of dicts: only pairs that were actually bought together) and scored as a cosine:
+
+    score(a, b) = w(a, b) / sqrt(w(a) * w(b))
+
+where w(a) is the weight of the orders containing a, so best sellers don't top every list.
+`refresh` stores the top RECOMMEND_TOP_K neighbours per product (product_neighbors) and per
+customer the top products they haven't bought, summed over the neighbours of what they did buy
+and limited to products for their pets' species (Product.target_animals; products without
+target animals suit everyone) in customer_recommendations.
+
+Refreshes are incremental: only products in orders changed since the last run (a JobCursor on
+orders.updated_at) and the customers of those orders are recomputed. Lists of other products
+drift slightly as weights age; scripts/refresh_recommendations.py --full rebuilds everything.
+
+Reads never hit the database on the hot path: `related` serves from an in-memory index of the
+neighbour lists and the active catalog, reloaded every RECOMMEND_CACHE_SECONDS per worker, and
+customer lists are cached per phone.
+"""
+import asyncio
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.customers import Pet
+from app.models.orders import PURCHASED_STATUSES, Order, OrderItem
+from app.models.products import Product
+from app.models.recommendations import CustomerRecommendation, ProductNeighbor
+from app.models.refills import JobCursor
+from app.services import customer_lookup
+
+JOB_NAME = "recommendations"
+# Same reasoning as app.services.refills: late commits with an earlier updated_at are re-read
+CURSOR_OVERLAP = timedelta(minutes=10)
+CHUNK = 500
+
+def _chunks(ids: Iterable[int]) -> Iterable[List[int]]:
+    ids = sorted(ids)
+    for i in range(0, len(ids), CHUNK):
+        yield ids[i:i + CHUNK]
+
+def _weight(created_at: datetime, now: datetime) -> float:
+    age_days = max((now - created_at).total_seconds(), 0) / 86400
+    return 0.5 ** (age_days / settings.RECOMMEND_HALF_LIFE_DAYS)
+
+def _purchased(since: datetime) -> list:
+    return [Order.status.in_(PURCHASED_STATUSES), Order.created_at >= since]
+
+async def _baskets(db: AsyncSession, since: datetime, product_ids: Optional[Set[int]]) -> Dict[int, Tuple[datetime, Set[int]]]:
+    """order id -> (created_at, products) of purchased orders, optionally only orders containing one of `product_ids`."""
+    query = (
+        select(Order.id, Order.created_at, OrderItem.product_id)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(*_purchased(since))
+    )
+    baskets: Dict[int, Tuple[datetime, Set[int]]] = {}
+    batches = [query] if product_ids is None else [
+        query.where(Order.id.in_(select(OrderItem.order_id).where(OrderItem.product_id.in_(chunk))))
+        for chunk in _chunks(product_ids)
+    ]
+    for batch in batches:
+        result = await db.execute(batch)
+        for order_id, created_at, product_id in result.all():
+            baskets.setdefault(order_id, (created_at, set()))[1].add(product_id)
+    return baskets
+
+async def _order_weights(db: AsyncSession, since: datetime, product_ids: Set[int], now: datetime) -> Dict[int, float]:
+    """w(p): recency weight of the purchased orders containing each product."""
+    totals: Dict[int, float] = defaultdict(float)
+    for chunk in _chunks(product_ids):
+        result = await db.execute(
+            select(OrderItem.product_id, Order.created_at)
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(*_purchased(since), OrderItem.product_id.in_(chunk))
+            .distinct()
+        )
+        for product_id, created_at in result.all():
+            totals[product_id] += _weight(created_at, now)
+    return totals
+
+def cooccurrence(baskets: Iterable[Tuple[datetime, Set[int]]], now: datetime):
+    """Sparse pair weights w(a, b) (both directions) and per-product order weights w(a)."""
+    pairs: Dict[int, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+    totals: Dict[int, float] = defaultdict(float)
+    for created_at, products in baskets:
+        weight = _weight(created_at, now)
+        for a in products:
+            totals[a] += weight
+            for b in products:
+                if a != b:
+                    pairs[a][b] += weight
+    return pairs, totals
+
+async def _refresh_neighbors(db: AsyncSession, product_ids: Optional[Set[int]], since: datetime, now: datetime) -> int:
+    baskets = await _baskets(db, since, product_ids)
+    pairs, totals = cooccurrence(baskets.values(), now)
+    targets = set(pairs) if product_ids is None else product_ids
+    if product_ids is not None:
+        # The baskets only cover orders with a target product; other products' totals need their own orders
+        others = {b for a in targets for b in pairs.get(a, {})} - targets
+        totals.update(await _order_weights(db, since, others, now))
+
+    rows = []
+    for a in targets:
+        scored = sorted(
+            ((w / math.sqrt(totals[a] * totals[b]), b) for b, w in pairs.get(a, {}).items()),
+            reverse=True,
+        )[:settings.RECOMMEND_TOP_K]
+        rows.extend(
+            {"product_id": a, "neighbor_id": b, "score": round(score, 6), "rank": rank, "computed_at": now}
+            for rank, (score, b) in enumerate(scored, start=1)
+        )
+
+    if product_ids is None:
+        await db.execute(delete(ProductNeighbor))
+    else:
+        for chunk in _chunks(product_ids):
+            await db.execute(delete(ProductNeighbor).where(ProductNeighbor.product_id.in_(chunk)))
+    if rows:
+        await db.execute(ProductNeighbor.__table__.insert(), rows)
+    return len(targets)
+
+async def _refresh_customers(db: AsyncSession, customer_ids: List[int], since: datetime, now: datetime) -> int:
+    bought: Dict[int, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+    species: Dict[int, Set[str]] = defaultdict(set)
+    for chunk in _chunks(customer_ids):
+        result = await db.execute(
+            select(Order.customer_id, Order.created_at, OrderItem.product_id)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(*_purchased(since), Order.customer_id.in_(chunk))
+        )
+        for customer_id, created_at, product_id in result.all():
+            bought[customer_id][product_id] += _weight(created_at, now)
+        result = await db.execute(select(Pet.customer_id, Pet.species).where(Pet.customer_id.in_(chunk)))
+        for customer_id, pet_species in result.all():
+            species[customer_id].add((pet_species or "").lower())
+
+    neighbors: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+    for chunk in _chunks({p for products in bought.values() for p in products}):
+        result = await db.execute(
+            select(ProductNeighbor.product_id, ProductNeighbor.neighbor_id, ProductNeighbor.score)
+            .where(ProductNeighbor.product_id.in_(chunk))
+        )
+        for product_id, neighbor_id, score in result.all():
+            neighbors[product_id].append((neighbor_id, score))
+
+    animals: Dict[int, Set[str]] = {}
+    for chunk in _chunks({n for lists in neighbors.values() for n, _ in lists}):
+        result = await db.execute(
+            select(Product.id, Product.target_animals).where(Product.id.in_(chunk), Product.is_active.is_not(False))
+        )
+        animals.update((pid, {a.lower() for a in (target or [])}) for pid, target in result.all())
+
+    rows = []
+    for customer_id in customer_ids:
+        scores: Dict[int, float] = defaultdict(float)
+        for product_id, weight in bought.get(customer_id, {}).items():
+            for neighbor_id, score in neighbors.get(product_id, ()):
+                scores[neighbor_id] += weight * score
+        pets = species.get(customer_id)
+        candidates = sorted(
+            ((score, pid) for pid, score in scores.items()
+             if pid in animals and pid not in bought[customer_id]
+             and (not pets or not animals[pid] or animals[pid] & pets)),
+            reverse=True,
+        )[:settings.RECOMMEND_TOP_K]
+        rows.extend(
+            {"customer_id": customer_id, "product_id": pid, "score": round(score, 6), "rank": rank, "computed_at": now}
+            for rank, (score, pid) in enumerate(candidates, start=1)
+        )
+
+    for chunk in _chunks(customer_ids):
+        await db.execute(delete(CustomerRecommendation).where(CustomerRecommendation.customer_id.in_(chunk)))
+    if rows:
+        await db.execute(CustomerRecommendation.__table__.insert(), rows)
+    return len(customer_ids)
+
+async def refresh(db: AsyncSession, full: bool = False) -> Tuple[int, int]:
+    """
+    Recompute neighbours of products in orders changed since the last run, then the
+    recommendations of those orders' customers (everything if `full`). Does not commit.
+    Returns (products, customers) recomputed.
+    """
+    started = datetime.utcnow()
+    since = started - timedelta(days=settings.RECOMMEND_LOOKBACK_DAYS)
+    cursor = await db.get(JobCursor, JOB_NAME)
+    if cursor is None:
+        cursor = JobCursor(name=JOB_NAME)
+        db.add(cursor)
+
+    if full or cursor.position is None:
+        products = await _refresh_neighbors(db, None, since, started)
+        result = await db.execute(
+            select(Order.customer_id).where(*_purchased(since), Order.customer_id.is_not(None)).distinct()
+        )
+        customer_ids = list(result.scalars().all())
+        await db.execute(delete(CustomerRecommendation))
+    else:
+        result = await db.execute(
+            select(Order.customer_id, OrderItem.product_id)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(Order.updated_at > cursor.position - CURSOR_OVERLAP)
+        )
+        changed = result.all()
+        product_ids = {product_id for _, product_id in changed}
+        customer_ids = sorted({customer_id for customer_id, _ in changed if customer_id is not None})
+        products = await _refresh_neighbors(db, product_ids, since, started) if product_ids else 0
+
+    customers = await _refresh_customers(db, customer_ids, since, started) if customer_ids else 0
+    cursor.position = started
+    return products, customers
+
+class _Index:
+    def __init__(self, neighbors: Dict[int, List[Tuple[int, float]]], catalog: Dict[int, dict]):
+        self.neighbors = neighbors
+        self.catalog = catalog
+        self.loaded_at = time.monotonic()
+
+_index: Optional[_Index] = None
+_index_lock: Optional[asyncio.Lock] = None
+_customer_cache = TTLCache(ttl_seconds=settings.RECOMMEND_CACHE_SECONDS, max_size=10000)
+
+def _get_lock() -> asyncio.Lock:
+    global _index_lock
+    if _index_lock is None:
+        _index_lock = asyncio.Lock()
+    return _index_lock
+
+async def _load_index(db: AsyncSession) -> _Index:
+    result = await db.execute(
+        select(Product.id, Product.sku, Product.name, Product.category, Product.brand, Product.price,
+               Product.stock, Product.image_url, Product.target_animals)
+        .where(Product.is_active.is_not(False))
+    )
+    catalog = {
+        row.id: {**row._asdict(), "animals": {a.lower() for a in (row.target_animals or [])}}
+        for row in result.all()
+    }
+    result = await db.execute(
+        select(ProductNeighbor.product_id, ProductNeighbor.neighbor_id, ProductNeighbor.score)
+        .order_by(ProductNeighbor.product_id, ProductNeighbor.rank)
+    )
+    neighbors: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+    for product_id, neighbor_id, score in result.all():
+        neighbors[product_id].append((neighbor_id, score))
+    return _Index(dict(neighbors), catalog)
+
+async def _get_index(db: AsyncSession) -> _Index:
+    global _index
+    if _index is not None and time.monotonic() - _index.loaded_at < settings.RECOMMEND_CACHE_SECONDS:
+        return _index
+    async with _get_lock():
+        if _index is None or time.monotonic() - _index.loaded_at >= settings.RECOMMEND_CACHE_SECONDS:
+            _index = await _load_index(db)
+    return _index
+
+def _present(index: _Index, scored: Iterable[Tuple[int, float]], species: Optional[str], limit: int) -> List[dict]:
+    wanted = species.lower() if species else None
+    items = []
+    for product_id, score in scored:
+        product = index.catalog.get(product_id)
+        if product is None or (wanted and product["animals"] and wanted not in product["animals"]):
+            continue
+        items.append({**{k: v for k, v in product.items() if k != "animals"}, "score": score})
+        if len(items) == limit:
+            break
+    return items
+
+async def related(db: AsyncSession, product_id: int, species: Optional[str] = None, limit: int = 10) -> List[dict]:
+    """Products bought together with `product_id`, best first (active products only)."""
+    index = await _get_index(db)
+    return _present(index, index.neighbors.get(product_id, ()), species, limit)
+
+async def for_customer_id(db: AsyncSession, customer_id: int, limit: int = 10) -> List[dict]:
+    """A customer's recommendations, best first."""
+    scored = _customer_cache.get(customer_id)
+    if scored is None:
+        result = await db.execute(
+            select(CustomerRecommendation.product_id, CustomerRecommendation.score)
+            .where(CustomerRecommendation.customer_id == customer_id)
+            .order_by(CustomerRecommendation.rank)
+        )
+        scored = [tuple(row) for row in result.all()]
+        _customer_cache.set(customer_id, scored)
+    index = await _get_index(db)
+    return _present(index, scored, None, limit)
+
+async def for_customer(db: AsyncSession, phone: str, limit: int = 10) -> Optional[List[dict]]:
+    """Recommendations of the customer with this phone, or None if there is no such customer."""
+    customer = await customer_lookup.resolve(db, phone)
+    if customer is None:
+        return None
+    return await for_customer_id(db, customer.id, limit)
@@ -0,0 +1,236 @@
+"""
+Pet refill predictions and WhatsApp reminders, run as a nightly batch (scripts/refill_reminders.py).
+
+`recompute` is incremental: it only looks at customers with orders changed since the last run
+(a JobCursor on orders.updated_at). For each (customer, pet, product) bought at least twice it
+infers how many days one unit lasts (median over the purchase intervals) and predicts the next
+refill date from the last purchase. Purchases without Order.pet_id are attributed to the one pet
+of the customer whose species is in Product.target_animals, if there is exactly one.
+
+`schedule_reminders` enqueues one template message per customer whose reminder day has come,
+through the outbox. Sends are spaced at REFILL_SENDS_PER_MINUTE within the daytime send window
+(next_attempt_at), so a night with many due reminders doesn't go out as one burst.
+"""
+import logging
+import statistics
+from collections import defaultdict
+from datetime import date, datetime, timedelta, time, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.timezone import CR_TZ, cr_today, get_cr_time, utc_to_cr_date
+from app.models.customers import Customer, Pet
+from app.models.orders import PURCHASED_STATUSES, Order, OrderItem
+from app.models.products import Product
+from app.models.refills import JobCursor, RefillPrediction
+from app.services import outbox
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "refill_predictions"
+REFILL_REMINDER = "pet.refill_reminder"
+
+# Re-read orders this far behind the cursor: transactions that committed late with an earlier
+# updated_at are still picked up (recomputing a customer twice is harmless)
+CURSOR_OVERLAP = timedelta(minutes=10)
+# Purchases of the same product this close together count as one (e.g. an order split in two)
+MERGE_WITHIN_DAYS = 3
+MAX_UNIT_DAYS = 365
+CHUNK = 500
+
+def predict(purchases: List[Tuple[date, int]]) -> Optional[dict]:
+    """
+    Next refill for one product from its (day, quantity) purchases, or None with less than
+    two separate purchases.
+    """
+    merged: List[List] = []
+    for day, quantity in sorted(purchases):
+        if merged and (day - merged[-1][0]).days < MERGE_WITHIN_DAYS:
+            merged[-1][1] += quantity
+        else:
+            merged.append([day, quantity])
+    if len(merged) < 2:
+        return None
+
+    unit_days = statistics.median(
+        (merged[i + 1][0] - merged[i][0]).days / max(merged[i][1], 1) for i in range(len(merged) - 1)
+    )
+    unit_days = min(unit_days, MAX_UNIT_DAYS)
+    last_day, last_quantity = merged[-1]
+    next_refill_on = last_day + timedelta(days=round(unit_days * max(last_quantity, 1)))
+    return {
+        "purchases": len(merged),
+        "unit_days": round(unit_days, 2),
+        "last_purchase_on": last_day,
+        "last_quantity": last_quantity,
+        "next_refill_on": next_refill_on,
+        "remind_on": next_refill_on - timedelta(days=settings.REFILL_REMINDER_LEAD_DAYS),
+    }
+
+async def _changed_customers(db: AsyncSession, since: Optional[datetime]) -> List[int]:
+    query = select(Order.customer_id).distinct()
+    if since is not None:
+        query = query.where(Order.updated_at > since - CURSOR_OVERLAP)
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+async def _recompute_chunk(db: AsyncSession, customer_ids: List[int]) -> int:
+    result = await db.execute(
+        select(Pet.id, Pet.customer_id, Pet.species).where(Pet.customer_id.in_(customer_ids))
+    )
+    pets_by_customer = defaultdict(list)
+    for pet_id, customer_id, species in result.all():
+        pets_by_customer[customer_id].append((pet_id, (species or "").lower()))
+
+    result = await db.execute(
+        select(Order.customer_id, Order.pet_id, Order.created_at, OrderItem.product_id, OrderItem.quantity, Product.target_animals)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(Order.customer_id.in_(customer_ids), Order.status.in_(PURCHASED_STATUSES))
+    )
+    series: Dict[Tuple[int, Optional[int], int], list] = defaultdict(list)
+    for customer_id, pet_id, created_at, product_id, quantity, target_animals in result.all():
+        if pet_id is None:
+            animals = {a.lower() for a in (target_animals or [])}
+            matches = [pid for pid, species in pets_by_customer[customer_id] if species in animals]
+            pet_id = matches[0] if len(matches) == 1 else None
+        series[(customer_id, pet_id, product_id)].append((utc_to_cr_date(created_at), quantity))
+
+    result = await db.execute(select(RefillPrediction).where(RefillPrediction.customer_id.in_(customer_ids)))
+    existing = {(p.customer_id, p.pet_id, p.product_id): p for p in result.scalars().all()}
+
+    now = datetime.utcnow()
+    written = 0
+    for key, purchases in series.items():
+        values = predict(purchases)
+        if values is None:
+            continue
+        prediction = existing.pop(key, None)
+        if prediction is None:
+            customer_id, pet_id, product_id = key
+            prediction = RefillPrediction(customer_id=customer_id, pet_id=pet_id, product_id=product_id)
+            db.add(prediction)
+        elif prediction.next_refill_on != values["next_refill_on"] and prediction.reminder_event_id:
+            # They bought again (or the history changed): a pending reminder is stale
+            await outbox.cancel(db, prediction.reminder_event_id)
+            prediction.reminder_event_id = None
+            prediction.reminded_for = None
+        for field, value in values.items():
+            setattr(prediction, field, value)
+        prediction.computed_at = now
+        written += 1
+
+    # No longer predictable (e.g. an order was cancelled)
+    for prediction in existing.values():
+        if prediction.reminder_event_id:
+            await outbox.cancel(db, prediction.reminder_event_id)
+        await db.delete(prediction)
+    return written
+
+async def recompute(db: AsyncSession, full: bool = False) -> Tuple[int, int]:
+    """
+    Refresh predictions of customers with orders changed since the last run (all customers
+    if `full`). Does not commit. Returns (customers, predictions written).
+    """
+    started = datetime.utcnow()
+    cursor = await db.get(JobCursor, JOB_NAME)
+    if cursor is None:
+        cursor = JobCursor(name=JOB_NAME)
+        db.add(cursor)
+    customer_ids = await _changed_customers(db, None if full else cursor.position)
+
+    written = 0
+    for i in range(0, len(customer_ids), CHUNK):
+        written += await _recompute_chunk(db, customer_ids[i:i + CHUNK])
+    cursor.position = started
+    await db.flush() # The session doesn't autoflush; schedule_reminders queries these rows
+    return len(customer_ids), written
+
+def _send_slots(count: int) -> List[datetime]:
+    """
+    `count` naive UTC send times, REFILL_SENDS_PER_MINUTE apart, inside the CR local send
+    window (starting now if the window is open, else at its next opening).
+    """
+    spacing = timedelta(seconds=60 / settings.REFILL_SENDS_PER_MINUTE)
+    now = get_cr_time()
+
+    def window(day: date):
+        start = datetime.combine(day, time(settings.REFILL_SEND_WINDOW_START_HOUR), tzinfo=CR_TZ)
+        end = datetime.combine(day, time(settings.REFILL_SEND_WINDOW_END_HOUR), tzinfo=CR_TZ)
+        return start, end
+
+    day = now.date()
+    start, end = window(day)
+    slot = max(now, start)
+    slots = []
+    while len(slots) < count:
+        if slot >= end:
+            day += timedelta(days=1)
+            start, end = window(day)
+            slot = start
+            continue
+        slots.append(slot.astimezone(timezone.utc).replace(tzinfo=None))
+        slot += spacing
+    return slots
+
+def _first_name(full_name: str) -> str:
+    return (full_name or "").split(" ")[0] or "Hola"
+
+async def schedule_reminders(db: AsyncSession, today: Optional[date] = None) -> int:
+    """
+    Enqueue one template reminder per customer with predictions whose reminder day has come
+    (and whose refill date hasn't passed). Does not commit. Returns the reminders scheduled.
+    """
+    if not settings.REFILL_TEMPLATE_NAME:
+        return 0
+    today = today or cr_today()
+    result = await db.execute(
+        select(RefillPrediction, Customer.full_name, Customer.phone, Pet.name, Product.name)
+        .join(Customer, Customer.id == RefillPrediction.customer_id)
+        .join(Product, Product.id == RefillPrediction.product_id)
+        .outerjoin(Pet, Pet.id == RefillPrediction.pet_id)
+        .where(
+            RefillPrediction.remind_on <= today,
+            RefillPrediction.next_refill_on >= today,
+            (RefillPrediction.reminded_for.is_(None)) | (RefillPrediction.reminded_for != RefillPrediction.next_refill_on),
+            Customer.phone.is_not(None),
+            Customer.is_active.is_not(False),
+            Product.is_active.is_not(False),
+        )
+        .order_by(RefillPrediction.customer_id, RefillPrediction.next_refill_on)
+    )
+    by_customer = defaultdict(list)
+    for row in result.all():
+        by_customer[row[0].customer_id].append(row)
+    if not by_customer:
+        return 0
+
+    scheduled = []
+    for send_at, rows in zip(_send_slots(len(by_customer)), by_customer.values()):
+        first, full_name, phone, _, _ = rows[0]
+        pet_names = sorted({pet_name for _, _, _, pet_name, _ in rows if pet_name})
+        product_names = [product_name for _, _, _, _, product_name in rows]
+        params = [_first_name(full_name), ", ".join(pet_names) or "tu mascota", ", ".join(product_names)]
+        event = outbox.enqueue(
+            db, "whatsapp_template", REFILL_REMINDER, "customer", first.customer_id,
+            {
+                "customer_phone": phone,
+                "template_name": settings.REFILL_TEMPLATE_NAME,
+                "language_code": settings.REFILL_TEMPLATE_LANGUAGE,
+                "components": [{"type": "body", "parameters": [{"type": "text", "text": p} for p in params]}],
+                "summary": f"Recordatorio de recompra: {params[2]} ({params[1]})",
+            },
+            not_before=send_at,
+        )
+        scheduled.append((event, rows))
+
+    await db.flush() # Event ids
+    for event, rows in scheduled:
+        for prediction, *_ in rows:
+            prediction.reminder_event_id = event.id
+            prediction.reminded_for = prediction.next_refill_on
+    logger.info("Refill reminders scheduled", extra={"customers": len(by_customer)})
+    return len(by_customer)
@@ -0,0 +1,166 @@
+"""
+Incremental maintenance of the daily_sales / daily_product_sales rollups.
+
+Writers take a snapshot of an order before mutating it and call `record_order_change`
+afterwards, in the same transaction. The old contribution is subtracted and the new one
+added with atomic upserts, so concurrent requests never lose increments.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.timezone import cr_date, cr_date_to_utc, utc_to_cr_date
+from app.models import Order, OrderItem, Product
+from app.models.reports import DailySales, DailyProductSales
+
+# Receipt interception sub-states are still "pending payment" from a sales point of view.
+# Folding them keeps the webhook's back-and-forth transitions out of the rollup.
+_STATUS_ALIASES = {
+    "awaiting_receipt_confirmation": "pending_payment",
+    "awaiting_receipt_confirmation_multiple": "pending_payment",
+    "awaiting_receipt_selection": "pending_payment",
+}
+
+def rollup_status(status: str) -> str:
+    return _STATUS_ALIASES.get(status, status)
+
+class OrderSnapshot:
+    """What one order contributes to the rollups at a point in time."""
+
+    def __init__(self, order: Order):
+        created_at = order.created_at or datetime.utcnow()
+        self.key = (utc_to_cr_date(created_at), rollup_status(order.status or "created"), order.created_via or "web")
+        self.amount = Decimal(order.total_amount or 0)
+        # product_id -> (quantity, amount); order.items must be loaded
+        self.lines: Dict[int, Tuple[int, Decimal]] = {}
+        for item in order.items:
+            qty, amount = self.lines.get(item.product_id, (0, Decimal(0)))
+            self.lines[item.product_id] = (qty + item.quantity, amount + Decimal(item.subtotal or 0))
+
+def snapshot(order: Optional[Order]) -> Optional[OrderSnapshot]:
+    return OrderSnapshot(order) if order is not None else None
+
+def _insert_for(db: AsyncSession):
+    return pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+async def _bump_daily(db: AsyncSession, key, count: int, amount: Decimal):
+    day, status, channel = key
+    insert = _insert_for(db)
+    stmt = insert(DailySales).values(day=day, status=status, channel=channel, order_count=count, total_amount=amount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day", "status", "channel"],
+        set_={
+            "order_count": DailySales.order_count + stmt.excluded.order_count,
+            "total_amount": DailySales.total_amount + stmt.excluded.total_amount,
+        },
+    )
+    await db.execute(stmt)
+
+async def _bump_products(db: AsyncSession, key, lines: Dict[int, Tuple[int, Decimal]]):
+    if not lines:
+        return
+    day, status, channel = key
+    result = await db.execute(select(Product.id, Product.category).where(Product.id.in_(list(lines))))
+    categories = dict(result.all())
+
+    insert = _insert_for(db)
+    for product_id, (qty, amount) in lines.items():
+        stmt = insert(DailyProductSales).values(
+            day=day, status=status, channel=channel, product_id=product_id,
+            category=categories.get(product_id), quantity=qty, total_amount=amount,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "status", "channel", "product_id"],
+            set_={
+                "quantity": DailyProductSales.quantity + stmt.excluded.quantity,
+                "total_amount": DailyProductSales.total_amount + stmt.excluded.total_amount,
+            },
+        )
+        await db.execute(stmt)
+
+async def record_order_change(db: AsyncSession, before: Optional[OrderSnapshot], order: Order):
+    """
+    Apply the delta between `before` (None for a new order) and the current state of `order`.
+    Does not commit; the caller's commit makes the rollup change atomic with the order change.
+    """
+    after = OrderSnapshot(order)
+    if before is not None and before.key == after.key:
+        if before.amount != after.amount:
+            await _bump_daily(db, after.key, 0, after.amount - before.amount)
+        delta = {}
+        for product_id in set(before.lines) | set(after.lines):
+            old_qty, old_amount = before.lines.get(product_id, (0, Decimal(0)))
+            new_qty, new_amount = after.lines.get(product_id, (0, Decimal(0)))
+            if (old_qty, old_amount) != (new_qty, new_amount):
+                delta[product_id] = (new_qty - old_qty, new_amount - old_amount)
+        await _bump_products(db, after.key, delta)
+        return
+
+    if before is not None:
+        await _bump_daily(db, before.key, -1, -before.amount)
+        await _bump_products(db, before.key, {pid: (-q, -a) for pid, (q, a) in before.lines.items()})
+    await _bump_daily(db, after.key, 1, after.amount)
+    await _bump_products(db, after.key, after.lines)
+
+async def rebuild(db: AsyncSession, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """
+    Recompute the rollups from orders/order_items for [start, end] (CR local dates, inclusive).
+    Used for backfills and to repair drift. Returns the number of daily_sales rows written.
+    """
+    day = cr_date(Order.created_at)
+    order_filters = []
+    if start:
+        order_filters.append(Order.created_at >= cr_date_to_utc(start))
+    if end:
+        order_filters.append(Order.created_at < cr_date_to_utc(end + timedelta(days=1)))
+
+    for table in (DailySales, DailyProductSales):
+        rollup_filters = []
+        if start:
+            rollup_filters.append(table.day >= start)
+        if end:
+            rollup_filters.append(table.day <= end)
+        await db.execute(delete(table).where(*rollup_filters))
+
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    result = await db.execute(
+        select(day, Order.status, Order.created_via, func.count(Order.id), func.coalesce(func.sum(Order.total_amount), 0))
+        .where(*order_filters)
+        .group_by(day, Order.status, Order.created_via)
+    )
+    for row_day, status, channel, count, amount in result.all():
+        bucket = totals[(row_day, rollup_status(status), channel or "web")]
+        bucket[0] += count
+        bucket[1] += Decimal(str(amount))
+
+    lines = defaultdict(lambda: [None, 0, Decimal(0)])
+    result = await db.execute(
+        select(day, Order.status, Order.created_via, OrderItem.product_id, Product.category,
+               func.sum(OrderItem.quantity), func.sum(OrderItem.subtotal))
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(*order_filters)
+        .group_by(day, Order.status, Order.created_via, OrderItem.product_id, Product.category)
+    )
+    for row_day, status, channel, product_id, category, qty, amount in result.all():
+        line = lines[(row_day, rollup_status(status), channel or "web", product_id)]
+        line[0] = category
+        line[1] += qty
+        line[2] += Decimal(str(amount))
+
+    db.add_all([
+        DailySales(day=d, status=s, channel=c, order_count=count, total_amount=amount)
+        for (d, s, c), (count, amount) in totals.items()
+    ])
+    db.add_all([
+        DailyProductSales(day=d, status=s, channel=c, product_id=pid, category=category, quantity=qty, total_amount=amount)
+        for (d, s, c, pid), (category, qty, amount) in lines.items()
+    ])
+    await db.flush()
+    return len(totals)
@@ -17,6 +17,7 @@ class ApiClient {
             ...options,
             headers
         });
+        this.lastHeaders = response.headers;
 
         if (response.status === 401) {
             logout();
@@ -0,0 +1,6 @@
+# Loaded automatically by gunicorn from the working directory (see DEPLOYMENT.md).
+from prometheus_client import multiprocess
+
+def child_exit(server, worker):
+    # Drop a dead worker's live gauges (in-flight tasks, pool checkouts) from /metrics
+    multiprocess.mark_process_dead(worker.pid)
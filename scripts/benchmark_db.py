@@ -0,0 +1,105 @@
+"""
+Compare engine profiles (app/core/database.py) under a webhook-like load: several processes
+(like gunicorn workers), each with concurrent tasks that insert a chat message, commit and read
+back the conversation's latest messages.
+
+    python scripts/benchmark_db.py                      # two scratch SQLite files
+    python scripts/benchmark_db.py --url postgresql+asyncpg://user:pw@host/db
+
+Works on its own `benchmark_messages` table, which is dropped afterwards.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text, func, select
+from sqlalchemy.exc import OperationalError
+
+from app.core.database import build_engine
+
+metadata = MetaData()
+messages = Table(
+    "benchmark_messages", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("customer_phone", String, index=True, nullable=False),
+    Column("content", Text),
+    Column("created_at", DateTime, server_default=func.now()),
+)
+
+async def _worker(engine, deadline, phones, latencies, errors):
+    while time.perf_counter() < deadline:
+        phone = random.choice(phones)
+        started = time.perf_counter()
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(messages.insert().values(customer_phone=phone, content="hola"))
+            async with engine.connect() as conn:
+                await conn.execute(
+                    select(messages).where(messages.c.customer_phone == phone)
+                    .order_by(messages.c.id.desc()).limit(20)
+                )
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            # "database is locked" on SQLite; pool timeouts on Postgres
+            errors.append(1)
+
+async def _run_process(url, profile, concurrency, seconds):
+    engine = build_engine(url, profile)
+    phones = [f"5068888{n:04d}" for n in range(200)]
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(_worker(engine, deadline, phones, latencies, errors) for _ in range(concurrency)))
+    await engine.dispose()
+    return latencies, len(errors)
+
+def _process_main(args):
+    return asyncio.run(_run_process(*args))
+
+async def _setup(url, profile, drop_only=False):
+    engine = build_engine(url, profile)
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.drop_all)
+        if not drop_only:
+            await conn.run_sync(metadata.create_all)
+    await engine.dispose()
+
+def bench(url, profile, processes, concurrency, seconds):
+    asyncio.run(_setup(url, profile))
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        results = pool.map(_process_main, [(url, profile, concurrency, seconds)] * processes)
+    asyncio.run(_setup(url, profile, drop_only=True))
+
+    latencies = sorted(l for lats, _ in results for l in lats)
+    errors = sum(e for _, e in results)
+    if not latencies:
+        print(f"{profile:>8}: no successful operations, {errors} errors")
+        return
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{profile:>8}: {len(latencies) / seconds:8.1f} turns/s  "
+        f"p50 {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms  errors {errors}"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the default vs tuned database engine profiles.")
+    parser.add_argument("--url", default=None, help="Database URL (default: a scratch SQLite file per profile)")
+    parser.add_argument("--profiles", nargs="+", default=["default", "tuned"])
+    parser.add_argument("--processes", type=int, default=4, help="Like gunicorn -w")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent turns per process")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            # A fresh SQLite file per profile: WAL mode persists in the database file
+            url = args.url or f"sqlite+aiosqlite:///{os.path.join(tmp, profile + '.db')}"
+            bench(url, profile, args.processes, args.concurrency, args.seconds)
@@ -0,0 +1,116 @@
+"""
+Webhook latency while logins are running. Drives the app in-process (no server needed) against a
+scratch SQLite database, in three phases:
+
+  idle     webhook traffic only
+  pool     webhook traffic + concurrent logins (bcrypt on the bounded thread pool)
+  inline   same, but bcrypt called directly on the event loop, as login used to
+
+    python scripts/benchmark_login.py [--seconds 5] [--logins 8]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_tmp, 'bench.db')}"
+os.environ["N8N_WEBHOOK_URL"] = ""
+os.environ["LOGIN_RATE_LIMIT_ATTEMPTS"] = "1000000"
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+import httpx
+
+from app.core import security
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.main import app
+from app.models import Customer, User
+
+PASSWORD = "benchmark"
+
+def _webhook_payload(n: int) -> dict:
+    return {"entry": [{"changes": [{"value": {
+        "contacts": [{"profile": {"name": "Bench"}}],
+        "messages": [{"from": "50688880000", "type": "text", "text": {"body": f"hola {n}"}}],
+    }}]}]}
+
+async def _setup():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        db.add(User(name="bench", email="bench@lavete.test", password_hash=security.get_password_hash(PASSWORD), role="admin"))
+        # AI off: messages are stored but never forwarded to n8n
+        db.add(Customer(full_name="Bench", phone="88880000", ai_active=False))
+        await db.commit()
+
+async def _webhook_load(client, seconds, interval):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await client.post("/api/v1/webhook", json=_webhook_payload(n))
+        latencies.append(time.perf_counter() - started)
+        n += 1
+        await asyncio.sleep(interval)
+    return latencies
+
+async def _login_load(client, seconds, concurrency):
+    deadline = time.perf_counter() + seconds
+
+    async def one():
+        logins = 0
+        while time.perf_counter() < deadline:
+            await client.post("/api/v1/auth/login", data={"username": "bench@lavete.test", "password": PASSWORD})
+            logins += 1
+        return logins
+
+    return sum(await asyncio.gather(*(one() for _ in range(concurrency))))
+
+def _report(phase, latencies, logins):
+    latencies = sorted(latencies)
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    print(
+        f"{phase:>7}: webhook p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+        f"p99 {p99 * 1000:7.1f} ms  max {latencies[-1] * 1000:7.1f} ms  ({len(latencies)} requests, {logins} logins)"
+    )
+
+async def main(seconds, concurrency, interval):
+    await _setup()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        _report("idle", await _webhook_load(client, seconds, interval), 0)
+
+        webhook, logins = await asyncio.gather(
+            _webhook_load(client, seconds, interval), _login_load(client, seconds, concurrency)
+        )
+        _report("pool", webhook, logins)
+
+        pooled = security.verify_password_async
+
+        async def inline(plain_password, hashed_password):
+            return security.verify_password(plain_password, hashed_password)
+
+        security.verify_password_async = inline
+        try:
+            webhook, logins = await asyncio.gather(
+                _webhook_load(client, seconds, interval), _login_load(client, seconds, concurrency)
+            )
+        finally:
+            security.verify_password_async = pooled
+        _report("inline", webhook, logins)
+    await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Webhook latency during concurrent logins.")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each phase")
+    parser.add_argument("--logins", type=int, default=8, help="Concurrent login loops")
+    parser.add_argument("--interval", type=float, default=0.01, help="Pause between webhook requests")
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.logins, args.interval))
@@ -0,0 +1,25 @@
+import argparse
+import asyncio
+import sys
+import os
+import time
+from datetime import date
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.database import AsyncSessionLocal
+from app.services import inventory_forecast
+
+async def refresh(today):
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as session:
+        count = await inventory_forecast.refresh(session, today=today)
+        await session.commit()
+    print(f"stock_forecasts refreshed: {count} products in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute reorder points and days until stockout (run from cron).")
+    parser.add_argument("--today", type=date.fromisoformat, default=None, help="Forecast as of this CR local date, YYYY-MM-DD")
+    args = parser.parse_args()
+    asyncio.run(refresh(args.today))
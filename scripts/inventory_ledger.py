@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.database import AsyncSessionLocal
+from app.services import inventory_ledger
+
+async def snapshot():
+    async with AsyncSessionLocal() as session:
+        count = await inventory_ledger.take_snapshots(session)
+        await session.commit()
+        print(f"inventory snapshots written: {count}")
+
+async def reconcile() -> int:
+    async with AsyncSessionLocal() as session:
+        drift = await inventory_ledger.reconcile(session)
+    for row in drift:
+        print(f"{row['sku']}: stock {row['stock']} != ledger {row['ledger_stock']} (drift {row['drift']:+d})")
+    print(f"products with drift: {len(drift)}")
+    return 1 if drift else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inventory ledger maintenance (run from cron).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("snapshot", help="Snapshot the ledger balance of every product that moved since its last snapshot")
+    sub.add_parser("reconcile", help="Report products whose stock disagrees with the ledger (exit code 1 if any)")
+    args = parser.parse_args()
+    if args.command == "snapshot":
+        asyncio.run(snapshot())
+    else:
+        sys.exit(asyncio.run(reconcile()))
@@ -0,0 +1,34 @@
+import argparse
+import asyncio
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal
+from app.models import Customer
+from app.models.customer_profiles import CustomerProfile
+from app.services import customer_profiles
+
+async def rebuild(missing: bool):
+    async with AsyncSessionLocal() as session:
+        query = select(Customer.id)
+        if missing:
+            stored = select(CustomerProfile.customer_id).where(
+                CustomerProfile.customer_id == Customer.id, CustomerProfile.orders.is_not(None)
+            )
+            query = query.where(~stored.exists())
+        result = await session.execute(query)
+        customer_ids = result.scalars().all()
+        rows = await session.run_sync(lambda s: customer_profiles.rebuild(s.connection(), customer_ids))
+        await session.commit()
+    print(f"customer_profiles rebuilt: {rows} rows")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the customer_profiles read model from customers, orders, pets and chats (backfill / repair).")
+    parser.add_argument("--missing", action="store_true", help="Only customers without an up-to-date profile row (run after every deploy)")
+    args = parser.parse_args()
+    asyncio.run(rebuild(args.missing))
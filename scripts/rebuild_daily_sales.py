@@ -0,0 +1,24 @@
+import argparse
+import asyncio
+import sys
+import os
+from datetime import date
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.database import AsyncSessionLocal
+from app.services import sales_rollup
+
+async def rebuild(start, end):
+    async with AsyncSessionLocal() as session:
+        rows = await sales_rollup.rebuild(session, start=start, end=end)
+        await session.commit()
+        print(f"daily_sales rebuilt: {rows} rows ({start or 'beginning'} -> {end or 'today'})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the daily_sales rollups from orders (backfill / repair).")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="First CR local date, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last CR local date, YYYY-MM-DD")
+    args = parser.parse_args()
+    asyncio.run(rebuild(args.start, args.end))
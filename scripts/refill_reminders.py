@@ -0,0 +1,23 @@
+import argparse
+import asyncio
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.database import AsyncSessionLocal
+from app.services import refills
+
+async def run(full):
+    async with AsyncSessionLocal() as session:
+        customers, predictions = await refills.recompute(session, full=full)
+        reminders = await refills.schedule_reminders(session)
+        await session.commit()
+    print(f"refill predictions: {predictions} for {customers} customers; reminders scheduled: {reminders}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nightly pet refill predictions and WhatsApp reminders.")
+    parser.add_argument("--full", action="store_true", help="Recompute every customer, not just those with changed orders")
+    args = parser.parse_args()
+    asyncio.run(run(args.full))
@@ -0,0 +1,22 @@
+import argparse
+import asyncio
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from app.core.database import AsyncSessionLocal
+from app.services import recommendations
+
+async def run(full):
+    async with AsyncSessionLocal() as session:
+        products, customers = await recommendations.refresh(session, full=full)
+        await session.commit()
+    print(f"recommendations: {products} products, {customers} customers recomputed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh co-purchase recommendations from recent orders.")
+    parser.add_argument("--full", action="store_true", help="Rebuild every product and customer, not just those with changed orders")
+    args = parser.parse_args()
+    asyncio.run(run(args.full))
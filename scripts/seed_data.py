@@ -7,6 +7,7 @@ sys.path.append(os.getcwd())
 
 from app.core.database import AsyncSessionLocal
 from app.models import User, Product
+from app.services import inventory_ledger
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -38,10 +39,11 @@ async def seed():
                 brand="MSD",
                 price=25000.00,
                 cost=18000.00,
-                stock=50,
+                stock=0,
                 min_stock=10
             )
             session.add(product)
+            inventory_ledger.record(session, product, "in", 50, "Initial stock")
             
             await session.commit()
             print("Seed data created successfully.")
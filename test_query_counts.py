@@ -0,0 +1,114 @@
+"""
+Query-count budgets for the main endpoints.
+
+Relationships are declared lazy="raise_on_sql", so every endpoint must choose its own
+loaders. These checks fail if an endpoint starts issuing more SQL statements than its
+budget (an N+1 or an eager cascade sneaking back in).
+
+Runs against a throwaway SQLite database:
+    python -m pytest test_query_counts.py -q
+    python test_query_counts.py
+"""
+import asyncio
+import os
+import tempfile
+from contextlib import contextmanager
+
+_DB_PATH = os.path.join(tempfile.mkdtemp(), "query_counts.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+
+import httpx
+from sqlalchemy import event
+
+from app.main import app
+from app.api import deps
+from app.core.database import engine, Base, AsyncSessionLocal
+from app.models import User, Customer, Pet, Product, Order, OrderItem
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements executed on the app engine inside the block."""
+    statements = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+
+async def _seed():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        user = User(name="Admin", email="admin@lavete.com", password_hash="x", role="admin")
+        products = [Product(sku=f"SKU{i}", name=f"Producto {i}", category="Alimento", price=1000, stock=50) for i in range(4)]
+        db.add_all([user, *products])
+        await db.flush()
+        for n in range(3):
+            phone = f"8888000{n}"
+            customer = Customer(full_name=f"Cliente {n}", phone=phone, pets=[
+                Pet(name="Firulais", species="Perro"),
+                Pet(name="Michi", species="Gato"),
+            ])
+            db.add(customer)
+            await db.flush()
+            for _ in range(3):
+                order = Order(customer_id=customer.id, status="created", total_amount=2000, items=[
+                    OrderItem(product_id=products[0].id, quantity=1, unit_price_at_moment=1000, subtotal=1000),
+                    OrderItem(product_id=products[1].id, quantity=1, unit_price_at_moment=1000, subtotal=1000),
+                ])
+                db.add(order)
+        db.add(Customer(full_name="Sin Ordenes", phone="77770000"))
+        await db.commit()
+        return user
+
+def _client(user: User) -> httpx.AsyncClient:
+    async def _current_user():
+        return user
+    app.dependency_overrides[deps.get_current_user] = _current_user
+    app.dependency_overrides[deps.get_current_active_admin] = _current_user
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test/api/v1")
+
+# (method, path, kwargs, expected status, max queries)
+BUDGETS = [
+    ("GET", "/customers/", {}, 200, 5),
+    ("GET", "/customers/88880000", {}, 200, 6),
+    ("GET", "/customers/88880000/orders", {}, 200, 3),
+    ("GET", "/orders/", {}, 200, 1),
+    ("GET", "/orders/1", {}, 200, 4),
+    ("GET", "/orders/1/events", {}, 200, 1),
+    ("GET", "/orders/1/receipt", {}, 404, 1),
+    ("POST", "/orders/1/confirm", {}, 200, 28), # stock, movements, rollups, events, reload, customer profile (7)
+    ("GET", "/chat/customers", {}, 200, 1),
+    ("POST", "/chat/88880001/ai_toggle", {"params": {"active": False}}, 200, 3), # + customer profile update
+    ("GET", "/debug/orders", {}, 200, 1),
+    ("GET", "/ai/context/88880000", {}, 200, 10), # fixed, whatever the history; includes the recommendation index load
+    ("GET", "/customers/88880000/profile", {}, 200, 1),
+    ("GET", "/customers/phone/88880000", {}, 200, 1), # customer_profiles row
+    ("DELETE", "/customers/77770000", {}, 204, 5), # + customer profile delete
+]
+
+async def _run_budgets():
+    user = await _seed()
+    failures = []
+    async with _client(user) as client:
+        for method, path, kwargs, expected_status, budget in BUDGETS:
+            with count_queries() as statements:
+                response = await client.request(method, path, **kwargs)
+            assert response.status_code == expected_status, f"{method} {path}: {response.status_code} {response.text}"
+            if len(statements) > budget:
+                failures.append(f"{method} {path}: {len(statements)} queries (budget {budget})")
+    app.dependency_overrides.clear()
+    return failures
+
+def test_query_budgets():
+    failures = asyncio.run(_run_budgets())
+    assert not failures, "\n".join(failures)
+
+if __name__ == "__main__":
+    failures = asyncio.run(_run_budgets())
+    print("\n".join(failures) or "All endpoints within their query budgets.")
@@ -0,0 +1,83 @@
+"""
+Receipt interception state machine, driven through the webhook handler and the orders API.
+
+Runs against a throwaway SQLite database with WhatsApp sends replaced by a recorder:
+    python -m pytest test_receipt_flow.py -q
+"""
+import asyncio
+import os
+import tempfile
+
+_DB_PATH = os.path.join(tempfile.mkdtemp(), "receipt_flow.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+
+import httpx
+from sqlalchemy import select
+
+from app.main import app
+from app.api import deps
+from app.core.database import engine, Base, AsyncSessionLocal
+from app.core.whatsapp import whatsapp_client
+from app.models import User, Customer, Order
+from app.models.conversations import ConversationState
+from app.services import receipt_flow
+
+PHONE = "50688887777"
+
+async def _seed():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        user = User(name="Admin", email="admin@lavete.com", password_hash="x", role="admin")
+        customer = Customer(full_name="Cliente", phone="88887777")
+        db.add_all([user, customer])
+        await db.flush()
+        db.add(Order(customer_id=customer.id, status="pending_payment", total_amount=2000))
+        await db.commit()
+        return user, customer.id
+
+async def _message(customer_id: int, msg_type: str, content: str):
+    async with AsyncSessionLocal() as db:
+        customer = await db.get(Customer, customer_id)
+        return await receipt_flow.handle_message(db, customer, PHONE, msg_type, content)
+
+async def _run_image_after_admin_change(sent):
+    user, customer_id = await _seed()
+
+    await _message(customer_id, "image", "/static/receipts/1.jpg")
+    assert "orden #1" in sent[-1]["body_text"]
+
+    # The admin marks the order paid from the portal instead of waiting for the customer's answer
+    async def _current_user():
+        return user
+    app.dependency_overrides[deps.get_current_user] = _current_user
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test/api/v1") as client:
+            response = await client.put("/orders/1", json={"status": "paid"})
+            assert response.status_code == 200, response.text
+    finally:
+        app.dependency_overrides.clear()
+
+    async with AsyncSessionLocal() as db:
+        db.add(Order(customer_id=customer_id, status="pending_payment", total_amount=3000))
+        await db.commit()
+
+    await _message(customer_id, "image", "/static/receipts/2.jpg")
+    assert "orden #2" in sent[-1]["body_text"]
+
+    async with AsyncSessionLocal() as db:
+        state = await db.get(ConversationState, customer_id)
+        assert (state.state, state.order_ids) == (receipt_flow.AWAITING_SINGLE, [2])
+        orders = {o.id: o for o in (await db.execute(select(Order))).scalars()}
+        assert orders[1].status == "paid"
+        assert orders[2].pending_receipt_url == "/static/receipts/2.jpg"
+
+def test_image_after_admin_resolved_open_question(monkeypatch):
+    sent = []
+    async def _record(*args, **kwargs):
+        sent.append(kwargs)
+    monkeypatch.setattr(whatsapp_client, "send_message", _record)
+    monkeypatch.setattr(whatsapp_client, "send_interactive_buttons", _record)
+    monkeypatch.setattr(whatsapp_client, "send_interactive_list", _record)
+    asyncio.run(_run_image_after_admin_change(sent))